@@ -0,0 +1,124 @@
+import os
+import json
+
+from file2quiz import utils, cache
+
+MANIFEST_VERSION = 1
+
+
+def get_manifest(output_dir, incremental=False, **kwargs):
+    return BuildManifest(output_dir) if incremental else None
+
+
+class BuildManifest:
+    """Records the inputs and parameters used to build each artifact (incremental builds).
+
+    An artifact is up to date if it exists, it was built with the same parameters and the contents of its inputs
+    have not changed. Files are compared by size and modification time first, and by their SHA-256 only if those
+    have changed (e.g. a file that was touched but not modified is still up to date).
+    """
+
+    def __init__(self, output_dir, filename=".manifest.json"):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, filename)
+        self.artifacts = {}  # {output: {"stage": ..., "inputs": {path: signature}, "params": ...}}
+        self.stats = {}  # {stage: {"built": 0, "skipped": 0, "removed": 0}}
+        self._signatures = {}  # Signatures computed during this run
+        self._previous = {}  # Signatures stored in the manifest
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding="utf8") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                self.artifacts = data["artifacts"]
+        except (OSError, ValueError, KeyError):
+            self.artifacts = {}
+
+        # Index the signatures of the inputs
+        self._previous = {}
+        for artifact in self.artifacts.values():
+            for path, sig in artifact["inputs"].items():
+                if sig:
+                    self._previous[path] = sig
+
+    def save(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        with utils.open_atomic(self.path) as f:
+            json.dump({"version": MANIFEST_VERSION, "artifacts": self.artifacts}, f, ensure_ascii=False, indent=1)
+
+    def _key(self, path):
+        return os.path.relpath(os.path.abspath(path), self.output_dir)
+
+    def signature(self, path):
+        path = os.path.abspath(path)
+        if path in self._signatures:
+            return self._signatures[path]
+
+        try:
+            st = os.stat(path)
+        except OSError:  # Missing files are also inputs (e.g. optional files)
+            return None
+
+        # Reuse the previous hash if the file has not been modified
+        sig = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+        previous = self._previous.get(path)
+        if previous and previous["size"] == sig["size"] and previous["mtime_ns"] == sig["mtime_ns"]:
+            sig["sha256"] = previous["sha256"]
+        else:
+            sig["sha256"] = cache.file_hash(path)
+        self._signatures[path] = sig
+        return sig
+
+    def has_stage(self, stage):
+        return any(artifact["stage"] == stage for artifact in self.artifacts.values())
+
+    def is_fresh(self, stage, output, inputs, params):
+        artifact = self.artifacts.get(self._key(output))
+        if not artifact or artifact["stage"] != stage or not os.path.exists(output):
+            return False
+        if artifact["params"] != cache.make_key(params):
+            return False
+
+        # Compare contents
+        inputs = [os.path.abspath(path) for path in inputs]
+        if set(inputs) != set(artifact["inputs"]):
+            return False
+        for path in inputs:
+            sig, old_sig = self.signature(path), artifact["inputs"][path]
+            if (sig and sig["sha256"]) != (old_sig and old_sig["sha256"]):
+                return False
+        return True
+
+    def skip(self, stage):
+        self._count(stage, "skipped")
+
+    def record(self, stage, output, inputs, params):
+        # Forget the signatures of this run, the inputs could have been modified while building the artifact
+        for path in inputs:
+            self._signatures.pop(os.path.abspath(path), None)
+
+        inputs = {os.path.abspath(path): self.signature(path) for path in inputs}
+        self.artifacts[self._key(output)] = {"stage": stage, "inputs": inputs, "params": cache.make_key(params)}
+        self._count(stage, "built")
+
+    def remove_stale(self, stage, outputs):
+        # Delete the artifacts whose sources are gone
+        outputs = {self._key(output) for output in outputs}
+        for key in [k for k, artifact in self.artifacts.items() if artifact["stage"] == stage and k not in outputs]:
+            path = os.path.join(self.output_dir, key)
+            if os.path.exists(path):
+                print(f"\t- [INFO] Removing outdated file... ({os.path.basename(path)})")
+                os.remove(path)
+            del self.artifacts[key]
+            self._count(stage, "removed")
+
+    def _count(self, stage, name):
+        stats = self.stats.setdefault(stage, {"built": 0, "skipped": 0, "removed": 0})
+        stats[name] += 1
+
+    def format_stats(self, stage):
+        stats = self.stats.get(stage, {"built": 0, "skipped": 0, "removed": 0})
+        return f"- [INFO] Incremental build: {stats['built']} built, {stats['skipped']} up to date (skipped), " \
+               f"{stats['removed']} removed"
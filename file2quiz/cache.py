@@ -0,0 +1,119 @@
+import os
+import json
+import hashlib
+import threading
+
+from file2quiz import utils
+
+# Bump this number when the cached outputs change (e.g. a new version of an extractor)
+CACHE_VERSION = 1
+
+DEFAULT_CACHE_SIZE = 1024  # MB
+
+
+def file_hash(filename, chunk_size=1024*1024):
+    h = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def make_key(*parts):
+    # Any JSON-serializable value can be part of a key (hashes, options,...)
+    data = json.dumps([CACHE_VERSION] + list(parts), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode("utf8")).hexdigest()
+
+
+class ContentCache:
+    """Persistent key-value cache stored as JSON files.
+
+    Entries are evicted in LRU order (by modification time, which is updated on every hit) when the total size
+    of the cache exceeds `max_size` (in bytes).
+    """
+
+    def __init__(self, cache_dir, max_size=DEFAULT_CACHE_SIZE*1024*1024):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._size = None  # Computed lazily
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding="utf8") as f:
+                value = json.load(f)
+            os.utime(path)  # Mark as recently used
+        except (OSError, ValueError):  # Missing or corrupted entry
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temporary file first, so that a crash cannot leave a half-written entry
+        old_size = os.path.getsize(path) if os.path.exists(path) else 0
+        with utils.open_atomic(path) as f:
+            json.dump(value, f, ensure_ascii=False)
+
+        with self._lock:
+            if self._size is not None:
+                self._size += os.path.getsize(path) - old_size
+        self.evict()
+
+    def _entries(self):
+        entries = []
+        for root, dirs, files in os.walk(self.cache_dir):
+            for filename in files:
+                if filename.endswith(".json"):
+                    path = os.path.join(root, filename)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def size(self):
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for mtime, size, path in self._entries())
+            return self._size
+
+    def evict(self):
+        if self.size() <= self.max_size:
+            return 0
+
+        # Remove the least recently used entries
+        removed = 0
+        with self._lock:
+            entries = sorted(self._entries())
+            self._size = sum(size for mtime, size, path in entries)
+            for mtime, size, path in entries:
+                if self._size <= self.max_size:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                self._size -= size
+                removed += 1
+        return removed
+
+    def clear(self):
+        with self._lock:
+            for mtime, size, path in self._entries():
+                os.remove(path)
+            self._size = 0
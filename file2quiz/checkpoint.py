@@ -0,0 +1,120 @@
+import os
+import json
+
+from file2quiz import utils, cache
+
+CHECKPOINT_VERSION = 1
+
+DONE = "done"
+FAILED = "failed"
+
+
+def get_checkpoint(output_dir, checkpoint=False, resume=False, retry_failed=False, **kwargs):
+    # Only in checkpointed mode (resuming a batch implies it)
+    if not (checkpoint or resume or retry_failed):
+        return None
+    return Checkpoint(output_dir, resume=resume or retry_failed, retry_failed=retry_failed)
+
+
+class Checkpoint:
+    """Status of each input file of a batch (done or failed), so that an interrupted batch can be resumed.
+
+    Every completed file is appended to a journal (one JSON line per file, flushed to disk), so a crash loses at
+    most the file that was being processed. A half-written last line is ignored. With `resume`, the files that were
+    done (with the same parameters, and not modified since) are skipped, and so are the failed ones unless
+    `retry_failed` is set.
+    """
+
+    def __init__(self, output_dir, filename=".checkpoint.jsonl", resume=False, retry_failed=False):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, filename)
+        self.resume = resume
+        self.retry_failed = retry_failed
+        self.entries = {}  # {input: {"status": ..., "outputs": [...], "error": ..., "params": ..., "input": ...}}
+        self.stats = {"done": 0, "resumed": 0, "failed": 0, "skipped_failed": 0}
+        self._file = None
+        self.load()
+
+    def load(self):
+        self.entries = {}
+        try:
+            with open(self.path, 'r', encoding="utf8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:  # Interrupted while writing
+                        continue
+                    if entry.get("version") == CHECKPOINT_VERSION:
+                        self.entries[entry["file"]] = entry
+        except OSError:
+            pass
+
+    def _key(self, path):
+        return os.path.abspath(path)
+
+    def signature(self, path):
+        st = os.stat(path)
+        return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+    def status(self, filename, params):
+        """Status of a file in a previous run (None if it has to be processed)"""
+        entry = self.entries.get(self._key(filename))
+        if not self.resume or not entry:
+            return None
+        if entry["params"] != cache.make_key(params) or entry["input"] != self.signature(filename):
+            return None
+        if entry["status"] == DONE and all(os.path.exists(output) for output in entry["outputs"]):
+            return DONE
+        if entry["status"] == FAILED and not self.retry_failed:
+            return FAILED
+        return None
+
+    def skip(self, filename):
+        entry = self.entries[self._key(filename)]
+        self.stats["resumed" if entry["status"] == DONE else "skipped_failed"] += 1
+        return entry
+
+    def record(self, filename, params, outputs=(), error=None):
+        # The outputs must be complete before the file is marked as done
+        entry = {"version": CHECKPOINT_VERSION, "file": self._key(filename), "status": FAILED if error else DONE,
+                 "outputs": [os.path.abspath(output) for output in outputs], "error": error,
+                 "params": cache.make_key(params), "input": self.signature(filename)}
+        self.entries[entry["file"]] = entry
+        self.stats["failed" if error else "done"] += 1
+
+        if self._file is None:
+            os.makedirs(self.output_dir, exist_ok=True)
+            self._file = open(self.path, 'a', encoding="utf8")
+            if not self._ends_with_newline():  # Start on a new line (after a half-written one)
+                self._file.write("\n")
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _ends_with_newline(self):
+        with open(self.path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return True
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def failed(self):
+        return {path: entry["error"] for path, entry in self.entries.items() if entry["status"] == FAILED}
+
+    def close(self, files=None):
+        """Rewrites the journal with the last entry of each file (only the given files, if any)"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+        keep = {self._key(f) for f in files} if files is not None else None
+        entries = [e for path, e in self.entries.items() if keep is None or path in keep]
+        os.makedirs(self.output_dir, exist_ok=True)
+        with utils.open_atomic(self.path) as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def format_stats(self):
+        return f"- [INFO] Checkpoint: {self.stats['done']} done, {self.stats['resumed']} resumed (skipped), " \
+               f"{self.stats['failed']} failed, {self.stats['skipped_failed']} failed before (skipped)"
@@ -0,0 +1,282 @@
+import os
+import time
+import signal
+import tempfile
+import threading
+import subprocess
+import concurrent.futures
+
+from file2quiz import trace
+
+# Maximum number of external processes running at the same time
+_semaphore = threading.BoundedSemaphore(os.cpu_count() or 1)
+
+# Async calls wait for the semaphore here (one at a time, in order)
+_acquire_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="file2quiz-commands")
+
+# Tools can start other processes (e.g. ImageMagick runs gs), so each one runs in its own process group
+_KILL_GROUP = hasattr(os, "killpg")
+
+# Statistics per tool (calls, errors, timeouts, wall and CPU time)
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+class CommandError(RuntimeError):
+    def __init__(self, message, result=None):
+        super().__init__(message)
+        self.result = result
+
+
+class CommandResult:
+    def __init__(self, args, returncode, stdout, stderr, wall_time, cpu_time=None, timed_out=False):
+        self.args = args
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.wall_time = wall_time
+        self.cpu_time = cpu_time  # None if it is not available (e.g.: Windows)
+        self.timed_out = timed_out
+
+    @property
+    def ok(self):
+        return self.returncode == 0 and not self.timed_out
+
+
+def set_max_concurrency(max_processes):
+    global _semaphore
+    _semaphore = threading.BoundedSemaphore(max(1, int(max_processes)))
+
+
+def run_command(args, timeout=None, retries=0, env=None, input=None, check=True, tool=None):
+    """Runs an external tool (no shell) and returns a `CommandResult`.
+
+    The call is retried up to `retries` times if it fails or times out, and raises a `CommandError` if it keeps
+    failing (unless `check=False`). At most `set_max_concurrency()` processes run at the same time.
+    """
+    args = [str(arg) for arg in args]
+    tool = tool or os.path.basename(args[0])
+
+    result = None
+    for attempt in range(retries + 1):
+        if attempt > 0:
+            print(f"\t- [WARNING] Retrying '{tool}' ({attempt}/{retries})...")
+
+        with _semaphore, trace.span(tool, cat="tool"):
+            try:
+                result = _run_process(args, timeout=timeout, env=env, input=input)
+            except OSError as e:  # Not installed, no permissions,...
+                _record_stats(tool, None)
+                raise CommandError(f"'{tool}' could not be executed ({e})")
+
+        _record_stats(tool, result)
+        if result.ok:
+            return result
+
+    # Show error
+    if check:
+        raise _command_error(tool, timeout, result)
+    return result
+
+
+async def run_command_async(args, timeout=None, retries=0, env=None, input=None, check=True, tool=None):
+    """Same as `run_command`, for asyncio. If the task is cancelled (or times out), the process is killed."""
+    import asyncio  # Already loaded by the event loop (not needed by the synchronous API)
+
+    args = [str(arg) for arg in args]
+    tool = tool or os.path.basename(args[0])
+
+    result = None
+    for attempt in range(retries + 1):
+        if attempt > 0:
+            print(f"\t- [WARNING] Retrying '{tool}' ({attempt}/{retries})...")
+
+        # Same limit as the synchronous API (waiting for it does not block the event loop)
+        semaphore = _semaphore
+        acquired = asyncio.get_running_loop().run_in_executor(_acquire_executor, semaphore.acquire)
+        try:
+            await asyncio.shield(acquired)
+        except asyncio.CancelledError:
+            acquired.add_done_callback(lambda f: semaphore.release())  # Give it back once it is acquired
+            raise
+        try:
+            with trace.span(tool, cat="tool"):
+                try:
+                    result = await _run_process_async(args, timeout=timeout, env=env, input=input)
+                except OSError as e:  # Not installed, no permissions,...
+                    _record_stats(tool, None)
+                    raise CommandError(f"'{tool}' could not be executed ({e})")
+        finally:
+            semaphore.release()
+
+        _record_stats(tool, result)
+        if result.ok:
+            return result
+
+    # Show error
+    if check:
+        raise _command_error(tool, timeout, result)
+    return result
+
+
+async def run_commands_async(commands, **kwargs):
+    import asyncio
+    return await asyncio.gather(*[run_command_async(args, **kwargs) for args in commands])
+
+
+def _command_error(tool, timeout, result):
+    if result.timed_out:
+        return CommandError(f"'{tool}' timed out after {timeout} seconds", result)
+    stderr = result.stderr.decode("utf8", errors="replace").strip()
+    return CommandError(f"'{tool}' failed with exit code {result.returncode} ({stderr[-200:]})", result)
+
+
+async def _run_process_async(args, timeout=None, env=None, input=None):
+    import asyncio
+
+    # Same as `_run_process`, but the process is waited for (and reaped with its CPU time) in a thread.
+    # Processes started by asyncio are reaped by its child watcher, so their CPU time would be lost.
+    loop = asyncio.get_running_loop()
+    with tempfile.TemporaryFile() as f_in, tempfile.TemporaryFile() as f_out, tempfile.TemporaryFile() as f_err:
+        start = time.perf_counter()
+        proc = _start_process(args, env, input, f_in, f_out, f_err)
+        waiter = loop.run_in_executor(None, _wait, proc)
+        timed_out = False
+        try:
+            returncode, cpu_time = await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            timed_out = True
+            _kill(proc)
+            returncode, cpu_time = await waiter
+        except asyncio.CancelledError:
+            # Do not leave the processes running (or as a zombie)
+            _kill(proc)
+            await waiter
+            raise
+        wall_time = time.perf_counter() - start
+        return _get_result(args, returncode, f_out, f_err, wall_time, cpu_time, timed_out)
+
+
+def _start_process(args, env, input, f_in, f_out, f_err):
+    # Outputs go to temporary files, so that the pipes cannot get full while we wait for the process
+    if input is not None:
+        f_in.write(input)
+        f_in.seek(0)
+    return subprocess.Popen(args, stdin=f_in if input is not None else subprocess.DEVNULL, stdout=f_out,
+                            stderr=f_err, env=env, start_new_session=_KILL_GROUP)
+
+
+def _get_result(args, returncode, f_out, f_err, wall_time, cpu_time, timed_out):
+    # Read outputs
+    f_out.seek(0)
+    f_err.seek(0)
+    return CommandResult(args, returncode, f_out.read(), f_err.read(), wall_time, cpu_time, timed_out)
+
+
+def _run_process(args, timeout=None, env=None, input=None):
+    with tempfile.TemporaryFile() as f_in, tempfile.TemporaryFile() as f_out, tempfile.TemporaryFile() as f_err:
+        start = time.perf_counter()
+        proc = _start_process(args, env, input, f_in, f_out, f_err)
+        try:
+            if hasattr(os, "wait4"):
+                returncode, cpu_time, timed_out = _wait_posix(proc, timeout)
+            else:
+                returncode, cpu_time, timed_out = _wait_generic(proc, timeout)
+        except BaseException:  # e.g. KeyboardInterrupt (the process group does not get it from the terminal)
+            _kill(proc)
+            _wait(proc)
+            raise
+        wall_time = time.perf_counter() - start
+        return _get_result(args, returncode, f_out, f_err, wall_time, cpu_time, timed_out)
+
+
+def _kill(proc):
+    # Kill the process and the processes it started
+    if proc.returncode is not None:  # Already reaped (its ID could be in use again)
+        return
+    try:
+        if _KILL_GROUP:
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+    except ProcessLookupError:  # Already finished
+        pass
+
+
+def _wait(proc):
+    # Blocks until the process finishes. Returns the exit code and the CPU time (None if it is not available)
+    if proc.returncode is not None:  # Already reaped
+        return proc.returncode, None
+    if hasattr(os, "wait4"):
+        pid, status, rusage = os.wait4(proc.pid, 0)
+        proc.returncode = _get_returncode(status)
+        return proc.returncode, rusage.ru_utime + rusage.ru_stime
+    return proc.wait(), None
+
+
+def _get_returncode(status):
+    # Exit code (negative if it was killed by a signal)
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def _wait_posix(proc, timeout):
+    # Wait with os.wait4 to get the CPU time used by the process
+    deadline = time.perf_counter() + timeout if timeout else None
+    timed_out = False
+    delay = 0.001
+    while True:
+        pid, status, rusage = os.wait4(proc.pid, os.WNOHANG)
+        if pid:
+            break
+
+        if deadline and time.perf_counter() > deadline:
+            timed_out = True
+            _kill(proc)
+            pid, status, rusage = os.wait4(proc.pid, 0)
+            break
+
+        time.sleep(delay)
+        delay = min(delay * 2, 0.05)
+
+    proc.returncode = _get_returncode(status)  # The process has been already reaped
+    return proc.returncode, rusage.ru_utime + rusage.ru_stime, timed_out
+
+
+def _wait_generic(proc, timeout):
+    try:
+        return proc.wait(timeout=timeout), None, False
+    except subprocess.TimeoutExpired:
+        _kill(proc)
+        return proc.wait(), None, True
+
+
+def _record_stats(tool, result):
+    with _stats_lock:
+        stats = _stats.setdefault(tool, {"calls": 0, "errors": 0, "timeouts": 0, "wall_time": 0.0, "cpu_time": 0.0})
+        stats["calls"] += 1
+        if result is None or not result.ok:
+            stats["errors"] += 1
+        if result is not None:
+            stats["timeouts"] += int(result.timed_out)
+            stats["wall_time"] += result.wall_time
+            stats["cpu_time"] += result.cpu_time or 0.0
+
+
+def get_stats():
+    with _stats_lock:
+        return {tool: dict(stats) for tool, stats in _stats.items()}
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def format_stats():
+    lines = []
+    for tool, stats in sorted(get_stats().items()):
+        lines.append(f"- [INFO] {tool}: {stats['calls']} calls ({stats['errors']} errors, {stats['timeouts']} timeouts); "
+                     f"wall time: {stats['wall_time']:.2f}s; CPU time: {stats['cpu_time']:.2f}s")
+    return lines
@@ -1,20 +1,34 @@
+import io
 import os
+import re
 import string
+import tempfile
 
-from file2quiz import utils, reader
+from file2quiz import utils, reader, commands, build, trace, models, store
 
 
-def convert_quiz(input_dir, output_dir, file_format, save_files=False, *args, **kwargs):
+def convert_quiz(input_dir, output_dir, file_format, save_files=False, collect=True, bank=None, query=None, *args,
+                 **kwargs):
     print(f'##############################################################')
     print(f'### QUIZ CONVERTER')
     print(f'##############################################################\n')
 
-    # Get files
-    files = utils.get_files(input_dir, extensions={'json'})
+    # Get files (or the exams of the question bank that match the query)
+    if bank:
+        question_bank = store.QuestionBank(bank)
+        files = question_bank.exams(query)
+        print(f'\t- [INFO] Exporting from question bank: "{bank}" ({len(files)} exams; query: {query!r})')
+    else:
+        question_bank = None
+        files = utils.get_files(input_dir, extensions={'json', 'jsonl'})
+
+    # Get build manifest (incremental builds)
+    manifest = build.get_manifest(output_dir, **kwargs) if save_files else None
+    stage = f"convert/{file_format}"
 
     # Create quizzes folder
     convert_dir = os.path.join(output_dir, f"quizzes/{file_format}")
-    utils.create_folder(convert_dir, empty_folder=True) if save_files else None
+    utils.create_folder(convert_dir, empty_folder=manifest is None or not manifest.has_stage(stage)) if save_files else None
 
     # Set format
     FILE_FORMATS = {"text": "txt", "anki": "txt"}
@@ -27,57 +41,136 @@ def convert_quiz(input_dir, output_dir, file_format, save_files=False, *args, **
         print(f'\t- [ERROR] No method to save "{output_ext}" files (fallback to "txt")')
 
     # Convert quizzes
-    fquizzes = []
+    fquizzes = []  # Only if the results are collected
+    num_converted = 0
     total_questions = 0
     total_answers = 0
-    for i, filename in enumerate(files, 1):
+    # (the quizzes of the question bank are streamed by a single query)
+    quizzes = question_bank.iter_quizzes(query) if question_bank else ((filename, None) for filename in files)
+    for i, (filename, quiz) in enumerate(quizzes, 1):
         tail, basedir = utils.get_tail(filename)
-        fname, ext = utils.get_fname(filename)
+        fname = filename if question_bank else utils.get_fname(filename)[0]  # Exams are named like their files
 
         print("")
         print(f'==============================================================')
         print(f'[INFO] ({i}/{len(files)}) Converting quiz to "{file_format}": "{tail}"')
         print(f'==============================================================')
 
-        # Read file
-        quiz = reader.read_json(filename)
-        solutions = sum([1 for q_id, q in quiz.items() if q.get('correct_answer') is not None])
-        total_answers += solutions
-        total_questions += len(quiz)
+        # Read file (JSONL files are streamed, one question at a time)
+        if not question_bank:
+            quiz = reader.iter_quiz(filename)
+
+        # Count the questions while they are converted
+        counts = {"questions": 0, "solutions": 0}
+        quiz = _count_questions(iter_questions(quiz, kwargs.get("filter")), counts)
+
+        # Check if the quiz is up to date (incremental builds)
+        savepath = os.path.join(convert_dir, f"{fname}.{output_ext}")
+        build_params = {"file_format": file_format, "show_answers": kwargs.get("show_answers"),
+                        "answer_table": kwargs.get("answer_table"), "filter": kwargs.get("filter")}
+        inputs = [filename]
+        if question_bank:
+            build_params.update(exam=filename, query=query)
+            inputs = [bank]
+        if manifest and manifest.is_fresh(stage, savepath, inputs, build_params):
+            print(f"\t- [INFO] Up to date. Skipping... ({tail})")
+            manifest.skip(stage)
+            total_questions, total_answers = _add_counts(quiz, counts, total_questions, total_answers)
+            num_converted += 1
+            fquizzes.append((reader.read_txt(savepath), filename)) if collect else None
+            continue
+
+        # Exams of a question bank can be in subdirectories (e.g. "2019/exam1")
+        if save_files and question_bank:
+            os.makedirs(os.path.dirname(savepath), exist_ok=True)
 
+        # Convert quiz (without collecting the results, it is written straight to the file)
         try:
-            fquiz = _convert_quiz(quiz, file_format, *args, **kwargs)
+            with trace.span("convert_quiz", cat="convert", file=tail):
+                if collect:
+                    fquiz = _convert_quiz(quiz, file_format, *args, **kwargs)
+                    is_empty = len(fquiz.strip()) == 0
+                    reader.save_txt(fquiz, savepath) if save_files else None
+                elif save_files:
+                    is_empty = not write_quiz_file(quiz, savepath, file_format, *args, **kwargs)
+                else:
+                    with open(os.devnull, 'w', encoding="utf8") as f:
+                        is_empty = write_quiz(quiz, f, file_format, *args, **kwargs).is_empty
         except ValueError as e:
             print(f'\t- [ERROR] {e}. Skipping quiz "{tail}"')
             continue
+        finally:
+            total_questions, total_answers = _add_counts(quiz, counts, total_questions, total_answers)
 
         # Add formatted quizzes
-        fquizzes.append((fquiz, filename))
+        num_converted += 1
+        fquizzes.append((fquiz, filename)) if collect else None
 
         # Show info
-        if len(fquiz.strip()) == 0:
+        if is_empty:
             print(f"\t- [WARNING] No quiz were found ({tail})")
-        print(f"\t- [INFO] Conversion done! {len(quiz)} questions were found; {solutions} with solutions. ({tail})")
+        print(f"\t- [INFO] Conversion done! {counts['questions']} questions were found; {counts['solutions']} with "
+              f"solutions. ({tail})")
 
         # Save quizzes
         if save_files:
             print(f"\t- [INFO] Saving file... ({tail}.txt)")
-            reader.save_txt(fquiz, os.path.join(convert_dir, f"{fname}.{output_ext}"))
+
+            if manifest:
+                manifest.record(stage, savepath, inputs, build_params)
 
     # Check result
-    if not fquizzes:
+    if not num_converted:
         print("\t- [WARNING] No quiz was converted successfully")
+    if question_bank:
+        question_bank.close()
+
+    # Remove the quizzes that are gone
+    if manifest:
+        fnames = files if question_bank else [utils.get_fname(f)[0] for f in files]
+        manifest.remove_stale(stage, [os.path.join(convert_dir, f"{fname}.{output_ext}") for fname in fnames])
+        manifest.save()
 
     print("")
     print("--------------------------------------------------------------")
     print("SUMMARY")
     print("--------------------------------------------------------------")
-    print(f"- [INFO] Quizzes converted: {len(fquizzes)}")
+    print(f"- [INFO] Quizzes converted: {num_converted}")
     print(f"- [INFO] Questions found: {total_questions} (with solutions: {total_answers})")
+    if manifest:
+        print(manifest.format_stats(stage))
     print("--------------------------------------------------------------\n\n")
     return fquizzes
 
 
+def iter_questions(quiz, rgx_filter=None):
+    # (key, Question) pairs: quizzes are sorted by key, and streams of pairs (e.g. JSONL files) keep their order
+    if isinstance(quiz, dict):
+        quiz = models.Quiz.from_dict(quiz)
+    if isinstance(quiz, models.Quiz):
+        quiz = [(key, quiz[key]) for key in sorted(quiz.keys(), key=utils.tokenize)]
+
+    # Keep the questions whose text (or answers) match the regex
+    if rgx_filter:
+        rgx = re.compile(rgx_filter, re.IGNORECASE)
+        quiz = ((key, q) for key, q in quiz if rgx.search(q.question) or any(map(rgx.search, q.answers)))
+    return quiz
+
+
+def _count_questions(questions, counts):
+    for key, question in questions:
+        counts["questions"] += 1
+        counts["solutions"] += question.correct_answer is not None
+        yield key, question
+
+
+def _add_counts(questions, counts, total_questions, total_answers):
+    # Consume the rest of the questions (e.g. the quiz was up to date or could not be converted)
+    for _ in questions:
+        pass
+    return total_questions + counts["questions"], total_answers + counts["solutions"]
+
+
 def _convert_quiz(quiz, file_format, *args, **kwargs):
     # Select format
     if file_format == "anki":
@@ -86,13 +179,117 @@ def _convert_quiz(quiz, file_format, *args, **kwargs):
         return quiz2txt(quiz, *args, **kwargs)
 
 
-def pdf2image(filename, savepath, dpi=300, img_format="tiff", **kwargs):
+def write_quiz(quiz, f, file_format, *args, **kwargs):
+    # Select format
+    if file_format == "anki":
+        return write_quiz_anki(quiz, f)
+    else:  # Fallback to txt
+        return write_quiz_txt(quiz, f, *args, **kwargs)
+
+
+def write_quiz_file(quiz, savepath, file_format, *args, **kwargs):
+    # Stream the quiz to a temporary file, so that a failed conversion cannot leave a partial file behind
+    with utils.open_atomic(savepath) as f:
+        writer = write_quiz(quiz, f, file_format, *args, **kwargs)
+    return not writer.is_empty
+
+
+class StripWriter:
+    """Writes text to a file as if the whole text had been `.strip()`ped.
+
+    Leading whitespace is skipped and trailing whitespace is held back until more text arrives, so the output is
+    the same as writing `text.strip()` without building the whole text in memory.
+    """
+
+    def __init__(self, f):
+        self.f = f
+        self.is_empty = True
+        self.pending = ""
+
+    def write(self, text):
+        if self.is_empty:
+            text = text.lstrip()
+            if not text:
+                return
+            self.is_empty = False
+
+        body = text.rstrip()
+        if body:
+            self.f.write(self.pending + body if self.pending else body)
+            self.pending = text[len(body):]
+        else:
+            self.pending += text
+
+
+def pdf_num_pages(filename, tool_timeout=None, **kwargs):
+    # This requires: ImageMagick
+    try:
+        result = commands.run_command(['identify', '-ping', '-format', '%n\n', filename], timeout=tool_timeout)
+        return int(result.stdout.split()[0])
+    except (commands.CommandError, ValueError, IndexError):
+        return None
+
+
+def pdf2image(filename, savepath, dpi=300, img_format="tiff", page=None, tool_timeout=None, tool_retries=0, **kwargs):
+    # This requires: ImageMagick
+    if page is None:  # All pages
+        source, target = filename, f"{savepath}/page-%0d.{img_format}"
+    else:  # Single page (0-indexed)
+        source, target = f"{filename}[{page}]", f"{savepath}/page-{page}.{img_format}"
+    cmd = ['convert', '-density', dpi, source, '-depth', '8', '-strip', '-background', 'white', '-alpha', 'off', target]
+    commands.run_command(cmd, timeout=tool_timeout, retries=tool_retries)
+
+
+def pdf2pgm(filename, first_page, last_page, dpi=300, tool_timeout=None, tool_retries=0, **kwargs):
     # This requires: ImageMagick
-    cmd = f'convert -density {dpi} "{filename}" -depth 8 -strip -background white -alpha off "{savepath}/page-%0d.{img_format}"'
-    os.system(cmd)
+    # Rasterizes a range of pages (0-indexed, inclusive) with a single call, as 8-bit grayscale images (PGM) written
+    # to stdout, one after another
+    cmd = ['convert', '-density', dpi, f"{filename}[{first_page}-{last_page}]", '-depth', '8', '-strip',
+           '-background', 'white', '-alpha', 'remove', '-colorspace', 'Gray', 'pgm:-']
+    return commands.run_command(cmd, timeout=tool_timeout, retries=tool_retries).stdout
 
 
-def image2text(filename, savepath, lang="eng", dpi=300, psm=3, oem=3, **kwargs):
+def pgm2text(data, lang="eng", dpi=300, psm=3, oem=3, env=None, tool_timeout=None, tool_retries=0, **kwargs):
+    # This requires: Tesseract
+    # The image is sent through stdin and the text is read from stdout (no files)
+    cmd = ['tesseract', 'stdin', 'stdout', '-l', lang, '--dpi', dpi, '--psm', psm, '--oem', oem, 'letters']
+    result = commands.run_command(cmd, input=data, env=env, timeout=tool_timeout, retries=tool_retries)
+    return result.stdout.decode("utf8", errors="replace")
+
+
+def images2text(filenames, lang="eng", dpi=300, psm=3, oem=3, env=None, tool_timeout=None, tool_retries=0, **kwargs):
+    # This requires: Tesseract
+    # A single run for many images (the language model is loaded once): Tesseract reads the images from a list
+    # file and writes their text to stdout, separated by form feeds
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", encoding="utf8") as f:
+        f.write("\n".join(os.path.abspath(filename) for filename in filenames) + "\n")
+        f.flush()
+        cmd = ['tesseract', f.name, 'stdout', '-l', lang, '--dpi', dpi, '--psm', psm, '--oem', oem, 'letters']
+        result = commands.run_command(cmd, env=env, timeout=tool_timeout, retries=tool_retries)
+    return split_pages(result.stdout.decode("utf8", errors="replace"), len(filenames))
+
+
+def tiff2text(data, num_pages, lang="eng", dpi=300, psm=3, oem=3, env=None, tool_timeout=None, tool_retries=0,
+              **kwargs):
+    # This requires: Tesseract
+    # Multi-page TIFF through stdin: a single run for all its pages (one text per page)
+    cmd = ['tesseract', 'stdin', 'stdout', '-l', lang, '--dpi', dpi, '--psm', psm, '--oem', oem, 'letters']
+    result = commands.run_command(cmd, input=data, env=env, timeout=tool_timeout, retries=tool_retries)
+    return split_pages(result.stdout.decode("utf8", errors="replace"), num_pages)
+
+
+def split_pages(text, num_pages):
+    # Tesseract ends each page with a form feed (some builds only write it between pages)
+    pages = text.split("\f")
+    if len(pages) == num_pages + 1 and not pages[-1].strip():
+        pages = pages[:-1]
+    if len(pages) != num_pages:
+        raise ValueError(f"Expected {num_pages} pages, but the OCR returned {len(pages)}")
+    return pages
+
+
+def image2text(filename, savepath, lang="eng", dpi=300, psm=3, oem=3, env=None, tool_timeout=None, tool_retries=0,
+               **kwargs):
     # This requires: Tesseract
     # Tesseract needs the save path without the extensions
     basedir, tail = os.path.split(savepath)
@@ -100,59 +297,67 @@ def image2text(filename, savepath, lang="eng", dpi=300, psm=3, oem=3, **kwargs):
 
     # Run command
     #sub_cmds = 'tessedit_char_whitelist="0123456789 abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYñÑçÇáéíóúÁÉíÓÚüÜ()¿?,;.:/-\"\'ºª%-+Ø=<>*"'
-    cmd = f'tesseract "{filename}" "{basedir}/{fname}" -l {lang} --dpi {dpi} --psm {psm} --oem {oem} letters' #-c {sub_cmds}
-    os.system(cmd)
+    cmd = ['tesseract', filename, f"{basedir}/{fname}", '-l', lang, '--dpi', dpi, '--psm', psm, '--oem', oem, 'letters']  #-c {sub_cmds}
+    commands.run_command(cmd, env=env, timeout=tool_timeout, retries=tool_retries)
 
 
 def quiz2anki(quiz, **kwargs):
-    text = ""
+    f = io.StringIO()
+    write_quiz_anki(quiz, f)
+    return f.getvalue()
 
-    # Sort questions by key
-    keys = sorted(quiz.keys(), key=utils.tokenize)
-    for i, id_question in enumerate(keys):
-        question = quiz[id_question]
 
+def write_quiz_anki(quiz, f, **kwargs):
+    writer = StripWriter(f)
+
+    # Questions sorted by key (or in the order of the stream)
+    for id_question, question in iter_questions(quiz):
         # Check if the there is a correct answer
-        if question.get('correct_answer') is None:
+        if question.correct_answer is None:
             raise ValueError("No correct answer was given.")
 
         # Format fields
-        fields = ["{}. {}".format(id_question, question['question']), str(int(question['correct_answer'])+1)] + question['answers']
-        text += "{}\n".format("\t".join(fields))
-    return text.strip()
+        fields = ["{}. {}".format(id_question, question.question), str(question.correct_answer+1), *question.answers]
+        writer.write("{}\n".format("\t".join(fields)))
+    return writer
 
 
 def quiz2txt(quiz, show_answers, answer_table=False, **kwargs):
-    txt = ""
-    txt_answers = ""
+    f = io.StringIO()
+    write_quiz_txt(quiz, f, show_answers, answer_table)
+    return f.getvalue()
+
 
-    # Sort questions by key
-    keys = sorted(quiz.keys(), key=utils.tokenize)
-    for i, id_question in enumerate(keys):
-        question = quiz[id_question]
+def write_quiz_txt(quiz, f, show_answers, answer_table=False, **kwargs):
+    writer = StripWriter(f)
+    txt_answers = []
 
+    # Questions sorted by key (or in the order of the stream)
+    for id_question, question in iter_questions(quiz):
         # Format question
-        txt += "{}. {}\n".format(id_question, question['question'])
+        txt = "{}. {}\n".format(id_question, question.question)
 
         # Format answers
-        for j, ans in enumerate(question['answers']):
+        for j, ans in enumerate(question.answers):
             marker = ""
             ans_id = string.ascii_lowercase[j].lower()
 
             # Show correct answer?
             if show_answers:
-                if j == question.get("correct_answer"):  # correct answer
+                if j == question.correct_answer:  # correct answer
                     if answer_table:
-                        txt_answers += f"{id_question} - {ans_id}\n"
+                        txt_answers.append(f"{id_question} - {ans_id}\n")
                     else:
                         marker = "*"
             txt += "{}{}) {}\n".format(marker, ans_id, ans)
-        txt += "\n"
+        writer.write(txt + "\n")
 
     # Add answer table at the end of the file if requested
     if show_answers and answer_table:
-        txt += "\n\n\n=========\n\n\n" + txt_answers
-    return txt.strip()
+        writer.write("\n\n\n=========\n\n\n")
+        for line in txt_answers:
+            writer.write(line)
+    return writer
 
 
 def json2text(path, *args, **kwargs):
@@ -162,7 +367,7 @@ def json2text(path, *args, **kwargs):
         fname, extension = os.path.splitext(os.path.basename(filename))
 
         # Load quiz and text
-        quiz = reader.read_json(filename)
+        quiz = reader.read_quiz(filename)
         quiz_txt = quiz2txt(quiz, *args, **kwargs)
 
         texts.append((fname, quiz_txt))
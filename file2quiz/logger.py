@@ -0,0 +1,147 @@
+import json
+import threading
+import contextlib
+from collections import Counter
+
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+LEVEL_NAMES = {value: name.upper() for name, value in LEVELS.items()}
+
+
+class Lazy:
+    """Value that is computed only if the message is shown or saved (e.g.: `Lazy(q_summary, question)`)"""
+    __slots__ = ("func", "args")
+
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+
+    def __str__(self):
+        return str(self.func(*self.args))
+
+
+class Logger:
+    """Diagnostics of the parser (one per question, answer,...).
+
+    Every message is counted by category. Messages below `level` (or all of them, in quiet mode) are not formatted
+    nor printed, unless there is a diagnostics file (JSON lines) or buffer (used by the worker processes).
+    """
+
+    def __init__(self, level="info", quiet=False, diagnostics=None, buffer=False):
+        self.level = LEVELS[level]
+        self.quiet = quiet
+        self.diagnostics = diagnostics
+        self.counts = Counter()
+        self.levels = {}  # {category: level}
+        self.records = [] if buffer else None
+        self.context = {}  # Added to the records (e.g.: current file)
+        self._file = open(diagnostics, 'w', encoding="utf8") if diagnostics and not buffer else None
+        self._lock = threading.Lock()
+
+    def log(self, level, category, msg, *args, prefix="\t- "):
+        with self._lock:
+            self.counts[category] += 1
+            self.levels[category] = level
+
+        # Nothing else to do
+        show = not self.quiet and level >= self.level
+        if not show and self._file is None and self.records is None:
+            return
+
+        text = msg % args if args else msg
+        if show:
+            print(f"{prefix}[{LEVEL_NAMES[level]}] {text}")
+        if self._file is not None or self.records is not None:
+            self.add_records([dict(self.context, level=LEVEL_NAMES[level], category=category, message=text)])
+
+    def add_records(self, records):
+        with self._lock:
+            if self.records is not None:
+                self.records.extend(records)
+            elif self._file is not None:
+                for record in records:
+                    self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def merge(self, counts, levels, records):
+        with self._lock:
+            self.counts.update(counts)
+            self.levels.update(levels)
+        self.add_records(records)
+
+    def drain(self):
+        # Returns (and removes) the counts and records collected so far
+        with self._lock:
+            counts, levels, self.counts = dict(self.counts), dict(self.levels), Counter()
+            records = self.records or []
+            self.records = [] if self.records is not None else None
+        return counts, levels, records
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+# Default logger (shows everything, like print)
+_logger = Logger()
+
+
+def configure(level="info", quiet=False, diagnostics=None, buffer=False):
+    global _logger
+    _logger.flush()  # The worker processes must not write the data buffered by the parent
+    _logger = Logger(level, quiet, diagnostics, buffer)
+    return _logger
+
+
+def get_config():
+    # Configuration for the worker processes (their records are buffered and sent back)
+    return {"level": LEVEL_NAMES[_logger.level].lower(), "quiet": _logger.quiet,
+            "diagnostics": _logger.diagnostics, "buffer": _logger.diagnostics is not None}
+
+
+def get_logger():
+    return _logger
+
+
+def debug(category, msg, *args, **kwargs):
+    _logger.log(10, category, msg, *args, **kwargs)
+
+
+def info(category, msg, *args, **kwargs):
+    _logger.log(20, category, msg, *args, **kwargs)
+
+
+def warning(category, msg, *args, **kwargs):
+    _logger.log(30, category, msg, *args, **kwargs)
+
+
+def error(category, msg, *args, **kwargs):
+    _logger.log(40, category, msg, *args, **kwargs)
+
+
+@contextlib.contextmanager
+def context(**values):
+    previous = _logger.context
+    _logger.context = dict(previous, **values)
+    try:
+        yield
+    finally:
+        _logger.context = previous
+
+
+def get_counts():
+    return dict(_logger.counts)
+
+
+def format_counts(since=None):
+    # Lines for the SUMMARY block (counts since a previous `get_counts()`)
+    since = since or {}
+    lines = []
+    for category, count in sorted(_logger.counts.items(), key=lambda x: (-_logger.levels[x[0]], x[0])):
+        count -= since.get(category, 0)
+        if count > 0:
+            lines.append(f"- [{LEVEL_NAMES[_logger.levels[category]]}] {category}: {count}")
+    return lines
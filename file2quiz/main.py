@@ -27,42 +27,91 @@ def main():
     parser.add_argument('--unpaper-args', help="Arguments for unpaper", default="")
     parser.add_argument('--save-txt-preprocessed', help="Save preprocessed txt (debugging)", default=False, action="store_true")
     parser.add_argument('--from-ocr', help="Parsing a file read using OCR", default=False, action="store_true")
+    parser.add_argument('--quiz-format', help="Format of the parsed quizzes (jsonl: one question per line)", choices=["json", "jsonl"], default="json")
+    parser.add_argument('--filter', help="(regex) Convert only the questions whose text or answers match", default=None)
+    parser.add_argument('--jobs', help="Number of processes used to parse the quizzes (0: all cores)", default=1, type=int)
 
     # Tesseract
     parser.add_argument('--use-ocr', help="Use an OCR to extract text from the PDFs", default=False, action="store_true")
     parser.add_argument('--no-preprocess', help="Disables the image pre-processing for OCR", default=False, action="store_true")
     parser.add_argument('--deskew', help="Corrects the rotation of the documents", default=False, action="store_true")
+    parser.add_argument('--preprocess-engine', help="Image pre-processing: unpaper (files) or numpy (in memory, no intermediate files)", choices=["unpaper", "numpy"], default="unpaper")
+    parser.add_argument('--ocr-batch-size', help="[OCR] Pages rasterized per call (numpy engine)", default=None, type=int)
+    parser.add_argument('--tile-size', help="[numpy engine] Clean the pages in tiles of N pixels processed in parallel (0: whole page)", default=0, type=int)
+    parser.add_argument('--tile-workers', help="[numpy engine] Tiles processed in parallel, shared by the pages pre-processed at once (default: cores)", default=None, type=int)
+    parser.add_argument('--tile-memory', help="[numpy engine] Memory cap of the tiles in flight, shared by the pages pre-processed at once (MB)", default=None, type=int)
+    parser.add_argument('--tesseract-batch', help="[Tesseract] Pages OCRed per Tesseract run (the language model is loaded once per run)", default=1, type=int)
     parser.add_argument('--lang', help="[Tesseract] Specify language(s) used for OCR", default=None)
     parser.add_argument('--dpi', help="[Tesseract] Specify DPI for input image", default=300, type=int)
     parser.add_argument('--psm', help="[Tesseract] Specify page segmentation mode", default=3, type=int)
     parser.add_argument('--oem', help="[Tesseract] Specify OCR Engine mode", default=3, type=int)
+    parser.add_argument('--raster-workers', help="[OCR] Number of pages rasterized in parallel", default=None, type=int)
+    parser.add_argument('--preprocess-workers', help="[OCR] Number of pages pre-processed in parallel", default=None, type=int)
+    parser.add_argument('--ocr-workers', help="[OCR] Number of pages OCRed in parallel (default: cores / OMP_THREAD_LIMIT)", default=None, type=int)
+
+    # Cache
+    parser.add_argument('--no-cache', help="Extract the text of all the documents again (without cache)", default=False, action="store_true")
+    parser.add_argument('--cache-dir', help="Cache directory (default: OUTPUT/.cache)", default=None)
+    parser.add_argument('--cache-size', help="Maximum size of the cache (MB)", default=1024, type=int)
+    parser.add_argument('--ocr-cache-size', help="Maximum size of the cache of OCRed pages (MB; default: --cache-size)", default=None, type=int)
+    parser.add_argument('--quiet', help="Do not show the warnings of each question (only their counts)", default=False, action="store_true")
+    parser.add_argument('--log-level', help="Minimum level of the messages shown", choices=["debug", "info", "warning", "error"], default="info")
+    parser.add_argument('--diagnostics', help="Save all the messages of the parser to a file (JSON lines)", default=None)
+    parser.add_argument('--trace', help="Save the time spent per stage, file and page (Chrome trace format)", default=None)
+    parser.add_argument('--bank', help="Question bank (SQLite): parsed quizzes are added to it, and converted from it", default=None)
+    parser.add_argument('--query', help="[Question bank] Full-text query of the questions to convert (e.g. 'CO2 OR agua')", default=None)
+    parser.add_argument('--incremental', help="Rebuild only the outputs whose inputs or parameters have changed", default=False, action="store_true")
+    parser.add_argument('--checkpoint', help="Record the status of each extracted file, so that the extraction can be resumed (a file that cannot be read does not stop it)", default=False, action="store_true")
+    parser.add_argument('--resume', help="Continue an interrupted text extraction (skip the files already extracted or failed)", default=False, action="store_true")
+    parser.add_argument('--retry-failed', help="Continue an interrupted text extraction, trying again the files that failed", default=False, action="store_true")
+
+    # External tools
+    parser.add_argument('--tool-timeout', help="Maximum time (in seconds) per call to an external tool", default=None, type=float)
+    parser.add_argument('--tool-retries', help="Number of retries when an external tool fails", default=0, type=int)
+    parser.add_argument('--max-processes', help="Maximum number of external tools running at once (default: cores)", default=None, type=int)
 
     args = parser.parse_args()
     input_dir = os.path.abspath(args.input) if args.input else os.path.abspath(os.path.join(os.getcwd()))
     output_dir = os.path.abspath(args.output) if args.output else os.path.abspath(os.path.join(os.getcwd()))
 
+    # Limit external processes
+    if args.max_processes:
+        file2quiz.commands.set_max_concurrency(args.max_processes)
+
+    # Set up logging
+    file2quiz.logger.configure(level=args.log_level, quiet=args.quiet, diagnostics=args.diagnostics)
+
+    # Start tracing
+    if args.trace:
+        file2quiz.trace.start_tracing()
+
     # Minor format
     kwargs = vars(args)
     args.action = args.action.lower().strip() if isinstance(args.action, str) else None
     if args.action == "file2text":
         # Extract text
-        file2quiz.extract_text(input_dir, output_dir, save_files=True, **kwargs)
+        with file2quiz.trace.span("extract_text", cat="stage"):
+            file2quiz.extract_text(input_dir, output_dir, save_files=True, **kwargs)
 
     elif args.action in {"file2quiz", "text2quiz"}:
         # Parse raw files
         if args.action == "file2quiz":
-            file2quiz.extract_text(input_dir, output_dir, save_files=True, **kwargs)
+            with file2quiz.trace.span("extract_text", cat="stage"):
+                file2quiz.extract_text(input_dir, output_dir, save_files=True, **kwargs)
             input_dir = os.path.join(output_dir, "txt")
         elif args.action == "text2quiz":
             pass
 
         # Parse quizzes
-        file2quiz.parse_quiz(input_dir, output_dir, save_files=True, **kwargs)
+        with file2quiz.trace.span("parse_quiz", cat="stage"):
+            file2quiz.parse_quiz(input_dir, output_dir, save_files=True, **kwargs)
 
         # Convert to txt
         if args.save_txt:
-            _input_dir = os.path.join(output_dir, "quizzes/json")
-            file2quiz.convert_quiz(_input_dir, output_dir, file_format="text", save_files=True, **kwargs)
+            _input_dir = os.path.join(output_dir, f"quizzes/{args.quiz_format}")
+            with file2quiz.trace.span("convert_quiz", cat="stage"):
+                file2quiz.convert_quiz(_input_dir, output_dir, file_format="text", save_files=True, collect=False,
+                                       **dict(kwargs, bank=None, query=None))
 
     elif args.action in {"quiz2text", "quiz2anki"}:
         # Select format
@@ -70,11 +119,20 @@ def main():
             file_format = "anki"
         else:
             file_format = "text"
-        file2quiz.convert_quiz(input_dir, output_dir, file_format=file_format, save_files=True, **kwargs)
+        with file2quiz.trace.span("convert_quiz", cat="stage"):
+            file2quiz.convert_quiz(input_dir, output_dir, file_format=file_format, save_files=True, collect=False,
+                                   **kwargs)
 
     else:
         parser.print_help()
 
+    # Close diagnostics
+    file2quiz.logger.get_logger().close()
+
+    # Save trace
+    if args.trace:
+        file2quiz.trace.save_trace(os.path.abspath(args.trace), file2quiz.trace.stop_tracing())
+
 
 if __name__ == '__main__':
     main()
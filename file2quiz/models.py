@@ -0,0 +1,137 @@
+class Question:
+    """Multiple-choice question.
+
+    The answers are stored as a tuple, and the correct answer as an integer (-1: unknown), or as given if it is not
+    a number (e.g. the letters of `parse_solutions(letter2num=False)`). It can also be used as the dictionaries of
+    the JSON files (`question['answers']`, `question['correct_answer'] = 2`,...).
+    """
+    __slots__ = ("id", "question", "answers", "_correct_answer")
+
+    # Keys of the JSON schema
+    FIELDS = ("id", "question", "answers", "correct_answer")
+
+    def __init__(self, id, question, answers=(), correct_answer=None):
+        self.id = id
+        self.question = question
+        self.answers = tuple(answers)
+        self.correct_answer = correct_answer
+
+    @property
+    def correct_answer(self):
+        return None if self._correct_answer == -1 else self._correct_answer
+
+    @correct_answer.setter
+    def correct_answer(self, value):
+        if value is None:
+            value = -1
+        elif isinstance(value, str) and value.strip().lstrip("-").isdigit():
+            value = int(value)
+        self._correct_answer = value
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        setattr(self, key, tuple(value) if key == "answers" else value)
+
+    def __contains__(self, key):
+        return key in self.FIELDS
+
+    def get(self, key, default=None):
+        return self[key] if key in self.FIELDS else default
+
+    def keys(self):
+        return list(self.FIELDS)
+
+    def items(self):
+        return [(key, self[key]) for key in self.FIELDS]
+
+    def to_dict(self):
+        return {"id": self.id, "question": self.question, "answers": list(self.answers),
+                "correct_answer": self.correct_answer}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["id"], data["question"], data.get("answers", ()), data.get("correct_answer"))
+
+    def __eq__(self, other):
+        if isinstance(other, Question):
+            return (self.id, self.question, self.answers, self._correct_answer) == \
+                   (other.id, other.question, other.answers, other._correct_answer)
+        elif isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f"Question({self.id!r}, {self.question!r}, {list(self.answers)!r}, {self.correct_answer!r})"
+
+
+class Quiz:
+    """Questions of a quiz by ID (same interface as the dictionaries of the JSON files).
+
+    It is not a `dict`: use `to_dict()` to serialize it (e.g. `json.dump(quiz.to_dict(), f)`).
+    """
+    __slots__ = ("questions",)
+
+    def __init__(self, questions=None):
+        self.questions = {}  # {id: Question}
+        for question in questions or []:
+            self.add(question)
+
+    def add(self, question, key=None):
+        self.questions[question.id if key is None else key] = question
+
+    def __getitem__(self, key):
+        return self.questions[key]
+
+    def __setitem__(self, key, question):
+        # Questions can also be given as dictionaries (JSON schema)
+        self.questions[key] = question if isinstance(question, Question) else Question.from_dict(question)
+
+    def __delitem__(self, key):
+        del self.questions[key]
+
+    def __contains__(self, key):
+        return key in self.questions
+
+    def __iter__(self):
+        return iter(self.questions)
+
+    def __len__(self):
+        return len(self.questions)
+
+    def get(self, key, default=None):
+        return self.questions.get(key, default)
+
+    def keys(self):
+        return self.questions.keys()
+
+    def values(self):
+        return self.questions.values()
+
+    def items(self):
+        return self.questions.items()
+
+    def to_dict(self):
+        return {key: question.to_dict() for key, question in self.questions.items()}
+
+    @classmethod
+    def from_dict(cls, data):
+        quiz = cls()
+        for key, question in data.items():
+            quiz.add(Question.from_dict(question), key=key)
+        return quiz
+
+    def __eq__(self, other):
+        if isinstance(other, Quiz):
+            return self.questions == other.questions
+        elif isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f"Quiz({list(self.questions.values())!r})"
@@ -0,0 +1,353 @@
+import os
+import hashlib
+import itertools
+import threading
+import collections
+import concurrent.futures
+
+import numpy as np
+
+from file2quiz import utils, converter, reader, preprocess, commands, cache, trace
+
+PREPROCESS_ENGINES = ["unpaper", "numpy"]
+DEFAULT_BATCH_SIZE = 8  # Pages rasterized per call (in-memory pipeline)
+
+
+def get_default_workers():
+    cpu_count = os.cpu_count() or 1
+
+    # Tesseract can use several threads per process (OpenMP). If the user has limited them, respect it.
+    omp_limit = int(os.environ.get("OMP_THREAD_LIMIT") or 1)
+    return {
+        "raster_workers": max(1, cpu_count // 4),
+        "preprocess_workers": cpu_count,
+        "ocr_workers": max(1, cpu_count // omp_limit),
+    }
+
+
+class OCRPipeline:
+    """Page-parallel OCR of PDFs: rasterize => pre-process (unpaper) => OCR (Tesseract).
+
+    Each page moves on to the next stage as soon as the previous one is done, and every stage has its own
+    number of workers. The text of the pages is returned in the same order as in the document.
+
+    With the "numpy" pre-processing engine, the pages are rasterized in batches straight to memory, cleaned
+    in-process (`preprocess.image_cleaner`) and sent to Tesseract through stdin, without intermediate files.
+    """
+
+    def __init__(self, raster_workers=None, preprocess_workers=None, ocr_workers=None, ocr_cache=None):
+        defaults = get_default_workers()
+        self.raster_workers = raster_workers or defaults["raster_workers"]
+        self.preprocess_workers = preprocess_workers or defaults["preprocess_workers"]
+        self.ocr_workers = ocr_workers or defaults["ocr_workers"]
+
+        # Limit the number of concurrent tasks per stage
+        self.raster_sem = threading.BoundedSemaphore(self.raster_workers)
+        self.preprocess_sem = threading.BoundedSemaphore(self.preprocess_workers)
+        self.ocr_sem = threading.BoundedSemaphore(self.ocr_workers)
+
+        # Run one Tesseract thread per process when several pages are OCRed at once (unless the user says otherwise)
+        self.ocr_env = None
+        if self.ocr_workers > 1 and not os.environ.get("OMP_THREAD_LIMIT"):
+            self.ocr_env = dict(os.environ, OMP_THREAD_LIMIT="1")
+
+        # Text of the pages already OCRed (`cache.ContentCache`), keyed by the image sent to Tesseract
+        self.ocr_cache = ocr_cache
+
+    def run(self, filename, output_dir, no_preprocess=False, preprocess_engine="unpaper", tesseract_batch=1, **kwargs):
+        basedir, tail = os.path.split(filename)
+
+        # Process the pages in memory (if the number of pages is unknown, until the document ends)
+        if preprocess_engine == "numpy":
+            num_pages = converter.pdf_num_pages(filename, tool_timeout=kwargs.get("tool_timeout"))
+            return self.run_in_memory(filename, num_pages, no_preprocess, tesseract_batch=tesseract_batch, **kwargs)
+
+        # Create folders
+        scanned_dir = f"{output_dir}/ocr/scanned/{tail}"
+        preprocessed_dir = f"{output_dir}/ocr/preprocessed/{tail}"
+        # (the images of previous runs may come from other settings: the OCR cache is the one that skips pages)
+        utils.create_folder(scanned_dir, empty_folder=True)
+        utils.create_folder(preprocessed_dir, empty_folder=True) if not no_preprocess else None
+        utils.create_folder(f"{output_dir}/ocr/txt/{tail}")
+
+        # Get pages (if the number of pages is unknown, rasterize the whole document first)
+        num_pages = converter.pdf_num_pages(filename, tool_timeout=kwargs.get("tool_timeout"))
+        if num_pages is None:
+            print("\t- [WARNING] Unknown number of pages. Converting the whole PDF to images...")
+            converter.pdf2image(filename, scanned_dir, **kwargs)
+            scanned_files = utils.get_files(scanned_dir, extensions={'.tiff'})
+            num_pages = len(scanned_files)
+
+        # Process pages (as many pages in flight as workers)
+        print(f"\t- [INFO] Performing OCR on {num_pages} pages (workers: {self.raster_workers} raster, "
+              f"{self.preprocess_workers} pre-processing, {self.ocr_workers} OCR)...")
+        if tesseract_batch and tesseract_batch > 1:
+            return self._run_batches(filename, output_dir, num_pages, scanned_dir, preprocessed_dir, no_preprocess,
+                                     tesseract_batch, **kwargs)
+        max_workers = self.raster_workers + self.preprocess_workers + self.ocr_workers
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(self.process_page, filename, output_dir, page_i, num_pages, scanned_dir,
+                                       preprocessed_dir, no_preprocess, **kwargs) for page_i in range(num_pages)]
+            pages_txt = [future.result() for future in futures]  # Keep order
+        return pages_txt
+
+    def _run_batches(self, filename, output_dir, num_pages, scanned_dir, preprocessed_dir, no_preprocess,
+                     tesseract_batch, **kwargs):
+        # Pages are rasterized and pre-processed in parallel, and OCRed in groups (one Tesseract run per group)
+        basedir, tail = os.path.split(filename)
+        with concurrent.futures.ThreadPoolExecutor(self.raster_workers + self.preprocess_workers) as executor, \
+                concurrent.futures.ThreadPoolExecutor(self.ocr_workers) as ocr_executor:
+            futures = [(page_i, executor.submit(self.prepare_page, filename, page_i, num_pages, scanned_dir,
+                                                preprocessed_dir, no_preprocess, **kwargs))
+                       for page_i in range(num_pages)]
+            groups = [futures[i:i + tesseract_batch] for i in range(0, num_pages, tesseract_batch)]
+            ocr_futures = [ocr_executor.submit(self.ocr_files, group, num_pages, output_dir, tail, **kwargs)
+                           for group in groups]
+            pages_txt = [text for future in ocr_futures for text in future.result()]  # Keep order
+        return pages_txt
+
+    def process_page(self, filename, output_dir, page_i, num_pages, scanned_dir, preprocessed_dir, no_preprocess,
+                     **kwargs):
+        # A failed (or hung) tool only loses its page, not the whole document
+        try:
+            with trace.span("ocr_page", cat="ocr", page=page_i+1):
+                return self._process_page(filename, output_dir, page_i, num_pages, scanned_dir, preprocessed_dir,
+                                          no_preprocess, **kwargs)
+        except commands.CommandError as e:
+            print(f"\t- [ERROR] OCR failed: page {page_i+1} of {num_pages} ({e})")
+            return ""
+
+    def _process_page(self, filename, output_dir, page_i, num_pages, scanned_dir, preprocessed_dir, no_preprocess,
+                      **kwargs):
+        basedir, tail = os.path.split(filename)
+        images = self._prepare_page(filename, page_i, scanned_dir, preprocessed_dir, no_preprocess, **kwargs)
+
+        # Perform OCR
+        texts = []
+        with self.ocr_sem, trace.span("ocr", cat="ocr", page=page_i+1):
+            for image in images:
+                text = reader.read_image(image, output_dir, parent_dir=tail, empty_folder=False, env=self.ocr_env,
+                                         ocr_cache=self.ocr_cache, **kwargs)
+                texts.append(text)
+
+        print(f"\t- [INFO] OCR done: page {page_i+1} of {num_pages}")
+        return "\n\n".join(texts)
+
+    def _prepare_page(self, filename, page_i, scanned_dir, preprocessed_dir, no_preprocess, **kwargs):
+        basedir, tail = os.path.split(filename)
+
+        # Rasterize page
+        scanned_file = f"{scanned_dir}/page-{page_i}.tiff"
+        with self.raster_sem, trace.span("rasterize", cat="ocr", page=page_i+1):
+            if not os.path.exists(scanned_file):
+                converter.pdf2image(filename, scanned_dir, page=page_i, **kwargs)
+
+        # Pre-process page
+        if no_preprocess:
+            images = [scanned_file]
+        else:
+            with self.preprocess_sem, trace.span("preprocess", cat="ocr", page=page_i+1):
+                images = preprocess.preprocess_img_file(scanned_file, preprocessed_dir, page_i+1, **kwargs)
+
+            # The scanned page is not needed anymore (keep the disk usage bounded)
+            if images and os.path.exists(scanned_file):
+                os.remove(scanned_file)
+        return images
+
+    def prepare_page(self, filename, page_i, num_pages, scanned_dir, preprocessed_dir, no_preprocess, **kwargs):
+        # Images of a page, ready for the OCR (None if it failed)
+        try:
+            return self._prepare_page(filename, page_i, scanned_dir, preprocessed_dir, no_preprocess, **kwargs)
+        except commands.CommandError as e:
+            print(f"\t- [ERROR] OCR failed: page {page_i+1} of {num_pages} ({e})")
+            return None
+
+    def ocr_files(self, pages, num_pages, output_dir, tail, **kwargs):
+        """OCRs the images of several pages ([(page_i, future), ...]) with a single Tesseract run"""
+        pages = [(page_i, future.result()) for page_i, future in pages]
+        images = [image for page_i, images in pages for image in images or []]
+
+        # Pages already OCRed
+        keys = {image: reader.get_ocr_key(cache.file_hash(image), **kwargs) for image in images} if self.ocr_cache else {}
+        texts = self._get_cached(keys)
+        images = [image for image in images if image not in texts]
+
+        batch_texts = self._ocr_batch(images, converter.images2text, images, **kwargs)
+        if batch_texts is None:  # One by one
+            batch_texts = {}
+            for image in images:
+                try:
+                    with self.ocr_sem:
+                        batch_texts[image] = reader.read_image(image, output_dir, parent_dir=tail, empty_folder=False,
+                                                               env=self.ocr_env, **kwargs)
+                except commands.CommandError as e:
+                    print(f"\t- [ERROR] OCR failed: {os.path.basename(image)} ({e})")
+        self._set_cached(keys, batch_texts)
+        texts.update(batch_texts)
+
+        # Join the images of each page
+        pages_txt = []
+        for page_i, images in pages:
+            if images is not None:
+                pages_txt.append("\n\n".join(texts.get(image, "") for image in images))
+                print(f"\t- [INFO] OCR done: page {page_i+1} of {num_pages}")
+            else:
+                pages_txt.append("")
+        return pages_txt
+
+    def _ocr_batch(self, keys, func, *args, **kwargs):
+        # Returns {key: text}, or None if the batch failed (so that the pages can be OCRed one by one)
+        if len(keys) <= 1:
+            return None
+        try:
+            with self.ocr_sem, trace.span("ocr", cat="ocr", images=len(keys)):
+                texts = func(*args, env=self.ocr_env, **kwargs)
+            return dict(zip(keys, texts))
+        except (commands.CommandError, ValueError) as e:
+            print(f"\t- [WARNING] Batch OCR failed ({e}). OCRing the pages one by one...")
+            return None
+
+    def run_in_memory(self, filename, num_pages=None, no_preprocess=False, ocr_batch_size=None, tesseract_batch=1,
+                      **kwargs):
+        batch_size = ocr_batch_size or DEFAULT_BATCH_SIZE
+        tesseract_batch = max(1, tesseract_batch or 1)
+        print(f"\t- [INFO] Performing OCR on {num_pages or 'all the'} pages in memory (batches of {batch_size} pages; "
+              f"workers: {self.raster_workers} raster, {self.preprocess_workers} pre-processing, {self.ocr_workers} "
+              f"OCR)...")
+
+        # Pages are cleaned and OCRed (in groups of `tesseract_batch` pages) as soon as they are rasterized.
+        # Rasterization waits while too many pages are pending, so only a few pages are in memory at any time.
+        max_pending = 2 * (self.preprocess_workers + self.ocr_workers) + tesseract_batch
+        futures, pending, group = [], set(), []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.preprocess_workers) as preprocess_executor, \
+                concurrent.futures.ThreadPoolExecutor(max_workers=self.ocr_workers) as ocr_executor:
+            def submit_group():
+                future = ocr_executor.submit(self.ocr_images, list(group), num_pages, **kwargs)
+                futures.append(future)
+                pending.add(future)
+                group.clear()
+
+            for page_i, img in self.iter_pages(filename, num_pages, batch_size, **kwargs):
+                group.append((page_i, preprocess_executor.submit(self.preprocess_image, img, page_i, num_pages,
+                                                                 no_preprocess, **kwargs)))
+                if len(group) >= tesseract_batch:
+                    submit_group()
+                while len(pending) * tesseract_batch >= max_pending:
+                    done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            if group:
+                submit_group()
+            pages_txt = [text for future in futures for text in future.result()]  # Keep order
+        return pages_txt
+
+    def iter_pages(self, filename, num_pages=None, batch_size=None, **kwargs):
+        """Yields (page_i, image) as the pages are rasterized, in windows of `batch_size` pages (nothing is written
+        to disk). Pages that could not be rasterized are yielded as None.
+
+        At most `raster_workers` windows are rasterized ahead of the consumer. If the number of pages is unknown,
+        one window at a time, until the document ends.
+        """
+        batch_size = batch_size or DEFAULT_BATCH_SIZE
+        lookahead = self.raster_workers if num_pages is not None else 1
+        windows = itertools.count(0, batch_size)
+        if num_pages is not None:
+            windows = iter(range(0, num_pages, batch_size))
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=lookahead) as executor:
+            queue = collections.deque()
+
+            def submit():
+                first = next(windows, None)
+                if first is not None:
+                    last = first + batch_size - 1 if num_pages is None else min(first + batch_size, num_pages) - 1
+                    future = executor.submit(self.rasterize_batch, filename, first, last, num_pages, **kwargs)
+                    queue.append((first, last, future))
+
+            for _ in range(lookahead):
+                submit()
+            while queue:
+                first, last, future = queue.popleft()
+                images = future.result()
+
+                # End of a document of unknown length (short window, or a window past the last page)
+                if num_pages is None and (images is None or len(images) < last - first + 1):
+                    yield from enumerate(images or [], first)
+                    return
+
+                # Missing pages are not OCRed (but they keep their place)
+                images = images or []
+                yield from enumerate(images + [None] * (last - first + 1 - len(images)), first)
+                submit()
+
+    def rasterize_batch(self, filename, first, last, num_pages, **kwargs):
+        try:
+            with self.raster_sem, trace.span("rasterize", cat="ocr", pages=f"{first+1}-{last+1}"):
+                return preprocess.decode_pgm(converter.pdf2pgm(filename, first, last, **kwargs))
+        except (commands.CommandError, ValueError) as e:
+            if num_pages is not None or first == 0:  # Otherwise, it is past the end of the document
+                print(f"\t- [ERROR] Rasterization failed: pages {first+1}-{last+1} of {num_pages or '?'} ({e})")
+            return None
+
+    def preprocess_image(self, img, page_i, num_pages, no_preprocess, **kwargs):
+        if img is None or no_preprocess:
+            return img
+        with self.preprocess_sem, trace.span("preprocess", cat="ocr", page=page_i+1):
+            return preprocess.image_cleaner(img, **self.tile_budget(**kwargs))
+
+    def tile_budget(self, tile_workers=None, tile_memory=None, **kwargs):
+        # The tile workers and memory are shared by the pages pre-processed in parallel
+        tile_workers = max(1, (tile_workers or os.cpu_count() or 1) // self.preprocess_workers)
+        tile_memory = (tile_memory or preprocess.DEFAULT_TILE_MEMORY) / self.preprocess_workers
+        return dict(kwargs, tile_workers=tile_workers, tile_memory=tile_memory)
+
+    def ocr_images(self, pages, num_pages, **kwargs):
+        """OCRs several pages ([(page_i, future), ...]) with a single Tesseract run (a multi-page TIFF sent through
+        stdin). If it fails, the pages are OCRed one by one."""
+        pages = [(page_i, future.result()) for page_i, future in pages]
+        images = [(page_i, img) for page_i, img in pages if img is not None]
+
+        # Pages already OCRed
+        keys = {page_i: reader.get_ocr_key(image_hash(img), **kwargs) for page_i, img in images} if self.ocr_cache else {}
+        texts = self._get_cached(keys)
+        missing = [(page_i, img) for page_i, img in images if page_i not in texts]
+
+        batch_texts = self._ocr_batch([page_i for page_i, img in missing], converter.tiff2text,
+                                      preprocess.encode_tiff([img for page_i, img in missing]) if len(missing) > 1
+                                      else None, len(missing), **kwargs)
+        if batch_texts is None:  # One by one
+            batch_texts = {page_i: self.ocr_image(img, page_i, num_pages, **kwargs) for page_i, img in missing}
+        self._set_cached(keys, {page_i: text for page_i, text in batch_texts.items() if text is not None})
+        texts.update(batch_texts)
+
+        for page_i, img in images:
+            print(f"\t- [INFO] OCR done: page {page_i+1} of {num_pages or '?'}")
+        return [(texts.get(page_i) or "").strip() for page_i, img in pages]
+
+    def ocr_image(self, img, page_i, num_pages, **kwargs):
+        try:
+            with self.ocr_sem, trace.span("ocr", cat="ocr", page=page_i+1):
+                return converter.pgm2text(preprocess.encode_pgm(img), env=self.ocr_env, **kwargs)
+        except commands.CommandError as e:
+            print(f"\t- [ERROR] OCR failed: page {page_i+1} of {num_pages or '?'} ({e})")
+            return None
+
+    def _get_cached(self, keys):
+        # {id: text} of the keys ({id: key}) found in the cache
+        texts = {}
+        for id, key in keys.items():
+            cached = self.ocr_cache.get(key)
+            if cached is not None:
+                texts[id] = cached["text"]
+        return texts
+
+    def _set_cached(self, keys, texts):
+        for id, text in texts.items():
+            if id in keys:
+                self.ocr_cache.set(keys[id], {"text": text})
+
+
+def image_hash(img):
+    # Content hash of an image (its pixels and shape)
+    img = np.ascontiguousarray(img)
+    h = hashlib.sha256(f"{img.shape}{img.dtype}".encode("utf8"))
+    h.update(img.data)
+    return h.hexdigest()
@@ -1,6 +1,10 @@
 import os
+import glob
+import shlex
+from io import BytesIO
+import concurrent.futures
 
-from file2quiz import utils
+from file2quiz import utils, commands
 
 import numpy as np
 from scipy.ndimage import interpolation as inter
@@ -15,7 +19,8 @@ from deskew import determine_skew
 import cv2
 
 
-def preprocess_img_file(filename, savepath, page_i, crop=None, dpi=300, unpaper_args="", layout="single", *args, **kwargs):
+def preprocess_img_file(filename, savepath, page_i, crop=None, dpi=300, unpaper_args="", layout="single",
+                        tool_timeout=None, tool_retries=0, *args, **kwargs):
     head, tail = utils.get_tail(savepath)
     fname, ext = utils.get_fname(head)
 
@@ -38,11 +43,73 @@ def preprocess_img_file(filename, savepath, page_i, crop=None, dpi=300, unpaper_
 
     # Unpaper preprocessing
     savepath_tmp = f"{savepath}/{fname}_page{page_i}_%d.pgm"
-    cmd = f'unpaper --overwrite {unpaper_args} "{filename}" "{savepath_tmp}"'
-    os.system(cmd)
+    cmd = ['unpaper', '--overwrite'] + shlex.split(unpaper_args or "") + [filename, savepath_tmp]
+    commands.run_command(cmd, timeout=tool_timeout, retries=tool_retries)
 
+    # Return the pre-processed pages (unpaper can split a scanned page into several pages)
+    return get_preprocessed_files(savepath, fname, page_i)
 
-def image_cleaner(img, crop=None, deskew=False, **kwargs):
+
+def get_preprocessed_files(savepath, fname, page_i):
+    files = glob.glob(os.path.join(glob.escape(savepath), f"{glob.escape(fname)}_page{page_i}_*.pgm"))
+    return sorted(files, key=utils.tokenize)
+
+
+def decode_pgm(data):
+    """Reads a stream of binary PGM images (e.g. the output of `convert ... pgm:-`) into 8-bit arrays"""
+    images = []
+    pos = 0
+    while pos < len(data):
+        # Header: magic number, width, height and maximum value (comments start with "#")
+        fields = []
+        while len(fields) < 4:
+            while pos < len(data) and data[pos:pos+1].isspace():
+                pos += 1
+            if data[pos:pos+1] == b"#":
+                pos = data.index(b"\n", pos)
+                continue
+            end = pos
+            while end < len(data) and not data[end:end+1].isspace():
+                end += 1
+            fields.append(data[pos:end])
+            pos = end
+        pos += 1  # Single whitespace before the pixels
+
+        magic, width, height, maxval = fields[0], int(fields[1]), int(fields[2]), int(fields[3])
+        if magic != b"P5" or maxval > 255:
+            raise ValueError(f"Unsupported image format ({magic.decode(errors='replace')}, maxval={maxval})")
+
+        size = width * height
+        images.append(np.frombuffer(data, dtype=np.uint8, count=size, offset=pos).reshape(height, width))
+        pos += size
+
+        # Skip the padding between images
+        while pos < len(data) and data[pos:pos+1].isspace():
+            pos += 1
+    return images
+
+
+def encode_pgm(img):
+    # Binary PGM (8-bit grayscale): a short header followed by the raw pixels
+    img = np.ascontiguousarray(img, dtype=np.uint8)
+    return b"P5\n%d %d\n255\n" % (img.shape[1], img.shape[0]) + img.tobytes()
+
+
+def encode_tiff(images):
+    # Multi-page TIFF (uncompressed), so that many pages can be sent to Tesseract at once
+    pages = [Image.fromarray(np.ascontiguousarray(img, dtype=np.uint8)) for img in images]
+    f = BytesIO()  # (`io` is the module of scikit-image)
+    pages[0].save(f, format="TIFF", save_all=True, append_images=pages[1:])
+    return f.getvalue()
+
+
+# Pixels around each tile that the local filters need (denoising: 13, Sauvola: 17, median + blur: 4)
+TILE_MARGIN = 40
+TILE_BYTES_PER_PIXEL = 64  # Peak memory of the local filters (float64 buffers of Sauvola, denoising,...)
+DEFAULT_TILE_MEMORY = 512  # MB
+
+
+def image_cleaner(img, crop=None, deskew=False, tile_size=None, tile_workers=None, tile_memory=None, **kwargs):
     # Crop
     if crop:
         crop_h, crop_w = crop
@@ -58,16 +125,15 @@ def image_cleaner(img, crop=None, deskew=False, **kwargs):
     img = normalize(img)
     # Image.fromarray(img).show()
 
-    # Noise removal
-    img = noise_removal(img)
-    # Image.fromarray(img).show()
-
-    # Threshold
-    img = binarize(img)
+    # Noise removal, threshold and enhancements (on overlapping tiles processed in parallel, for large pages)
+    if tile_size:
+        img = apply_tiled(_clean_local, img, TILE_MARGIN, tile_size, tile_workers, tile_memory)
+    else:
+        img = _clean_local(img)
     # Image.fromarray(img).show()
 
-    # Enhancements
-    img = enhancements(img)
+    # Apply otsu (global threshold)
+    img = threshold_otsu(img)
     # Image.fromarray(img).show()
 
     # De-rotate (deskew)
@@ -76,6 +142,47 @@ def image_cleaner(img, crop=None, deskew=False, **kwargs):
     return img
 
 
+def _clean_local(img):
+    # Filters whose output only depends on a small neighborhood of each pixel
+    img = noise_removal(img)
+    img = binarize(img)
+    img = smooth(img)
+    return img
+
+
+def apply_tiled(func, img, margin, tile_size=1024, workers=None, max_memory=None):
+    """Applies a local filter to overlapping tiles of an image on a thread pool, and stitches the results.
+
+    Only the center of each tile is kept, so there are no seams as long as `margin` covers the neighborhood used by
+    the filter. The number of tiles processed at once is limited by `max_memory` (MB).
+    """
+    h, w = img.shape[:2]
+    if h <= tile_size and w <= tile_size:
+        return func(img)
+
+    # Tiles in flight (native filters release the GIL)
+    workers = workers or os.cpu_count() or 1
+    tile_bytes = (tile_size + 2 * margin) ** 2 * TILE_BYTES_PER_PIXEL
+    max_memory = (max_memory or DEFAULT_TILE_MEMORY) * 1024 * 1024
+    workers = max(1, min(workers, int(max_memory // tile_bytes)))
+
+    def process_tile(box):
+        y0, y1, x0, x1 = box
+        ty0, ty1, tx0, tx1 = max(0, y0 - margin), min(h, y1 + margin), max(0, x0 - margin), min(w, x1 + margin)
+        tile = func(img[ty0:ty1, tx0:tx1])
+        return box, tile[y0 - ty0:y1 - ty0, x0 - tx0:x1 - tx0]
+
+    boxes = [(y, min(y + tile_size, h), x, min(x + tile_size, w))
+             for y in range(0, h, tile_size) for x in range(0, w, tile_size)]
+    output = None
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        for (y0, y1, x0, x1), tile in executor.map(process_tile, boxes):
+            if output is None:
+                output = np.empty((h, w) + tile.shape[2:], dtype=tile.dtype)
+            output[y0:y1, x0:x1] = tile
+    return output
+
+
 def binarize(img, window_size=35):
     # cv_image = img_as_ubyte(img)
     # img = cv2.adaptiveThreshold(cv_image, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, window_size, 0)
@@ -119,20 +226,32 @@ def enhancements(img):
     # img = np.array(img * 255, dtype=np.uint8)
 
     # Median & blur filter
+    img = smooth(img)
+
+    # Apply otsu
+    img = threshold_otsu(img)
+    return img
+
+
+def smooth(img):
     img = Image.fromarray(img)
     img = img.filter(ImageFilter.MedianFilter(size=3))
     img = img.filter(ImageFilter.GaussianBlur(radius=1))
-    img = np.array(img)
+    return np.array(img)
 
-    # Apply otsu
+
+def threshold_otsu(img):
     thres = filters.threshold_otsu(img)
     img = img > thres
     img = np.array(img * 255, dtype=np.uint8)
     return img
 
 
-def get_angle_text(img, method="hough", limit=5.0, step=1.0):
-    if method == "hough":
+def get_angle_text(img, method="coarse-to-fine", limit=5.0, step=1.0):
+    if method == "coarse-to-fine":
+        angle, confidence = estimate_skew(img, limit=limit)
+        return angle
+    elif method == "hough":
         angle = determine_skew(img)
         if abs(angle) >= 90:  # Vertical lines detected
             angle = angle % 90
@@ -156,13 +275,90 @@ def get_angle_text(img, method="hough", limit=5.0, step=1.0):
     return best_angle
 
 
-def skew_rotation(img, fillcolor='white', orientation='portrait'):
+def estimate_skew(img, limit=5.0, coarse_step=0.5, fine_step=0.05, coarse_size=512, fine_size=1600,
+                  max_points=200000):
+    """Returns the angle (degrees) that straightens the lines of text of a page, and the confidence of the estimation
+    (0: no dominant angle, e.g. blank pages; close to 1: sharp peak).
+
+    All the angles within +-`limit` are scored on a downsampled page (longest side: `coarse_size`), then the best one
+    is refined around +-`coarse_step` at a higher resolution (`fine_size`). The pages are not rotated: the
+    projection profiles of all the angles are computed at once by shearing the coordinates of the ink.
+    """
+    img = np.asarray(img)
+    if img.ndim == 3:
+        img = np.array(rgb2gray(img) * 255, dtype=np.uint8)
+
+    # Ink mask (dark pixels), thresholded on a small version of the page
+    coarse_factor = max(1, int(np.ceil(max(img.shape) / coarse_size)))
+    small = _downsample(img.astype(np.float32), coarse_factor)
+    if small.max() - small.min() < 1:  # Blank page
+        return 0.0, 0.0
+    ink = (img < filters.threshold_otsu(small)).astype(np.float32)
+
+    # Coarse search
+    angles = np.arange(-limit, limit + coarse_step / 2, coarse_step)
+    scores = _projection_scores(_downsample(ink, coarse_factor), angles, max_points)
+    best = int(np.argmax(scores))
+    confidence = float((scores[best] - np.median(scores)) / scores[best]) if scores[best] > 0 else 0.0
+
+    # Refine around the best angle
+    fine_factor = max(1, int(np.ceil(max(img.shape) / fine_size)))
+    angles = np.arange(angles[best] - coarse_step, angles[best] + coarse_step + fine_step / 2, fine_step)
+    scores = _projection_scores(_downsample(ink, fine_factor), angles, max_points)
+    angle = float(np.clip(angles[int(np.argmax(scores))], -limit, limit))
+    return round(angle, 4), confidence
+
+
+def _downsample(img, factor):
+    # Mean of `factor`x`factor` blocks
+    if factor <= 1:
+        return img
+    h, w = (img.shape[0] // factor) * factor, (img.shape[1] // factor) * factor
+    return img[:h, :w].reshape(h // factor, factor, w // factor, factor).mean(axis=(1, 3))
+
+
+def _projection_scores(ink, angles, max_points=200000, max_elements=4000000):
+    # Score of the horizontal projection profile of the page rotated by each angle (sharper rows, higher scores)
+    ys, xs = np.nonzero(ink)
+    weights = ink[ys, xs]
+    if len(ys) > max_points:  # Same sample for all the angles
+        idx = np.random.default_rng(0).choice(len(ys), max_points, replace=False)
+        ys, xs, weights = ys[idx], xs[idx], weights[idx]
+    if len(ys) == 0:
+        return np.zeros(len(angles))
+
+    # Rows of the ink after rotating the page (a shear is enough for small angles)
+    ys, xs = ys.astype(np.float32), xs.astype(np.float32)
+    offset = int(np.ceil(ink.shape[1] * np.tan(np.radians(np.abs(angles).max())))) + 1
+    num_rows = ink.shape[0] + 2 * offset
+
+    scores = np.empty(len(angles))
+    chunk = max(1, max_elements // len(ys))
+    for start in range(0, len(angles), chunk):
+        tans = np.tan(np.radians(angles[start:start + chunk])).astype(np.float32)
+        rows = np.rint(ys[None, :] - xs[None, :] * tans[:, None]).astype(np.int64) + offset
+        rows += (np.arange(len(tans)) * num_rows)[:, None]  # One histogram per angle
+        hist = np.bincount(rows.ravel(), weights=np.tile(weights, len(tans)), minlength=len(tans) * num_rows)
+        hist = hist.reshape(len(tans), num_rows)
+        scores[start:start + chunk] = np.sum(np.diff(hist, axis=1) ** 2, axis=1)
+    return scores
+
+
+def skew_rotation(img, fillcolor='white', orientation='portrait', method="coarse-to-fine", min_angle=0.1,
+                  min_confidence=0.05):
     # Rotate if needed
     h, w = img.shape[0], img.shape[1]
     if (orientation == "portrait" and h < w) or (orientation == "landscape" and h > w):
         img = img.T
 
-    angle = get_angle_text(img)
+    # Skip the pages that are straight enough (or whose angle is unclear)
+    if method == "coarse-to-fine":
+        angle, confidence = estimate_skew(img)
+        if abs(angle) < min_angle or confidence < min_confidence:
+            print("\t- [INFO] No rotation needed: {:.2f}º (confidence: {:.2f})".format(angle, confidence))
+            return img
+    else:
+        angle = get_angle_text(img, method=method)
     print("\t- [INFO] Rotating image: {:.2f}º".format(angle))
 
     # Rotate and add custom background
@@ -1,10 +1,23 @@
+import io
 import os
 import regex
 import string
+import bisect
+import heapq
+import functools
+import contextlib
+import concurrent.futures
 from operator import itemgetter
+from difflib import SequenceMatcher
 
 from file2quiz import reader
 from file2quiz import utils
+from file2quiz import build
+from file2quiz import trace
+from file2quiz import logger
+from file2quiz import store
+from file2quiz.logger import Lazy
+from file2quiz.models import Question, Quiz
 
 RGX_SPLITTER = r"[ ]*[\.\)\-\]\t]+" #r"[\)\-\]\t ]+"  # Exclude "dots" as they can appear in the ID.
 RGX_QUESTION = r"^[\(\[ ]*(?:\d+\.)*\d+"
@@ -12,32 +25,99 @@ RGX_ANSWER = r"^[\(\[ ]*?(?:(?:\d+\.)*\d+)*[a-zA-Z]{1}"
 DELIMITER = "\n@\n@\n@\n"
 
 
+class ParserProfile:
+    """Compiled patterns used to split a quiz into questions, answers and solutions.
+
+    Profiles are cached, so use `get_parser_profile()` (or `profile.derive()` for per-file overrides)
+    instead of creating new ones.
+    """
+
+    def __init__(self, mode="auto", token_answer=None, rgx_question=RGX_QUESTION, rgx_answer=RGX_ANSWER,
+                 rgx_splitter=RGX_SPLITTER):
+        self.mode = mode
+        self.single_line = bool(mode == "single-line")
+        self.token_answer = token_answer
+        self.rgx_question = rgx_question
+        self.rgx_answer = rgx_answer
+        self.rgx_splitter = rgx_splitter
+
+        # Block IDs
+        self.rgx_question_id = regex.compile(fr"^({rgx_question})({rgx_splitter}?)(.*)")
+        self.rgx_answer_id = regex.compile(fr"^({rgx_answer})({rgx_splitter}?)(.*)")
+        self.rgx_leading_dots = regex.compile(r"^\.*")
+        self.rgx_trailing_dots = regex.compile(r"\.*$")
+
+        # Split blocks of questions/answers
+        self.rgx_split_questions = regex.compile(fr"({rgx_question})({rgx_splitter}.*$)", regex.MULTILINE)
+        self.rgx_split_answers = regex.compile(fr"({rgx_answer})({rgx_splitter}.*$)", regex.MULTILINE)
+        self.rgx_semianswer = regex.compile(fr"({rgx_answer})", regex.MULTILINE)  # 12a, 23.3abu
+
+        # Clean block contents
+        self.rgx_leading_punct = regex.compile(r"^([\p{posix_punct}\s]*)(?=[\p{posix_punct}])")
+        self.rgx_leading_punct_special = regex.compile(r"^([\p{posix_punct}\s]*)(?=[\-\+\¿¡\"\'<>=]|>=|<=|==|\p{Latin})")
+        self.rgx_leading_signs = regex.compile(r"^([\-\+]*)(?! *\d)")
+        self.rgx_has_content = regex.compile(r"(\p{Latin}|\d)")
+
+        # Split sections (questions/solutions)
+        self.rgx_token_answer = regex.compile(f"{token_answer}", regex.IGNORECASE | regex.MULTILINE) if token_answer else None
+        self.rgx_solutions = regex.compile(r'\b(\d+[\d\.]*?)[\W\s]*([a-zA-Z]{1})(?!\w)', regex.MULTILINE)
+
+    def derive(self, **overrides):
+        params = dict(mode=self.mode, token_answer=self.token_answer, rgx_question=self.rgx_question,
+                      rgx_answer=self.rgx_answer, rgx_splitter=self.rgx_splitter)
+        params.update(overrides)
+        return get_parser_profile(**params)
+
+
+@functools.lru_cache(maxsize=128)
+def get_parser_profile(mode="auto", token_answer=None, rgx_question=RGX_QUESTION, rgx_answer=RGX_ANSWER,
+                       rgx_splitter=RGX_SPLITTER):
+    return ParserProfile(mode, token_answer, rgx_question, rgx_answer, rgx_splitter)
+
+
+# Sequences of accents/quotes written with spacing characters ("`a", "´´", "·º",...). (order is important)
+CLEANUP_SEQUENCES = [
+    ('`a', 'à'), ('´a', 'á'), ('¨a', 'ä'),
+    ('`e', 'è'), ('´e', 'é'), ('¨e', 'ë'),
+    ('`i', 'ì'), ('´i', 'í'), ('¨i', 'ï'),
+    ('`o', 'ò'), ('´o', 'ó'), ('¨o', 'ö'),
+    ('`u', 'ù'), ('´u', 'ú'), ('¨u', 'ü'),
+    ('¨', '\"'),
+    ('``', '\"'),
+    ('´´', '\"'),
+    ('´', ''),
+    ('`', ''),
+    ('·º', 'º'),
+]
+RGX_CLEANUP_SEQUENCES = regex.compile(r"[`´¨·]+[aeiouº]?")
+
+# Single characters to replace or remove (applied along with the allowed-characters filter)
+CLEANUP_CHARS = utils.CharTable(utils.RGX_ALLOWED_CHAR, mapping={
+    '“': '\"', '”': '\"',
+    '‘': '\'', '’': '\'',
+    '…': '...',
+    '\ufeff': None,
+})
+RGX_EMPTY_LINES = regex.compile(r"\n{2,}")
+
+
+@functools.lru_cache(maxsize=1024)
+def clean_sequence(text):
+    for old, new in CLEANUP_SEQUENCES:
+        text = text.replace(old, new)
+    return text
+
+
 def preprocess_text(text, blacklist=None, mode="auto", from_ocr=False):
     # Remove unwanted characters
-    text = text \
-        .replace('`a', 'à').replace('´a', 'á').replace('¨a', 'ä')\
-        .replace('`e', 'è').replace('´e', 'é').replace('¨e', 'ë')\
-        .replace('`i', 'ì').replace('´i', 'í').replace('¨i', 'ï')\
-        .replace('`o', 'ò').replace('´o', 'ó').replace('¨o', 'ö')\
-        .replace('`u', 'ù').replace('´u', 'ú').replace('¨u', 'ü')\
-        .replace('¨', '\"') \
-        .replace('“', '\"').replace('”', '\"') \
-        .replace('‘', '\'').replace('’', '\'') \
-        .replace('``', '\"') \
-        .replace('´´', '\"') \
-        .replace('’', '\'') \
-        .replace('´', '') \
-        .replace('`', '') \
-        .replace('…', '...') \
-        .replace('·º', 'º') \
-        .replace('\ufeff', '')
+    # The sequences can only interact with their neighbours, so each run is cleaned on its own (cached)
+    text = RGX_CLEANUP_SEQUENCES.sub(lambda m: clean_sequence(m.group()), text)
 
     # Only latin characters + numbers + punctuation + whitespaces. (this also includes emojis)
-    text = utils.normalize_text(text)
+    text = text.translate(CLEANUP_CHARS)
 
     # Strip whitespace line-by-line
-    lines = [l.strip() for l in text.split('\n')]
-    text = "\n".join(lines)
+    lines = (l.strip() for l in text.split('\n'))
 
     # Specific pre-processing
     if mode == "auto":
@@ -46,10 +126,9 @@ def preprocess_text(text, blacklist=None, mode="auto", from_ocr=False):
         # text = regex.sub(pattern, " ", text)
 
         # Remove empty lines
-        lines = [l for l in text.split('\n') if l.strip()]
-        text = "\n".join(lines)
+        text = "\n".join([l for l in lines if l])
     else:
-        text = regex.sub(r"\n{2,}", "\n\n", text)
+        text = RGX_EMPTY_LINES.sub("\n\n", "\n".join(lines))
 
     # Remove blacklisted words
     text = utils.replace_words(text, blacklist, replace="") if blacklist else text
@@ -117,12 +196,12 @@ def preprocess_text(text, blacklist=None, mode="auto", from_ocr=False):
     return text
 
 
-def get_block_id(block, is_question):
+def get_block_id(block, is_question, profile=None):
+    profile = profile or get_parser_profile()
     block = block.replace('\n', ' ')  # Remove break lines (this regex has problems with it)
 
-    ID_RGX = RGX_QUESTION if is_question else RGX_ANSWER
-    pattern = regex.compile(fr"^({ID_RGX})({RGX_SPLITTER}?)(.*)")
-    m = regex.search(pattern, block)
+    pattern = profile.rgx_question_id if is_question else profile.rgx_answer_id
+    m = pattern.search(block)
 
     if not m:
         return None, block
@@ -131,14 +210,15 @@ def get_block_id(block, is_question):
         b_text = m.group(3)
 
         # Normalize ID
-        b_id = regex.sub(r"^\.*", "", b_id)  # Remove leading dots
-        b_id = regex.sub(r"\.*$", "", b_id)  # Remove trailing dots
+        b_id = profile.rgx_leading_dots.sub("", b_id)  # Remove leading dots
+        b_id = profile.rgx_trailing_dots.sub("", b_id)  # Remove trailing dots
         b_id = utils.remove_whitespace(b_id)  # Just in case
         b_id = b_id.lower()
         return b_id, b_text
 
 
-def preprocess_questions_block(text, single_line=False, length_thres=30):
+def preprocess_questions_block(text, single_line=False, length_thres=30, profile=None):
+    profile = profile or get_parser_profile()
     if single_line:
         new_raw_questions = text.split("\n\n")
         new_raw_questions = [q.strip() for q in new_raw_questions if len(q.strip()) > length_thres]
@@ -152,21 +232,18 @@ def preprocess_questions_block(text, single_line=False, length_thres=30):
         # text = regex.sub(rgx_fix_question, r") \2", text)
 
         # Split block of questions
-        pattern = regex.compile(fr"({RGX_QUESTION})({RGX_SPLITTER}.*$)", regex.MULTILINE)
-        text = regex.sub(pattern, rf"{DELIMITER}\1\2", text)
+        text = profile.rgx_split_questions.sub(rf"{DELIMITER}\1\2", text)
         raw_questions = text.split(DELIMITER)
         raw_questions = raw_questions[1:] if raw_questions else []  # Ignore first chunk (delimiter)
 
-        # Look potential answers detected as questions => 12a, 23.3abu
-        pattern_semians = regex.compile(fr"({RGX_ANSWER})", regex.MULTILINE)
-
         # Join short questions
         new_raw_questions = []
         for i, q in enumerate(raw_questions):
             q = q.strip()
-            q_id, content = get_block_id(q, is_question=True)
+            q_id, content = get_block_id(q, is_question=True, profile=profile)
 
-            if regex.match(pattern_semians, q):  # 6.1a, 5.3b
+            # Look potential answers detected as questions => 12a, 23.3abu
+            if profile.rgx_semianswer.match(q):  # 6.1a, 5.3b
                 last_idx = len(new_raw_questions) - 1
                 new_raw_questions[last_idx] += f"\n{q}"
             elif i > 0 and len(content) < length_thres:  # eg.: 50.000
@@ -175,41 +252,46 @@ def preprocess_questions_block(text, single_line=False, length_thres=30):
                 new_raw_questions[last_idx] += f"\n{q}"
 
                 # Print action
-                print(f"\t- [WARNING] Question too short. Inferred as answer chunk [chunk: '{q_summary(('###', q))}']")
+                logger.warning("question_too_short", "Question too short. Inferred as answer chunk [chunk: '%s']",
+                               Lazy(q_summary, ('###', q)))
             else:
                 new_raw_questions.append(q)
 
     return new_raw_questions
 
 
-def split_id_from_text(item, is_question):
-    b_id, content = get_block_id(item, is_question)
+def split_id_from_text(item, is_question, profile=None):
+    profile = profile or get_parser_profile()
+    b_id, content = get_block_id(item, is_question, profile=profile)
     # Remove punctuation and whispaces except last character
-    content_clean = regex.sub(r"^([\p{posix_punct}\s]*)(?=[\p{posix_punct}])", '', content)
+    content_clean = profile.rgx_leading_punct.sub('', content)
     # Remove the rest of the punctuation except if it is a set of special character
-    content_clean = regex.sub(r"^([\p{posix_punct}\s]*)(?=[\-\+\¿¡\"\'<>=]|>=|<=|==|\p{Latin})", '', content_clean)
+    content_clean = profile.rgx_leading_punct_special.sub('', content_clean)
     # Remove minus and pluses if it's not a number
-    content_clean = regex.sub(r"^([\-\+]*)(?! *\d)", '', content_clean)  # Remove hyphens
+    content_clean = profile.rgx_leading_signs.sub('', content_clean)  # Remove hyphens
     return b_id, content_clean
 
 
-def preprocess_answers_block(text, single_line=False, num_expected_answers=None):
+def preprocess_answers_block(text, single_line=False, num_expected_answers=None, profile=None):
+    profile = profile or get_parser_profile()
+
     # Get blocks
     raw_blocks = text.split('\n')
     raw_blocks = [b for b in raw_blocks if b.strip()]
 
     if single_line:  # auto
         if len(raw_blocks) > num_expected_answers + 1 or len(raw_blocks) > 8:
-            print(f"\t- [WARNING] Too many answers ({len(raw_blocks)-1}). Skipping question [Q: {q_summary(('###', text))}]")
+            logger.warning("too_many_answers", "Too many answers (%d). Skipping question [Q: %s]", len(raw_blocks)-1,
+                           Lazy(q_summary, ('###', text)))
             return None
     else:  # auto
-        pattern_ans = regex.compile(fr"({RGX_ANSWER})({RGX_SPLITTER}.*$)", regex.MULTILINE)
+        pattern_ans = profile.rgx_split_answers
 
         # Check if the answers contains IDs "a) b) c)..."
         # Add them if there is none answer id
         if num_expected_answers and num_expected_answers+1 == len(raw_blocks):
             for i, item in enumerate(raw_blocks[1:]):
-                match = regex.match(pattern_ans, item)
+                match = pattern_ans.match(item)
                 if not match:
                     raw_blocks[i+1] = f"{string.ascii_lowercase[i]}) {item}"
 
@@ -221,86 +303,134 @@ def preprocess_answers_block(text, single_line=False, num_expected_answers=None)
         # text = regex.sub(pattern_space, r") ", text)
 
         # Split answers
-        stext = regex.sub(pattern_ans, rf"{DELIMITER}\1\2", text)
+        stext = pattern_ans.sub(rf"{DELIMITER}\1\2", text)
         raw_blocks = stext.split(DELIMITER)
 
     # Remove hyphens excepts if it's a number
     blocks_cleaned = []
     for i, b in enumerate(raw_blocks):
-        b_id, content = split_id_from_text(b, is_question=bool(i == 0))
+        b_id, content = split_id_from_text(b, is_question=bool(i == 0), profile=profile)
         if content.strip():
             blocks_cleaned.append((b_id, content))
     return blocks_cleaned
 
 
-def normalize_question(text, sentence_case=True):
-    # Remove space before quotation mark or colons
-    text = regex.sub(r"([\s,;:\-\.\?]*)([\?:])(\s*)$", r"\2", text)
+class NormalizationEngine:
+    """Normalization rules for questions and answers, compiled once per process.
 
-    # Generic normalization
-    text = normalize_generic(text, sentence_case)
-    return text
+    Use `get_normalizer()` to get the shared instance instead of creating new ones.
+    """
 
+    def __init__(self):
+        # Reserved words to not change
+        si_prefixes = ['', 'Y', 'Z', 'E', 'P', 'T', 'G', 'M', 'k', 'h', 'd', 'c', 'm', 'μ', 'n', 'p', 'f', 'a', 'z', 'y']
+        si_units = ['s', 'm', 'k', 'a', 'k', 'mol', 'cd']
+        si_units_der = ['rad', 'sr', 'Hz', 'N', 'Pa', 'J', 'W', 'C', 'V', 'F', 'Ω', 'S', 'Wb', 'T', 'H', '°C', 'lm', 'lx',
+                        'Bq', 'Gy', 'Sv', 'kat'
+                                          'l', 'eV', 'º', 'm2', 'm3', 'm²', 'm³']
+        self.reserved_words = frozenset([f"{p}{u}" for p in si_prefixes for u in si_units + si_units_der])
 
-def normalize_answer(text, sentence_case=True):
-    # Remove final period
-    text = regex.sub(r"([\s\.]*)$", "", text)
+        # Question/answer endings
+        self.rgx_question_end = regex.compile(r"([\s,;:\-\.\?]*)([\?:])(\s*)$")
+        self.rgx_answer_end = regex.compile(r"([\s\.]*)$")
 
-    # Generic normalization
-    text = normalize_generic(text, sentence_case)
-    return text
+        # Broken lines
+        self.rgx_broken_lines = regex.compile(r"(?<=\p{Latin}+)( *[\-\u2012\u2013\u2014\u2015\u2053]+\s+)(?=\p{Latin}+)", regex.MULTILINE)
 
+        # Space before/after a parentheses, quotation mark, etc
+        self.rgx_space_open = regex.compile(r"(?<=[\(\[\{\¿\¡]+)(\s+)")
+        self.rgx_space_close = regex.compile(r"(\s+)(?=[\)\]\}\?\!\,\.]+)")
 
-def normalize_generic(text, sentence_case=True):
-    # Reserved words to not change
-    si_prefixes = ['', 'Y', 'Z', 'E', 'P', 'T', 'G', 'M', 'k', 'h', 'd', 'c', 'm', 'μ', 'n', 'p', 'f', 'a', 'z', 'y']
-    si_units = ['s', 'm', 'k', 'a', 'k', 'mol', 'cd']
-    si_units_der = ['rad', 'sr', 'Hz', 'N', 'Pa', 'J', 'W', 'C', 'V', 'F', 'Ω', 'S', 'Wb', 'T', 'H', '°C', 'lm', 'lx',
-                    'Bq', 'Gy', 'Sv', 'kat'
-                                      'l', 'eV', 'º', 'm2', 'm3', 'm²', 'm³']
-    possible_units = set([f"{p}{u}" for p in si_prefixes for u in si_units + si_units_der])
-    RESERVED_WORDS = possible_units
-
-    # Remove whitespaces
-    text = utils.remove_whitespace(text)
+        # Metric rules (remove ampere "a" to avoid problems)
+        self.rgx_metrics = regex.compile(r"(?<=\d+)(\s*)(?=(K|H|D|Da|d|c|m)?(m|s|g|hz|w|v|k|t|min|h|n|Pa|bar)(2|3|²|³)?(?!\p{Latin}))", regex.IGNORECASE|regex.MULTILINE)
+
+        # Number signs (+, -, >, <, >=, <=)
+        self.rgx_num_signs = regex.compile(r"(?<=\+|\-)(\s*)(?=\d+)", regex.IGNORECASE | regex.MULTILINE)
+        self.rgx_num_comparison = regex.compile(r"(?<=<|<=|>|>=)(\s*)(?=[\+|\-]?\d+)", regex.IGNORECASE | regex.MULTILINE)
+
+        # Percentages and temperatures
+        self.rgx_percentage = regex.compile(r"(\d+) *%", regex.IGNORECASE | regex.MULTILINE)
+        self.rgx_temp1 = regex.compile(r"(\d+) *º *([CKF])", regex.IGNORECASE|regex.MULTILINE)
+        self.rgx_temp2 = regex.compile(r" +T *ª", regex.MULTILINE)
+
+    def normalize_question(self, text, sentence_case=True):
+        # Remove space before quotation mark or colons
+        text = self.rgx_question_end.sub(r"\2", text)
+
+        # Generic normalization
+        return self.normalize_generic(text, sentence_case)
+
+    def normalize_answer(self, text, sentence_case=True):
+        # Remove final period
+        text = self.rgx_answer_end.sub("", text)
+
+        # Generic normalization
+        return self.normalize_generic(text, sentence_case)
+
+    def normalize_generic(self, text, sentence_case=True):
+        # Remove whitespaces
+        text = utils.remove_whitespace(text)
+
+        # First letter upper case
+        if sentence_case and len(text) > 2:
+            first_word = text.split()[0] if text else ""
+            text = text[0].upper() + text[1:] if first_word not in self.reserved_words else text
+
+        # Broken lines
+        text = self.rgx_broken_lines.sub(r"", text)
 
-    # First letter upper case
-    if sentence_case and len(text) > 2:
-        first_word = text.split()[0] if text else ""
-        text = text[0].upper() + text[1:] if first_word not in RESERVED_WORDS else text
+        # Remove space before/after a parentheses, quotation mark, etc
+        text = self.rgx_space_open.sub('', text)
+        text = self.rgx_space_close.sub('', text)
 
-    # Broken lines
-    broken_lines = regex.compile(r"(?<=\p{Latin}+)( *[\-\u2012\u2013\u2014\u2015\u2053]+\s+)(?=\p{Latin}+)", regex.MULTILINE)
-    text = regex.sub(broken_lines, r"", text)
+        # Metric rules
+        text = self.rgx_metrics.sub('', text)
 
-    # Remove space before/after a parentheses, quotation mark, etc
-    text = regex.sub(r"(?<=[\(\[\{\¿\¡]+)(\s+)", '', text)
-    text = regex.sub(r"(\s+)(?=[\)\]\}\?\!\,\.]+)", '', text)
+        # Number signs
+        text = self.rgx_num_signs.sub('', text)
 
-    # Metric rules (remove ampere "a" to avoid problems)
-    rgx_metrics = regex.compile(r"(?<=\d+)(\s*)(?=(K|H|D|Da|d|c|m)?(m|s|g|hz|w|v|k|t|min|h|n|Pa|bar)(2|3|²|³)?(?!\p{Latin}))", regex.IGNORECASE|regex.MULTILINE)
-    text = regex.sub(rgx_metrics, '', text)
+        # Other number signs (>, <, >=, <=)
+        text = self.rgx_num_comparison.sub(r'', text)
 
-    # Number signs
-    rgx_num_signs = regex.compile(r"(?<=\+|\-)(\s*)(?=\d+)", regex.IGNORECASE | regex.MULTILINE)
-    text = regex.sub(rgx_num_signs, '', text)
+        # Percentage
+        text = self.rgx_percentage.sub(r'\1%', text)
 
-    # Other number signs (>, <, >=, <=)
-    rgx_percentage = regex.compile(r"(?<=<|<=|>|>=)(\s*)(?=[\+|\-]?\d+)", regex.IGNORECASE | regex.MULTILINE)
-    text = regex.sub(rgx_percentage, r'', text)
+        # Temperature 1
+        text = self.rgx_temp1.sub(r'\1º\2', text)
 
-    # Percentage
-    rgx_percentage = regex.compile(r"(\d+) *%", regex.IGNORECASE | regex.MULTILINE)
-    text = regex.sub(rgx_percentage, r'\1%', text)
+        # Temperature 2
+        text = self.rgx_temp2.sub(r' Tª', text)
+        return text.strip()
 
-    # Temperature 1
-    rgx_temp = regex.compile(r"(\d+) *º *([CKF])", regex.IGNORECASE|regex.MULTILINE)
-    text = regex.sub(rgx_temp, r'\1º\2', text)
+    def normalize_many(self, texts, kind="question", sentence_case=True):
+        # Select normalization
+        if kind == "question":
+            normalize = self.normalize_question
+        elif kind == "answer":
+            normalize = self.normalize_answer
+        elif kind == "generic":
+            normalize = self.normalize_generic
+        else:
+            raise ValueError(f"Unknown normalization kind: '{kind}'")
+
+        return [normalize(text, sentence_case) for text in texts]
+
+
+@functools.lru_cache(maxsize=None)
+def get_normalizer():
+    return NormalizationEngine()
+
+
+def normalize_question(text, sentence_case=True):
+    return get_normalizer().normalize_question(text, sentence_case)
+
+
+def normalize_answer(text, sentence_case=True):
+    return get_normalizer().normalize_answer(text, sentence_case)
 
-    # Temperature 2
-    rgx_temp = regex.compile(r" +T *ª", regex.MULTILINE)
-    text = regex.sub(rgx_temp, r' Tª', text)
-    return text.strip()
+
+def normalize_generic(text, sentence_case=True):
+    return get_normalizer().normalize_generic(text, sentence_case)
 
 
 def q_summary(item, length=50):
@@ -311,7 +441,12 @@ def q_summary(item, length=50):
 
 
 def build_quiz(questions, solutions=None):
-    quiz = {}
+    # Same JSON schema as the files (see `_build_quiz` for the compact model)
+    return _build_quiz(questions, solutions).to_dict()
+
+
+def _build_quiz(questions, solutions=None):
+    quiz = Quiz()
 
     # Add questions
     for q in questions:
@@ -320,21 +455,16 @@ def build_quiz(questions, solutions=None):
 
         # Look for collitions
         if q_id not in quiz:
-            quiz[q_id] = {
-                'id': question[0],
-                'question': question[1],
-                'answers': [ans[1] for ans in answers],
-                'correct_answer': None
-            }
+            quiz.add(Question(question[0], question[1], [ans[1] for ans in answers]))
         else:
-            print(f"\t- [WARNING] Question ID collition. [Q: {q_summary(question)}")
+            logger.warning("question_id_collision", "Question ID collition. [Q: %s", Lazy(q_summary, question))
 
     # Add answers
     if solutions:
         for ans in solutions:
             id_question, answer = ans
             if id_question in quiz:
-                quiz[id_question]['correct_answer'] = answer
+                quiz[id_question].correct_answer = answer
             else:
                 pass
                 # It's already notified aboved
@@ -343,7 +473,7 @@ def build_quiz(questions, solutions=None):
 
 
 def parse_quiz(input_dir, output_dir, token_answer=None, num_answers=None, mode="auto",
-               save_files=False, *args, **kwargs):
+               save_files=False, *args, jobs=1, quiz_format="json", **kwargs):
     print(f'##############################################################')
     print(f'### QUIZ PARSER')
     print(f'##############################################################\n')
@@ -354,59 +484,86 @@ def parse_quiz(input_dir, output_dir, token_answer=None, num_answers=None, mode=
     # Get blacklist
     blacklist = reader.read_blacklist(os.path.join(output_dir, "blacklist.txt"))
 
+    # Get build manifest (incremental builds)
+    manifest = build.get_manifest(output_dir, **kwargs) if save_files else None
+    empty_folder = manifest is None or not manifest.has_stage("quiz")
+
     # Create quizzes folder
-    quizzes_dir = os.path.join(output_dir, "quizzes/json")
-    utils.create_folder(quizzes_dir, empty_folder=True) if save_files else None
+    quizzes_dir = os.path.join(output_dir, f"quizzes/{quiz_format}")
+    utils.create_folder(quizzes_dir, empty_folder=empty_folder) if save_files else None
 
     # Create txt preprocessed
     preprocessed_dir = kwargs.get("save_txt_preprocessed")
     if preprocessed_dir:
         preprocessed_dir = os.path.join(output_dir, "txt_preprocessed")
-        utils.create_folder(preprocessed_dir, empty_folder=True) if save_files else None
+        utils.create_folder(preprocessed_dir, empty_folder=empty_folder) if save_files else None
 
     # Check answer token
     if token_answer and utils.has_regex(token_answer):
         print("\t- [INFO] Your answer token contains regular expressions. Regex knowledge is required.")
 
+    # Shared parameters (sent once to each worker)
+    params = dict(output_dir=output_dir, blacklist=blacklist, token_answer=token_answer, num_answers=num_answers,
+                  mode=mode, save_files=save_files, quizzes_dir=quizzes_dir, quiz_format=quiz_format, preprocessed_dir=preprocessed_dir,
+                  args=args, kwargs=kwargs)
+
+    # Count diagnostics of this run only
+    diagnostics_start = logger.get_counts()
+
+    # Skip the quizzes that are up to date (incremental builds)
+    parsed = {}  # {filename: (quiz, solutions)}
+    build_params = get_parse_options(blacklist, token_answer, num_answers, mode, **kwargs)
+    if manifest:
+        for i, filename in enumerate(files, 1):
+            savepath = _get_quiz_path(quizzes_dir, filename, quiz_format)
+            if manifest.is_fresh("quiz", savepath, _get_quiz_inputs(output_dir, filename), build_params):
+                quiz = reader.read_quiz(savepath)
+                parsed[filename] = (quiz, sum([1 for q in quiz.values() if q.correct_answer is not None]))
+                manifest.skip("quiz")
+                print(f'[INFO] ({i}/{len(files)}) Up to date. Skipping... ("{utils.get_tail(filename)[0]}")')
+    pending = [(i, filename, len(files)) for i, filename in enumerate(files, 1) if filename not in parsed]
+
     # Parse exams
     quizzes = []
     total_questions = 0
     total_answers = 0
-    for i, filename in enumerate(files, 1):
-        tail, basedir = utils.get_tail(filename)
-        fname, ext = utils.get_fname(filename)
-
-        print("")
-        print(f'==============================================================')
-        print(f'[INFO] ({i}/{len(files)}) Parsing quiz: "{tail}"')
-        print(f'==============================================================')
-
-        # Read file
-        txt_file = reader.read_txt(filename)
-
-        # Save preprocessed
-        savepath_preprocessed = os.path.join(preprocessed_dir, f"{tail}.txt") if preprocessed_dir else None
-
-        # Parse txt quiz
-        answer_fname = regex.sub(r"\.\w+\.\w+$", "", tail)
-        answers_file = os.path.join(output_dir, f"txt_selector/{answer_fname}.html_selected.txt")
-        quiz = parse_quiz_txt(txt_file, blacklist, token_answer, num_answers, mode, answers_file, savepath_preprocessed, *args, **kwargs)
-
-        # Keep count of total questions
-        solutions = sum([1 for q_id, q in quiz.items() if q.get('correct_answer') is not None])
+    jobs = min(jobs or os.cpu_count() or 1, len(pending))
+    if jobs <= 1:
+        # Compile patterns (once for all the files)
+        params["profile"] = get_parser_profile(mode, token_answer)
+        results = (_parse_quiz_file(*task, **params) for task in pending)
+    else:
+        print(f"\t- [INFO] Parsing {len(pending)} files using {jobs} processes...")
+        worker_params = dict(params, trace=trace.is_enabled(), logging=logger.get_config())
+        logger.get_logger().flush()
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=jobs, initializer=_init_parse_worker,
+                                                          initargs=(worker_params,))
+        results = _iter_parse_results(executor, pending)
+
+    for quiz, solutions, filename in results:
+        parsed[filename] = (quiz, solutions)
+        if manifest:
+            manifest.record("quiz", _get_quiz_path(quizzes_dir, filename, quiz_format),
+                            _get_quiz_inputs(output_dir, filename), build_params)
+
+    # Keep the order of the files
+    for filename in files:
+        quiz, solutions = parsed[filename]
         total_answers += solutions
         total_questions += len(quiz)
         quizzes.append((quiz, filename))
 
-        # Show info
-        if len(quiz) == 0:
-            print(f"\t- [WARNING] No quizzes were found ({tail})")
-        print(f"\t- [INFO] Parsing done! {len(quiz)} questions were found; {solutions} with solutions. ({tail})")
+    # Remove the quizzes of the files that are gone
+    if manifest:
+        manifest.remove_stale("quiz", [_get_quiz_path(quizzes_dir, filename, quiz_format) for filename in files])
+        manifest.save()
 
-        # Save quizzes
-        if save_files:
-            print(f"\t- [INFO] Saving json... ({fname}.json)")
-            reader.save_json(quiz, os.path.join(quizzes_dir, f"{fname}.json"))
+    # Add the quizzes to the question bank
+    bank = kwargs.get("bank")
+    if bank:
+        with trace.span("ingest", cat="stage"), store.QuestionBank(bank) as question_bank:
+            num_ingested = question_bank.ingest(quizzes, base_dir=input_dir if os.path.isdir(input_dir) else None)
+        print(f'\t- [INFO] Question bank updated: "{bank}" ({num_ingested} questions)')
 
     print("")
     print("--------------------------------------------------------------")
@@ -414,8 +571,104 @@ def parse_quiz(input_dir, output_dir, token_answer=None, num_answers=None, mode=
     print("--------------------------------------------------------------")
     print(f"- [INFO] Documents parsed: {len(quizzes)}")
     print(f"- [INFO] Questions found: {total_questions} (with solutions: {total_answers})")
+    if manifest:
+        print(manifest.format_stats("quiz"))
+    for line in logger.format_counts(since=diagnostics_start):
+        print(line)
     print("--------------------------------------------------------------\n\n")
-    return quizzes
+    return [(quiz.to_dict(), filename) for quiz, filename in quizzes]  # Same JSON schema as the files
+
+
+def get_parse_options(blacklist, token_answer, num_answers, mode, **kwargs):
+    # Everything that can change a parsed quiz
+    options = {key: kwargs.get(key) for key in ["from_ocr", "infer_question", "skip_on_error", "ignore_question_key",
+                                                "fill_missing_answers", "save_txt_preprocessed"]}
+    options.update(token_answer=token_answer, num_answers=num_answers, mode=mode, blacklist=sorted(blacklist))
+    return options
+
+
+def _get_quiz_path(quizzes_dir, filename, quiz_format="json"):
+    fname, ext = utils.get_fname(filename)
+    return os.path.join(quizzes_dir, f"{fname}.{quiz_format}")
+
+
+def _get_answers_file(output_dir, filename):
+    tail, basedir = utils.get_tail(filename)
+    answer_fname = regex.sub(r"\.\w+\.\w+$", "", tail)
+    return os.path.join(output_dir, f"txt_selector/{answer_fname}.html_selected.txt")
+
+
+def _get_quiz_inputs(output_dir, filename):
+    return [filename, _get_answers_file(output_dir, filename)]
+
+
+def _parse_quiz_file(i, filename, num_files, output_dir, blacklist, token_answer, num_answers, mode, save_files,
+                     quizzes_dir, quiz_format, preprocessed_dir, profile, args, kwargs):
+    tail, basedir = utils.get_tail(filename)
+    fname, ext = utils.get_fname(filename)
+
+    print("")
+    print(f'==============================================================')
+    print(f'[INFO] ({i}/{num_files}) Parsing quiz: "{tail}"')
+    print(f'==============================================================')
+
+    # Read file
+    txt_file = reader.read_txt(filename)
+
+    # Save preprocessed
+    savepath_preprocessed = os.path.join(preprocessed_dir, f"{tail}.txt") if preprocessed_dir else None
+
+    # Parse txt quiz
+    answers_file = _get_answers_file(output_dir, filename)
+    with trace.span("parse_quiz_txt", cat="parse", file=tail), logger.context(file=tail):
+        quiz = _parse_quiz_txt(txt_file, blacklist, token_answer, num_answers, mode, answers_file,
+                              savepath_preprocessed, *args, profile=profile, **kwargs)
+
+    # Keep count of total questions
+    solutions = sum([1 for q in quiz.values() if q.correct_answer is not None])
+
+    # Show info
+    if len(quiz) == 0:
+        print(f"\t- [WARNING] No quizzes were found ({tail})")
+    print(f"\t- [INFO] Parsing done! {len(quiz)} questions were found; {solutions} with solutions. ({tail})")
+
+    # Save quizzes
+    if save_files:
+        print(f"\t- [INFO] Saving {quiz_format}... ({fname}.{quiz_format})")
+        reader.save_quiz(quiz, _get_quiz_path(quizzes_dir, filename, quiz_format))
+    return quiz, solutions, filename
+
+
+# Parameters shared by all the files of a worker process (set once by the initializer)
+_WORKER_PARAMS = None
+
+
+def _init_parse_worker(params):
+    global _WORKER_PARAMS
+    _WORKER_PARAMS = dict(params)
+    if _WORKER_PARAMS.pop("trace", False):
+        trace.start_tracing()
+    logger.configure(**_WORKER_PARAMS.pop("logging"))
+    _WORKER_PARAMS["profile"] = get_parser_profile(params["mode"], params["token_answer"])
+    utils.compile_words(tuple(params["blacklist"])) if params["blacklist"] else None
+
+
+def _parse_quiz_worker(task):
+    # Buffer the log of this file, so that the logs of different files are not interleaved
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        quiz, solutions, filename = _parse_quiz_file(*task, **_WORKER_PARAMS)
+    return quiz, solutions, filename, log.getvalue(), trace.drain(), logger.get_logger().drain()
+
+
+def _iter_parse_results(executor, tasks):
+    # Results (and logs) are returned in the same order as the files
+    with executor:
+        for quiz, solutions, filename, log, events, diagnostics in executor.map(_parse_quiz_worker, tasks):
+            print(log, end="")
+            trace.add_events(events)
+            logger.get_logger().merge(*diagnostics)
+            yield quiz, solutions, filename
 
 
 def get_config(file, max_lines=10):
@@ -449,7 +702,14 @@ def get_config(file, max_lines=10):
 
 
 def parse_quiz_txt(text, blacklist=None, token_answer=None, num_answers=None, mode="auto", answers_file=None,
-                   savepath_preprocessed=None, *args, **kwargs):
+                   savepath_preprocessed=None, *args, profile=None, **kwargs):
+    # Same JSON schema as the files (see `_parse_quiz_txt` for the compact model)
+    return _parse_quiz_txt(text, blacklist, token_answer, num_answers, mode, answers_file, savepath_preprocessed,
+                           *args, profile=profile, **kwargs).to_dict()
+
+
+def _parse_quiz_txt(text, blacklist=None, token_answer=None, num_answers=None, mode="auto", answers_file=None,
+                    savepath_preprocessed=None, *args, profile=None, **kwargs):
     # Look for user params and override
     text, config = get_config(text)
     if config:
@@ -458,8 +718,15 @@ def parse_quiz_txt(text, blacklist=None, token_answer=None, num_answers=None, mo
         mode = config.pop("mode", mode)
         kwargs.update(config)
 
+    # Get compiled patterns (file-specific params use a derived profile, which is also cached)
+    if profile is None:
+        profile = get_parser_profile(mode, token_answer)
+    elif (profile.mode, profile.token_answer) != (mode, token_answer):
+        profile = profile.derive(mode=mode, token_answer=token_answer)
+
     # Preprocess text
-    text = preprocess_text(text, blacklist, mode, from_ocr=kwargs.get("from_ocr"))
+    with trace.span("preprocess_text", cat="parse"):
+        text = preprocess_text(text, blacklist, mode, from_ocr=kwargs.get("from_ocr"))
 
     # Save preprocessed
     if savepath_preprocessed:
@@ -467,10 +734,9 @@ def parse_quiz_txt(text, blacklist=None, token_answer=None, num_answers=None, mo
 
     # Split file (questions / answers)
     txt_questions, txt_answers = text, None
-    if token_answer:
+    if profile.rgx_token_answer:
         # Split section (first match)
-        rxg_splitter = regex.compile(f"{token_answer}", regex.IGNORECASE | regex.MULTILINE)
-        text = regex.sub(rxg_splitter, DELIMITER, text, count=1)
+        text = profile.rgx_token_answer.sub(DELIMITER, text, count=1)
         sections = text.split(DELIMITER)
 
         if len(sections) == 1:
@@ -483,17 +749,20 @@ def parse_quiz_txt(text, blacklist=None, token_answer=None, num_answers=None, mo
             exit()
 
     # Parse quiz
-    questions = parse_questions(txt_questions, num_answers, mode, *args, **kwargs)
+    with trace.span("parse_questions", cat="parse"):
+        questions = parse_questions(txt_questions, num_answers, mode, *args, profile=profile, **kwargs)
 
     # Find answers (txt
-    solutions_txt = parse_solutions(txt_answers, num_answers, *args, **kwargs)
+    with trace.span("parse_solutions", cat="parse"):
+        solutions_txt = parse_solutions(txt_answers, num_answers, *args, profile=profile, **kwargs)
 
     # Find answers (selector)
     solutions_sel = []
     if answers_file and os.path.exists(answers_file):
         print("\t- [INFO] Trying to find solutions using a txt selector file...")
         # If we use the blacklist file, we could delete parts of a question
-        solutions_sel = find_answers_selector(questions, answers_file, None, mode)
+        with trace.span("find_answers_selector", cat="parse"):
+            solutions_sel = find_answers_selector(questions, answers_file, None, mode, profile=profile)
 
     # Merge solutions
     # Although there can be collitions, they should be exclusive, unless manual editing (priority)
@@ -530,32 +799,34 @@ def parse_quiz_txt(text, blacklist=None, token_answer=None, num_answers=None, mo
         print(f"\t\t- Questions with missing answers ({len(missing_ans)}): [{missing_ans_str}]")
 
     # Build quiz
-    quiz = build_quiz(questions, solutions)
+    quiz = _build_quiz(questions, solutions)
     return quiz
 
 
-def parse_questions(txt, num_expected_answers=None, mode="auto", *args, **kwargs):
+def parse_questions(txt, num_expected_answers=None, mode="auto", *args, profile=None, **kwargs):
+    profile = profile or get_parser_profile(mode)
     if mode == "auto":
-        return parse_questions_auto(txt, num_expected_answers, single_line=False, **kwargs)
+        return parse_questions_auto(txt, num_expected_answers, single_line=False, profile=profile, **kwargs)
     elif mode == "single-line":
-        return parse_questions_auto(txt, num_expected_answers, single_line=True , **kwargs)
+        return parse_questions_auto(txt, num_expected_answers, single_line=True, profile=profile, **kwargs)
     else:
         raise ValueError(f"Unknown question mode: '{mode}'")
 
 
-def parse_questions_auto(text, num_expected_answers, single_line, *args, **kwargs):
+def parse_questions_auto(text, num_expected_answers, single_line, *args, profile=None, **kwargs):
+    profile = profile or get_parser_profile()
     questions = []
 
     # Split questions
-    raw_questions = preprocess_questions_block(text, single_line)
+    raw_questions = preprocess_questions_block(text, single_line, profile=profile)
 
     # Parse questions
     for i, raw_question in enumerate(raw_questions, 1):
         # Split block of answers
-        q_blocks = preprocess_answers_block(raw_question, single_line, num_expected_answers)
+        q_blocks = preprocess_answers_block(raw_question, single_line, num_expected_answers, profile=profile)
         if q_blocks:
             # Infer question blocks
-            q_blocks = infer_question_blocks(q_blocks, single_line, num_expected_answers, *args, **kwargs)
+            q_blocks = infer_question_blocks(q_blocks, single_line, num_expected_answers, *args, profile=profile, **kwargs)
 
             if q_blocks:
                 # Normalize question items
@@ -564,7 +835,9 @@ def parse_questions_auto(text, num_expected_answers, single_line, *args, **kwarg
     return questions
 
 
-def infer_question_blocks(blocks, single_line, num_expected_answers, *args, **kwargs):
+def infer_question_blocks(blocks, single_line, num_expected_answers, *args, profile=None, **kwargs):
+    profile = profile or get_parser_profile()
+
     # User variables
     infer_question = kwargs.get("infer_question", True)
     skip_on_error = kwargs.get("skip_on_error", False)
@@ -588,7 +861,7 @@ def infer_question_blocks(blocks, single_line, num_expected_answers, *args, **kw
         new_blocks = [q_blocks[0]]
         for i, (b_id, b_text) in enumerate(q_blocks[1:]):
             # No words nor numbers
-            if not regex.search("(\p{Latin}|\d)", b_text):
+            if not profile.rgx_has_content.search(b_text):
                 continue
 
             # Infer blocks ('z' is reserved)
@@ -602,7 +875,8 @@ def infer_question_blocks(blocks, single_line, num_expected_answers, *args, **kw
 
     # Check number of items
     if len(new_blocks) < 2 + 1:
-        print(f'\t- [INFO] Block with less than two answers. Skipping block: [Q: "{q_summary(new_blocks[0])}"]')
+        logger.info("few_answers_block", 'Block with less than two answers. Skipping block: [Q: "%s"]',
+                    Lazy(q_summary, new_blocks[0]))
         return None
 
     # Check correctness
@@ -612,8 +886,8 @@ def infer_question_blocks(blocks, single_line, num_expected_answers, *args, **kw
         # Too many answers
         if len(new_blocks) > num_expected_answers + 1:
             q_error = True
-            print(f"\t- [WARNING] More answers ({len(new_blocks) - 1}) than expected ({num_expected_answers}). "
-                  f"[Q: \"{q_summary(new_blocks[0])}\"]")
+            logger.warning("more_answers", 'More answers (%d) than expected (%d). [Q: "%s"]', len(new_blocks) - 1,
+                           num_expected_answers, Lazy(q_summary, new_blocks[0]))
 
         # Too few answers
         elif len(new_blocks) < num_expected_answers + 1:
@@ -625,12 +899,12 @@ def infer_question_blocks(blocks, single_line, num_expected_answers, *args, **kw
                 extra_answers = [[None, missing_ans_txt] for _ in range(num_missing_ans)]
 
             filling_str = f"Filling {len(extra_answers)} missing answers. " if extra_answers else ""
-            print(f"\t- [WARNING] Less answers ({len(new_blocks) - 1}) than expected ({num_expected_answers}). "
-                  f'{filling_str}[Q: "{q_summary(new_blocks[0])}"]')
+            logger.warning("less_answers", 'Less answers (%d) than expected (%d). %s[Q: "%s"]', len(new_blocks) - 1,
+                           num_expected_answers, filling_str, Lazy(q_summary, new_blocks[0]))
 
     # Skip question?
     if q_error and skip_on_error:
-        print(f"\t- [WARNING] Skipping question. [Q: \"{q_summary(new_blocks[0])}\"]")
+        logger.warning("skipped_question", 'Skipping question. [Q: "%s"]', Lazy(q_summary, new_blocks[0]))
         return None
 
     # Add extra block
@@ -639,46 +913,47 @@ def infer_question_blocks(blocks, single_line, num_expected_answers, *args, **kw
 
 
 def parse_normalize_question(blocks, suggested_id):
+    normalizer = get_normalizer()
+
     # Normalize question
     question = blocks[0]
     question[0] = question[0] if question[0] else suggested_id
-    question[1] = normalize_question(question[1])
+    question[1] = normalizer.normalize_question(question[1])
 
-    # Normalize answer
+    # Normalize answers (batch)
     answers = blocks[1:]
-    for i, ans in enumerate(answers):
+    answers_text = normalizer.normalize_many([ans[1] for ans in answers], kind="answer")
+    for i, (ans, ans_text) in enumerate(zip(answers, answers_text)):
         ans[0] = string.ascii_lowercase[i]
-        ans[1] = normalize_answer(ans[1])
+        ans[1] = ans_text
 
     return question, answers
 
 
-def parse_solutions(txt, num_expected_answers=None, letter2num=True, *args, **kwargs):
+def parse_solutions(txt, num_expected_answers=None, letter2num=True, *args, profile=None, **kwargs):
+    profile = profile or get_parser_profile()
     answers = []
 
     # Check if there is something in the txt
     if not txt:
         return answers
 
-    # Define regex
-    rgx_solutions = regex.compile(r'\b(\d+[\d\.]*?)[\W\s]*([a-zA-Z]{1})(?!\w)', regex.MULTILINE)
-    solutions = regex.findall(rgx_solutions, txt)
+    # Find solutions
+    solutions = profile.rgx_solutions.findall(txt)
 
     for i, (id_question, id_answer) in enumerate(solutions):
         # Format question IDs
         id_question = id_question.lower().strip()
-        id_question = regex.sub(r"\.*$", "", id_question)
+        id_question = profile.rgx_trailing_dots.sub("", id_question)
 
         id_answer = id_answer.lower().strip()
-        id_answer = regex.sub(r"\.*$", "", id_answer)
+        id_answer = profile.rgx_trailing_dots.sub("", id_answer)
 
         # Check if the correct answer is in range (a,b,c,d)
         id_answer_num = string.ascii_lowercase.index(id_answer)
         if num_expected_answers and id_answer_num >= num_expected_answers:
-            a_ids = string.ascii_lowercase
-            range_str = f"{a_ids[0]}-{a_ids[num_expected_answers-1]}"
-            print(f"\t- [WARNING] Skipping answer. The correct answer '{id_answer}' is not in the range of "
-                  f"possible answers ({range_str})")
+            logger.warning("answer_out_of_range", "Skipping answer. The correct answer '%s' is not in the range of "
+                           "possible answers (a-%s)", id_answer, string.ascii_lowercase[num_expected_answers-1])
             continue
 
         # Letter to number (a => 0, b => 1, c => 2,...)
@@ -689,16 +964,88 @@ def parse_solutions(txt, num_expected_answers=None, letter2num=True, *args, **kw
     return answers
 
 
-def normalize_chunk(text, remove_id=False):
-    text = normalize_answer(text)
-    text = utils.remove_whitespace(text)
-    text = text.lower()
-    if remove_id:
-        b_id, text = get_block_id(text, is_question=False)  # Remove answer id
-    return text.strip()
-
-
-def find_answers_selector(questions, answers_file, blacklist, mode, thres1=0.90, thres2=0.75, max_jump=10):
+def normalize_chunk(text, remove_id=False, profile=None):
+    return normalize_chunks([text], remove_id=remove_id, profile=profile)[0]
+
+
+def normalize_chunks(texts, remove_id=False, profile=None):
+    chunks = []
+    for text in get_normalizer().normalize_many(texts, kind="answer"):
+        text = utils.remove_whitespace(text)
+        text = text.lower()
+        if remove_id:
+            b_id, text = get_block_id(text, is_question=False, profile=profile)  # Remove answer id
+        chunks.append(text.strip())
+    return chunks
+
+
+class SelectorIndex:
+    """Character n-gram inverted index over the selected lines (e.g. bold text) of a document.
+
+    It is used to find the lines that are likely to contain an answer, so that the (expensive) similarity ratio
+    is only computed for a few candidates instead of for every pair of line and answer.
+    """
+
+    def __init__(self, lines, n=3):
+        self.lines = lines
+        self.n = n
+        self.sizes = []
+        self.index = {}  # n-gram => sorted list of line indices
+        for li, line in enumerate(lines):
+            ngrams = self.get_ngrams(line)
+            self.sizes.append(len(ngrams))
+            for ngram in ngrams:
+                self.index.setdefault(ngram, []).append(li)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def get_ngrams(self, text):
+        text = f" {text} "  # Pad short texts
+        return {text[i:i+self.n] for i in range(max(len(text) - self.n + 1, 1))}
+
+    def search(self, texts, start=0, end=None, top_k=10):
+        # Returns the indices of the lines in [start, end) most similar to any of the texts (sorted by line)
+        end = len(self.lines) if end is None else end
+        line_scores = {}
+        for text in texts:
+            ngrams = self.get_ngrams(text)
+
+            # Count shared n-grams per line (only within the window)
+            counts = {}
+            for ngram in ngrams:
+                postings = self.index.get(ngram)
+                if postings:
+                    for li in postings[bisect.bisect_left(postings, start):bisect.bisect_left(postings, end)]:
+                        counts[li] = counts.get(li, 0) + 1
+
+            # Dice coefficient
+            for li, count in counts.items():
+                score = 2.0 * count / (len(ngrams) + self.sizes[li])
+                if score > line_scores.get(li, 0.0):
+                    line_scores[li] = score
+
+        # Ties go to the first lines (deterministic)
+        candidates = heapq.nlargest(top_k, line_scores.items(), key=lambda x: (x[1], -x[0]))
+        return sorted([li for li, score in candidates])
+
+
+def _best_answer(answers_text, bold_text):
+    # Walk through question answers to find the bold text
+    # (the bold text is indexed once, and answers that cannot beat the best score are skipped)
+    matcher = SequenceMatcher(None, "", bold_text)
+    ans_idx, ans_score = 0, -1.0
+    for i, ans_text in enumerate(answers_text):
+        matcher.set_seq1(ans_text)
+        if matcher.real_quick_ratio() > ans_score and matcher.quick_ratio() > ans_score:
+            score = matcher.ratio()
+            if score > ans_score:
+                ans_idx, ans_score = i, score
+    return ans_idx, ans_score
+
+
+def find_answers_selector(questions, answers_file, blacklist, mode, thres1=0.90, thres2=0.75, max_jump=10, top_k=10,
+                          profile=None):
     text = None
 
     # Check if file exists
@@ -711,51 +1058,49 @@ def find_answers_selector(questions, answers_file, blacklist, mode, thres1=0.90,
     # Preprocess lines
     text = preprocess_text(text, blacklist, mode)
 
-    lines = []
-    for bold_text in text.split('\n'):
-        # Normalize selector
-        # bold_id, bold_text = get_block_id(bold_text, is_question=True)
-
-        # Remove question
-        if bold_text.strip():
-            bold_text = normalize_chunk(bold_text, remove_id=True)
-            lines.append(bold_text)
+    # Normalize selector (and remove answer IDs)
+    lines = normalize_chunks([l for l in text.split('\n') if l.strip()], remove_id=True, profile=profile)
+    selector_index = SelectorIndex(lines)
 
     correct_answers = []
     previous_line = 0
     for q, answers in questions:
-        # Find question with this answer
-        line_ans_score = []
-        skip_question = False
-        for li, bold_text in enumerate(lines[previous_line:]):
-            # Walk through question answers to find the bold text
-            scores = []
-            for i, (ans_idx, ans_text) in enumerate(answers):
-                # This answers have no IDs, and we don't want to remove parts of the answer
-                ans_text = normalize_chunk(ans_text, remove_id=False)
-
-                score = utils.fuzzy_text_similarity(ans_text, bold_text)
-                scores.append(score)
-
-            # Get answer with maximum score for this bold line
-            ans_idx, ans_score = max(enumerate(scores), key=itemgetter(1))
-            line_ans_score.append((ans_idx, ans_score, bold_text))
-
-            # Speed-up!!! Set checkpoint on high accuracy.
-            # I presume that answers are sorted! Try to use the same correct answer twice
-            #  e.g.: 3) b-cheese...... 59) d-cheese)
-            if ans_score > thres1:
-                previous_line += li
-                break
-
-            # If an answer is missing, we don't go to look to further
-            if li >= max_jump and previous_line != 0:
-                skip_question = True
-                break
+        # This answers have no IDs, and we don't want to remove parts of the answer
+        answers_text = normalize_chunks([ans_text for ans_idx, ans_text in answers], remove_id=False, profile=profile)
+
+        # If an answer is missing, we don't go to look to further
+        max_line = len(lines) if previous_line == 0 else min(len(lines), previous_line + max_jump + 1)
+
+        # Find question with this answer (only the most similar lines are compared)
+        skip_question = previous_line != 0 and previous_line + max_jump < len(lines)
+        candidates = selector_index.search(answers_text, start=previous_line, end=max_line, top_k=top_k)
+        scores = {li: _best_answer(answers_text, lines[li]) for li in candidates}
+        match = next((li for li in candidates if scores[li][1] > thres1), None)
+        if match is None:
+            # No candidate is good enough: compare every line of the window (as without the index)
+            for li in range(previous_line, max_line):
+                if li not in scores:
+                    scores[li] = _best_answer(answers_text, lines[li])
+                if scores[li][1] > thres1:
+                    match = li
+                    break
+
+        # Speed-up!!! Set checkpoint on high accuracy.
+        # I presume that answers are sorted! Try to use the same correct answer twice
+        #  e.g.: 3) b-cheese...... 59) d-cheese)
+        if match is not None:
+            scores = {li: score for li, score in scores.items() if li <= match}
+            previous_line = match
+            skip_question = False
+        line_ans_score = [(ans_idx, ans_score, lines[li]) for li, (ans_idx, ans_score) in sorted(scores.items())]
 
         # Skip question
         if skip_question:
-            print(f"\t [WARNING] Skipping answer (might be missing). Max jump exceeded ({max_jump} lines). [Q: '{q_summary(q)}']")
+            # (printed as it always was: scripts look for this line)
+            logger.warning("selector_max_jump", "Skipping answer (might be missing). Max jump exceeded (%d lines). "
+                           "[Q: '%s']", max_jump, Lazy(q_summary, q), prefix="\t ")
+            continue
+        elif not line_ans_score:  # No similar lines
             continue
 
         # Get max score
@@ -763,5 +1108,6 @@ def find_answers_selector(questions, answers_file, blacklist, mode, thres1=0.90,
         if score > thres2:
             correct_answers.append([q[0], ans_idx])
         else:
-            print(f"\t- [INFO] Answer discarted (prob.: {int(score*100)}%) [B: '{bold_text[:50]}'; A: '{q_summary(answers[ans_idx])}'; Q: '{q_summary(q)}';]")
+            logger.info("selector_discarded", "Answer discarted (prob.: %d%%) [B: '%s'; A: '%s'; Q: '%s';]", int(score*100),
+                        bold_text[:50], Lazy(q_summary, answers[ans_idx]), Lazy(q_summary, q))
     return correct_answers
@@ -1,12 +1,9 @@
 import os
 import json
 
-from file2quiz import utils, converter
+from file2quiz import utils, converter, commands, cache, build, checkpoint, trace, models
 
-from io import StringIO
-from bs4 import BeautifulSoup
-from tika import parser as tp
-from file2quiz import preprocess
+# Tika, BeautifulSoup and the OCR (numpy, scikit-image, OpenCV,...) are imported only when they are needed
 
 
 def extract_text(input_dir, output_dir, save_files=False, extensions=None, *args, **kwargs):
@@ -20,28 +17,90 @@ def extract_text(input_dir, output_dir, save_files=False, extensions=None, *args
     # Get blacklist
     blacklist = read_blacklist(os.path.join(output_dir, "blacklist.txt"))
 
-    # Create output dir
+    # Get cache of extracted texts and build manifest (incremental builds)
+    text_cache = get_extraction_cache(output_dir, **kwargs)
+    ocr_cache = get_ocr_cache(output_dir, **kwargs) if kwargs.get("use_ocr") else None
+    if ocr_cache:
+        kwargs["ocr_cache"] = ocr_cache
+    manifest = build.get_manifest(output_dir, **kwargs) if save_files else None
+
+    # Get checkpoint (checkpointed mode: status of each file, to resume an interrupted batch)
+    batch_checkpoint = checkpoint.get_checkpoint(output_dir, **kwargs) if save_files else None
+    keep_files = text_cache is not None or manifest is not None or (batch_checkpoint and batch_checkpoint.resume)
+
+    # Create output dir (with the cache or incremental builds, only new or modified files are written)
     txt_dir = os.path.join(output_dir, "txt")
-    utils.create_folder(txt_dir, empty_folder=True) if save_files else None
+    utils.create_folder(txt_dir, empty_folder=not keep_files) if save_files else None
 
     # Create output dir (selector)
     txt_selector_dir = os.path.join(output_dir, "txt_selector")
-    utils.create_folder(txt_selector_dir, empty_folder=True) if save_files and kwargs.get("extract_style") else None
+    utils.create_folder(txt_selector_dir, empty_folder=not keep_files) if save_files and kwargs.get("extract_style") else None
 
     # Extract text
     extracted_texts = []  # list of tuples (text, filename)
+    saved_files = set()
     for i, filename in enumerate(files, 1):
         tail, basedir = utils.get_tail(filename)
         print("")
         print(f'==============================================================')
         print(f'[INFO] ({i}/{len(files)}) Extracting text from: "{tail}"')
         print(f'==============================================================')
-
-        # Read file
-        text, text_selected = read_file(filename, output_dir, *args, **kwargs)
-
-        # Remove blacklisted words
-        text = utils.replace_words(text, blacklist, replace="")
+        savepath = os.path.join(txt_dir, f"{tail}.txt")
+        savepath_selected = os.path.join(txt_selector_dir, f"{tail}_selected.txt")
+
+        # Check if the text is up to date (incremental builds)
+        options = get_extraction_options(filename, blacklist, **kwargs)
+        if manifest and manifest.is_fresh("text", savepath, [filename], options):
+            print(f"\t- [INFO] Up to date. Skipping... ({tail})")
+            manifest.skip("text")
+            text = read_txt(savepath)
+            text_selected = read_txt(savepath_selected) if os.path.exists(savepath_selected) else None
+            extracted_texts.append((text, text_selected, filename))
+            saved_files.update({savepath, savepath_selected})
+            if batch_checkpoint:
+                outputs = [savepath] + ([savepath_selected] if text_selected is not None else [])
+                batch_checkpoint.record(filename, options, outputs=outputs)
+            continue
+
+        # Check if the file was processed by an interrupted run (resume)
+        status = batch_checkpoint.status(filename, options) if batch_checkpoint else None
+        if status == checkpoint.DONE:
+            print(f"\t- [INFO] Already extracted. Skipping... ({tail})")
+            outputs = batch_checkpoint.skip(filename)["outputs"]
+            text = read_txt(savepath)
+            text_selected = read_txt(savepath_selected) if os.path.abspath(savepath_selected) in outputs else None
+            extracted_texts.append((text, text_selected, filename))
+            saved_files.update({savepath, savepath_selected})
+            continue
+        elif status == checkpoint.FAILED:
+            error = batch_checkpoint.skip(filename)["error"]
+            print(f"\t- [WARNING] Failed in a previous run. Skipping... ({tail}: {error})")
+            continue
+
+        # Check cache
+        cache_key = cache.make_key("extract", cache.file_hash(filename), options) if text_cache else None
+        cached = text_cache.get(cache_key) if text_cache else None
+        if cached:
+            print(f"\t- [INFO] Using cached text ({tail})")
+            text, text_selected = cached["text"], cached["text_selected"]
+        else:
+            # Read file (in checkpointed mode, a file that cannot be read does not stop the batch)
+            try:
+                with trace.span("read_file", cat="extract", file=tail):
+                    text, text_selected = read_file(filename, output_dir, *args, **kwargs)
+            except Exception as e:
+                if not batch_checkpoint:
+                    raise
+                print(f"\t- [ERROR] Extraction failed ({tail}): {e}")
+                batch_checkpoint.record(filename, options, error=f"{type(e).__name__}: {e}")
+                continue
+
+            # Remove blacklisted words
+            text = utils.replace_words(text, blacklist, replace="")
+
+            # Save into cache
+            if text_cache:
+                text_cache.set(cache_key, {"text": text, "text_selected": text_selected})
 
         # Add extracted texts
         extracted_texts.append((text, text_selected, filename))
@@ -53,21 +112,119 @@ def extract_text(input_dir, output_dir, save_files=False, extensions=None, *args
 
         # Save extracted texts
         if save_files:
-            print(f"\t- [INFO] Saving file... ({tail}.txt)")
-            save_txt(text, os.path.join(txt_dir, f"{tail}.txt"))
+            if not keep_files or not _same_text(text, savepath):
+                print(f"\t- [INFO] Saving file... ({tail}.txt)")
+                save_txt(text, savepath)
+            saved_files.add(savepath)
 
             if kwargs.get("extract_style") and text_selected:
-                save_txt(text_selected, os.path.join(txt_selector_dir, f"{tail}_selected.txt"))
+                if not keep_files or not _same_text(text_selected, savepath_selected):
+                    save_txt(text_selected, savepath_selected)
+                saved_files.add(savepath_selected)
+
+            if manifest:
+                manifest.record("text", savepath, [filename], options)
+
+            # Mark as done (once its outputs are complete)
+            if batch_checkpoint:
+                outputs = [savepath] + ([savepath_selected] if kwargs.get("extract_style") and text_selected else [])
+                batch_checkpoint.record(filename, options, outputs=outputs)
+
+    # Remove the texts of the documents that are gone
+    if manifest:
+        manifest.remove_stale("text", [os.path.join(txt_dir, f"{utils.get_tail(f)[0]}.txt") for f in files])
+        manifest.save()
+    if save_files and keep_files:
+        for savepath in utils.get_files(txt_dir, extensions={'txt'}) + \
+                        (utils.get_files(txt_selector_dir, extensions={'txt'}) if kwargs.get("extract_style") else []):
+            if savepath not in saved_files:
+                print(f"\t- [INFO] Removing outdated file... ({os.path.basename(savepath)})")
+                os.remove(savepath)
 
     print("")
     print("--------------------------------------------------------------")
     print("SUMMARY")
     print("--------------------------------------------------------------")
     print(f"- [INFO] Documents analyzed: {len(extracted_texts)}")
+    if text_cache:
+        print(f"- [INFO] Cache: {text_cache.hits} hits, {text_cache.misses} misses")
+    if ocr_cache:
+        print(f"- [INFO] OCR cache: {ocr_cache.hits} hits, {ocr_cache.misses} misses")
+    if manifest:
+        print(manifest.format_stats("text"))
+    if batch_checkpoint:
+        batch_checkpoint.close(files)
+        print(batch_checkpoint.format_stats())
+        failed = [path for path in files if os.path.abspath(path) in batch_checkpoint.failed()]
+        if failed:
+            print(f"- [WARNING] Files that could not be extracted: {len(failed)} (use --retry-failed to try again)")
+            for path in failed:
+                print(f"\t- {utils.get_tail(path)[0]}")
+    for line in commands.format_stats():
+        print(line)
     print("--------------------------------------------------------------\n\n")
     return extracted_texts
 
 
+def get_extraction_cache(output_dir, no_cache=False, cache_dir=None, cache_size=None, **kwargs):
+    if no_cache:
+        return None
+    cache_dir = cache_dir or os.path.join(output_dir, ".cache")
+    cache_size = cache_size or cache.DEFAULT_CACHE_SIZE
+    return cache.ContentCache(os.path.join(cache_dir, "extract"), max_size=cache_size*1024*1024)
+
+
+def get_ocr_cache(output_dir, no_cache=False, cache_dir=None, cache_size=None, ocr_cache_size=None, **kwargs):
+    # Text of the OCRed pages (keyed by the image that is sent to Tesseract)
+    if no_cache:
+        return None
+    cache_dir = cache_dir or os.path.join(output_dir, ".cache")
+    cache_size = ocr_cache_size or cache_size or cache.DEFAULT_CACHE_SIZE
+    return cache.ContentCache(os.path.join(cache_dir, "ocr"), max_size=cache_size*1024*1024)
+
+
+def get_ocr_key(image_hash, **kwargs):
+    # Everything that can change the text of a page: the image and the settings of Tesseract and the pre-processing
+    options = {
+        "lang": kwargs.get("lang"),
+        "dpi": kwargs.get("dpi", 300),
+        "psm": kwargs.get("psm", 3),
+        "oem": kwargs.get("oem", 3),
+        "no_preprocess": kwargs.get("no_preprocess", False),
+        "unpaper_args": kwargs.get("unpaper_args", ""),
+        "preprocess_engine": kwargs.get("preprocess_engine") or "unpaper",
+        "deskew": kwargs.get("deskew", False),
+    }
+    return cache.make_key("ocr", image_hash, options)
+
+
+def get_extraction_options(filename, blacklist, **kwargs):
+    # Everything that can change the extracted text
+    fname, extension = utils.get_fname(filename)
+    options = {
+        "extractor": extension.lower().strip(),
+        "use_ocr": kwargs.get("use_ocr", False),
+        "lang": kwargs.get("lang"),
+        "dpi": kwargs.get("dpi", 300),
+        "psm": kwargs.get("psm", 3),
+        "oem": kwargs.get("oem", 3),
+        "no_preprocess": kwargs.get("no_preprocess", False),
+        "unpaper_args": kwargs.get("unpaper_args", ""),
+        "preprocess_engine": kwargs.get("preprocess_engine") or "unpaper",
+        "deskew": kwargs.get("deskew", False),
+        "extract_style": kwargs.get("extract_style"),
+        "blacklist": sorted(blacklist),
+    }
+    return options
+
+
+def _same_text(text, filename):
+    try:
+        return read_txt(filename) == text
+    except OSError:
+        return False
+
+
 def read_file(filename, output_dir, *args, **kwargs):
     text, text_selected = None, None
 
@@ -103,7 +260,7 @@ def read_txt(filename, **kwargs):
 
 
 def save_txt(text, filename):
-    with open(filename, 'w', encoding="utf8") as f:
+    with utils.open_atomic(filename) as f:
         f.write(text)
 
 
@@ -113,21 +270,68 @@ def read_json(filename):
 
 
 def save_json(quiz, filename):
-    with open(filename, 'w', encoding="utf8") as f:
+    with utils.open_atomic(filename) as f:
         json.dump(quiz, f)
 
 
+def iter_jsonl(filename):
+    # One question per line: (key, Question) pairs are read lazily, in the order of the file
+    with open(filename, 'r', encoding="utf8") as f:
+        for line in f:
+            if line.strip():
+                data = json.loads(line)
+                yield data.pop("key", data.get("id")), models.Question.from_dict(data)
+
+
+def save_jsonl(quiz, filename):
+    # Quizzes are saved sorted by key (the order used by the converters); streams of (key, question) pairs as given
+    if isinstance(quiz, (dict, models.Quiz)):
+        quiz = models.Quiz.from_dict(quiz) if isinstance(quiz, dict) else quiz
+        quiz = [(key, quiz[key]) for key in sorted(quiz.keys(), key=utils.tokenize)]
+
+    with utils.open_atomic(filename) as f:
+        for key, question in quiz:
+            f.write(json.dumps(dict(key=key, **question.to_dict()), ensure_ascii=False) + "\n")
+
+
+def get_quiz_format(filename):
+    # Detected from the extension ("json" or "jsonl")
+    fname, extension = utils.get_fname(filename)
+    return "jsonl" if extension.lower() == ".jsonl" else "json"
+
+
+def iter_quiz(filename):
+    # JSONL files are streamed as (key, Question) pairs, in the order of the file. JSON files are read as a `Quiz`
+    # (the converters sort them by key)
+    if get_quiz_format(filename) == "jsonl":
+        return iter_jsonl(filename)
+    return read_quiz(filename)
+
+
 def read_quiz(filename):
-    return read_json(filename)
+    if get_quiz_format(filename) == "jsonl":
+        quiz = models.Quiz()
+        for key, question in iter_jsonl(filename):
+            quiz.add(question, key=key)
+        return quiz
+    return models.Quiz.from_dict(read_json(filename))
 
 
 def save_quiz(quiz, filename):
-    return save_json(quiz, filename)
+    if get_quiz_format(filename) == "jsonl":
+        return save_jsonl(quiz, filename)
+    return save_json(quiz.to_dict() if isinstance(quiz, models.Quiz) else quiz, filename)
 
 
-def read_image(filename, output_dir, parent_dir=None, empty_folder=False, no_preprocess=False, **kwargs):
+def read_image(filename, output_dir, parent_dir=None, empty_folder=False, ocr_cache=None, **kwargs):
     basedir, tail = os.path.split(filename)
 
+    # Check cache
+    cache_key = get_ocr_key(cache.file_hash(filename), **kwargs) if ocr_cache else None
+    cached = ocr_cache.get(cache_key) if ocr_cache else None
+    if cached is not None:
+        return cached["text"]
+
     # Create OCR folder
     ocr_savepath = f"{output_dir}/ocr/txt"
     ocr_savepath += f"/{parent_dir}" if parent_dir else ""
@@ -138,6 +342,10 @@ def read_image(filename, output_dir, parent_dir=None, empty_folder=False, no_pre
 
     # Read file
     text = read_txt(filename=f"{ocr_savepath}/{tail}.txt")
+
+    # Save into cache
+    if ocr_cache:
+        ocr_cache.set(cache_key, {"text": text})
     return text
 
 
@@ -156,71 +364,65 @@ def read_pdf(filename, output_dir, use_ocr=False, min_char=200, **kwargs):
         return pages
 
 
-def read_pdf_ocr(filename, output_dir, **kwargs):
-    pages_txt = []
-    basedir, tail = os.path.split(filename)
-
-    # Scan pages
-    savepath = f"{output_dir}/ocr/scanned/{tail}"
-    if os.path.exists(savepath):
-        print("\t- [INFO] Skipping scanning. The folder already exists.")
-    else:
-        utils.create_folder(savepath, empty_folder=True)
-        print("\t- [INFO] Converting PDF to images...")
-        converter.pdf2image(filename, savepath, **kwargs)
-
-    # Get files to OCR, and sort them alphabetically (tricky => [page-0, page-1, page-10, page-2,...])
-    scanned_files = utils.get_files(savepath, extensions={'.tiff'})
-    scanned_files.sort(key=utils.tokenize)
-
-    # Scan pages
-    savepath = f"{output_dir}/ocr/preprocessed/{tail}"
-    if os.path.exists(savepath):
-        print("\t- [INFO] Skipping pre-processing. The folder already exists.")
-    else:
-        utils.create_folder(savepath, empty_folder=True)
-        print("\t- [INFO] Pre-processing images...")
-        for i, f in enumerate(scanned_files, 1):
-            print(f"\t- [INFO] Pre-processing image {i} of {len(scanned_files)}")
-            preprocess.preprocess_img_file(f, savepath, i, **kwargs)
-
-    # Get preprocessed files
-    preprocessed_files = utils.get_files(savepath, extensions={'.pgm'})
-    preprocessed_files.sort(key=utils.tokenize)
-
-    # Perform OCR on the scanned pages
-    for i, filename in enumerate(preprocessed_files, 1):
-        print("\t- [INFO] Performing OCR {} of {}".format(i, len(preprocessed_files)))
-        text = read_image(filename, output_dir,  parent_dir=tail, empty_folder=False, **kwargs)
-        pages_txt.append(text)
+def read_pdf_ocr(filename, output_dir, raster_workers=None, preprocess_workers=None, ocr_workers=None, ocr_cache=None,
+                 **kwargs):
+    from file2quiz import ocr
 
-    return pages_txt
+    # Rasterize, pre-process and OCR the pages in parallel
+    pipeline = ocr.OCRPipeline(raster_workers, preprocess_workers, ocr_workers, ocr_cache=ocr_cache)
+    return pipeline.run(filename, output_dir, **kwargs)
 
 
 def read_pdf_text(filename, **kwargs):
+    from tika import parser as tp
+    from bs4 import BeautifulSoup
     pages_txt = []
 
-    # Read PDF file
-    data = tp.from_file(filename, xmlContent=True)
-    xhtml_data = BeautifulSoup(data['content'], features='lxml')
+    # Read PDF file (a single call to Tika)
+    with trace.span("tika", cat="extract"):
+        data = tp.from_file(filename, xmlContent=True)
+    xhtml_data = BeautifulSoup(data['content'] or "", features='lxml')
     for i, content in enumerate(xhtml_data.find_all('div', attrs={'class': 'page'})):
-        # Parse PDF data using TIKA (xml/html)
-        # It's faster and safer to create a new buffer than truncating it
-        # https://stackoverflow.com/questions/4330812/how-do-i-clear-a-stringio-object
-        _buffer = StringIO()
-        _buffer.write(str(content))
-        parsed_content = tp.from_buffer(_buffer.getvalue())
+        # Extract the text of the page the same way Tika does it (instead of sending each page back to Tika)
+        with trace.span("page_text", cat="extract", page=i+1):
+            text = xhtml2text(content)
 
         # Add pages
-        tmp = parsed_content.get("content", None)  # Sometimes content exists but is None
-        text = tmp.strip() if tmp else ""
-        pages_txt.append(text)
+        pages_txt.append(text.strip())
 
     return pages_txt
 
 
+# Tika ends these elements with a new line when it converts (X)HTML to text
+TIKA_ENDLINE_TAGS = {"p", "h1", "h2", "h3", "h4", "h5", "h6", "div", "ul", "ol", "dl", "pre", "hr", "blockquote",
+                     "address", "fieldset", "table", "form", "noscript", "li", "dt", "dd", "noframes", "br", "tr",
+                     "select", "option", "link", "meta", "title"}
+TIKA_SKIP_TAGS = {"script", "style", "head"}
+
+
+def xhtml2text(element):
+    parts = []
+    _xhtml2text(element, parts)
+    return "".join(parts)
+
+
+def _xhtml2text(element, parts):
+    from bs4 import Tag, NavigableString
+    for child in element.children:
+        if isinstance(child, Tag):
+            if child.name in TIKA_SKIP_TAGS:
+                continue
+            _xhtml2text(child, parts)
+            if child.name in TIKA_ENDLINE_TAGS:
+                parts.append("\n")
+        elif type(child) is NavigableString:  # Skip comments, doctypes,...
+            parts.append(str(child))
+
+
 def _read_tika(filename, *args, **kargs):
-    parsed = tp.from_file(filename)
+    from tika import parser as tp
+    with trace.span("tika", cat="extract"):
+        parsed = tp.from_file(filename)
     text = parsed["content"].strip()
     return text
 
@@ -268,6 +470,8 @@ def _aux_selector(xhtml_data, *args, **kwargs):
 
 
 def read_html_bs4(filename, xml_selector=None, *args, **kwargs):
+    from bs4 import BeautifulSoup
+
     # Read file
     with open(filename, encoding='utf-8') as f:
         data = f.read()
@@ -0,0 +1,200 @@
+import os
+import json
+import sqlite3
+import itertools
+
+from file2quiz import reader
+from file2quiz.models import Question, Quiz
+
+DEFAULT_BATCH_SIZE = 5000  # Questions per transaction
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS exams (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    source TEXT
+);
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY,
+    exam_id INTEGER NOT NULL REFERENCES exams(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    question_id TEXT,
+    question TEXT NOT NULL,
+    answers TEXT NOT NULL,
+    correct_answer INTEGER
+);
+CREATE INDEX IF NOT EXISTS questions_exam ON questions(exam_id, position);
+
+-- Full-text index over the questions and their answers (the text is stored once, in "questions")
+CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5(
+    question, answers, content='questions', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS questions_ai AFTER INSERT ON questions BEGIN
+    INSERT INTO questions_fts(rowid, question, answers) VALUES (new.id, new.question, new.answers);
+END;
+CREATE TRIGGER IF NOT EXISTS questions_ad AFTER DELETE ON questions BEGIN
+    INSERT INTO questions_fts(questions_fts, rowid, question, answers) VALUES ('delete', old.id, old.question, old.answers);
+END;
+"""
+
+
+def get_exam_name(filename, base_dir=None):
+    # Path relative to the input directory, without extension (e.g. "2019/exam1")
+    base_dir = os.path.dirname(filename) if base_dir is None else base_dir
+    name = os.path.relpath(os.path.splitext(os.path.abspath(filename))[0], os.path.abspath(base_dir or os.curdir))
+    return name.replace(os.sep, "/")
+
+
+class QuestionBank:
+    """Questions of many exams in a SQLite database, searchable with FTS5 queries.
+
+    Exams are identified by name: the path of their file relative to the input directory, without extension (e.g.
+    `2019/exam1`). Ingesting an exam again replaces its questions.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        basedir = os.path.dirname(os.path.abspath(path))
+        os.makedirs(basedir, exist_ok=True)
+
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        try:
+            self.conn.executescript(SCHEMA)
+        except sqlite3.OperationalError as e:
+            self.conn.close()
+            if "fts5" in str(e).lower():
+                raise RuntimeError(f"The question bank needs the FTS5 extension of SQLite, but this build of SQLite "
+                                   f"(version {sqlite3.sqlite_version}) does not include it ({e})")
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def ingest(self, quizzes, batch_size=DEFAULT_BATCH_SIZE, base_dir=None):
+        """Adds the results of `parse_quiz` ([(quiz, filename), ...]). Returns the number of questions added.
+
+        The exams are named after the path of their files relative to `base_dir` (by default, their own directory).
+
+        The quizzes are consumed lazily and committed once at least `batch_size` questions are pending. An exam is
+        never split across transactions: if the ingest is interrupted, each exam keeps either its old questions or
+        all the new ones.
+        """
+        num_questions = 0
+        pending = 0
+        try:
+            for quiz, filename in quizzes:
+                exam_id = self._replace_exam(get_exam_name(filename, base_dir), filename)
+                pending += self._insert(exam_id, quiz)
+
+                # Write batch
+                if pending >= batch_size:
+                    self.conn.commit()
+                    num_questions += pending
+                    pending = 0
+            self.conn.commit()
+            num_questions += pending
+        except BaseException:
+            self.conn.rollback()
+            raise
+        return num_questions
+
+    def ingest_files(self, filenames, batch_size=DEFAULT_BATCH_SIZE, base_dir=None):
+        # Quizzes saved as JSON (read one at a time), named after their path relative to the common directory
+        filenames = list(filenames)
+        if base_dir is None and filenames:
+            base_dir = os.path.commonpath([os.path.dirname(os.path.abspath(f)) for f in filenames])
+        return self.ingest(((reader.read_quiz(filename), filename) for filename in filenames), batch_size, base_dir)
+
+    def _replace_exam(self, name, source):
+        # (in the transaction of its questions)
+        source = os.path.abspath(source)
+        row = self.conn.execute("SELECT source FROM exams WHERE name = ?", (name,)).fetchone()
+        if row and row[0] and os.path.abspath(row[0]) != source:
+            print(f'\t- [WARNING] Exam "{name}" replaced by a different file ("{row[0]}" -> "{source}")')
+        self.conn.execute("DELETE FROM exams WHERE name = ?", (name,))
+        cursor = self.conn.execute("INSERT INTO exams(name, source) VALUES (?, ?)", (name, source))
+        return cursor.lastrowid
+
+    def _insert(self, exam_id, quiz):
+        rows = [(exam_id, position, key, q.id, q.question, json.dumps(list(q.answers), ensure_ascii=False),
+                 q.correct_answer) for position, (key, q) in enumerate(quiz.items())]
+        self.conn.executemany("INSERT INTO questions(exam_id, position, key, question_id, question, answers, "
+                              "correct_answer) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def search(self, query=None, exams=None, limit=None):
+        """Returns the questions that match a FTS5 query (e.g. `CO2`, `agua NOT gas`, `question: "energía cinética"`)
+        as [(exam_name, key, Question), ...], in the order of the exams.
+
+        Without a query, all the questions (of the given exams) are returned.
+        """
+        sql = "SELECT e.name, q.key, q.question_id, q.question, q.answers, q.correct_answer " \
+              "FROM questions q JOIN exams e ON e.id = q.exam_id"
+        where, params = [], []
+        if query:
+            where.append("q.id IN (SELECT rowid FROM questions_fts WHERE questions_fts MATCH ?)")
+            params.append(query)
+        if exams:
+            where.append(f"e.name IN ({', '.join('?' * len(exams))})")
+            params.extend(exams)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY e.name, q.position"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+
+        for name, key, q_id, question, answers, correct_answer in self._execute(sql, params, query):
+            yield name, key, Question(q_id, question, json.loads(answers), correct_answer)
+
+    def iter_quizzes(self, query=None, exams=None):
+        """Groups the results of a search by exam: [(exam_name, Quiz), ...]"""
+        for name, rows in itertools.groupby(self.search(query, exams), key=lambda row: row[0]):
+            quiz = Quiz()
+            for _, key, question in rows:
+                quiz.add(question, key=key)
+            yield name, quiz
+
+    def get_quiz(self, name, query=None):
+        return next((quiz for _, quiz in self.iter_quizzes(query, exams=[name])), Quiz())
+
+    def exams(self, query=None):
+        # Exams with at least one question that matches the query
+        if query:
+            sql, params = "SELECT DISTINCT e.name FROM exams e JOIN questions q ON q.exam_id = e.id " \
+                          "WHERE q.id IN (SELECT rowid FROM questions_fts WHERE questions_fts MATCH ?) " \
+                          "ORDER BY e.name", (query,)
+        else:
+            sql, params = "SELECT name FROM exams ORDER BY name", ()
+        return [row[0] for row in self._execute(sql, params, query)]
+
+    def count(self, query=None):
+        if query:
+            sql, params = "SELECT count(*) FROM questions_fts WHERE questions_fts MATCH ?", (query,)
+        else:
+            sql, params = "SELECT count(*) FROM questions", ()
+        return self._execute(sql, params, query).fetchone()[0]
+
+    def _execute(self, sql, params, query=None):
+        try:
+            return self.conn.execute(sql, params)
+        except sqlite3.OperationalError as e:  # Malformed query
+            raise ValueError(f'Invalid query "{query}": {e}')
+
+    def optimize(self):
+        # Merge the segments of the full-text index (after large ingests)
+        with self.conn:
+            self.conn.execute("INSERT INTO questions_fts(questions_fts) VALUES ('optimize')")
+
@@ -0,0 +1,92 @@
+import os
+import json
+import time
+import threading
+import contextlib
+
+# Active tracer (None: tracing is disabled)
+_tracer = None
+
+# Shared by all the spans when tracing is disabled (nothing to allocate nor to record)
+_NULL_SPAN = contextlib.nullcontext()
+
+
+class Tracer:
+    """Collects spans as Chrome trace events ("complete" events, in microseconds).
+
+    The clock is monotonic and system-wide, so the events of different processes can be merged into one trace.
+    """
+
+    def __init__(self):
+        self.events = []
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, name, cat, args):
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            end = time.perf_counter_ns()
+            event = {"name": name, "cat": cat, "ph": "X", "ts": start / 1000, "dur": (end - start) / 1000,
+                     "pid": os.getpid(), "tid": threading.get_ident()}
+            if args:
+                event["args"] = args
+            with self._lock:
+                self.events.append(event)
+
+    def drain(self):
+        # Returns (and removes) the events collected so far
+        with self._lock:
+            events, self.events = self.events, []
+        return events
+
+    def add_events(self, events):
+        with self._lock:
+            self.events.extend(events)
+
+
+def start_tracing():
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def stop_tracing():
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer.drain() if tracer else []
+
+
+def is_enabled():
+    return _tracer is not None
+
+
+def span(name, cat="file2quiz", **args):
+    """Times a block of code: `with trace.span("tesseract", page=3): ...`"""
+    if _tracer is None:
+        return _NULL_SPAN
+    return _tracer.span(name, cat, args)
+
+
+def drain():
+    return _tracer.drain() if _tracer else []
+
+
+def add_events(events):
+    if _tracer is not None and events:
+        _tracer.add_events(events)
+
+
+def save_trace(filename, events=None):
+    events = drain() if events is None else events
+
+    # Name the processes and threads (shown by the trace viewers)
+    metadata = []
+    for pid in sorted({e["pid"] for e in events}):
+        name = "main" if pid == os.getpid() else f"worker-{pid}"
+        metadata.append({"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": name}})
+
+    with open(filename, 'w', encoding="utf8") as f:
+        json.dump({"traceEvents": metadata + sorted(events, key=lambda e: e["ts"]), "displayTimeUnit": "ms"}, f)
+    print(f"\t- [INFO] Trace saved: {filename} ({len(events)} spans)")
@@ -1,11 +1,17 @@
 import re
 import os
 import shutil
+import secrets
+import functools
+import contextlib
 import pathlib
 from difflib import SequenceMatcher
 
 import regex
 
+RGX_WHITESPACE = re.compile(r"\s")
+RGX_MULTIPLE_SPACES = re.compile(r'[ ]{2,}')
+
 
 def get_tail(filename):
     basedir, tail = os.path.split(filename)
@@ -43,6 +49,38 @@ def get_files(path, extensions=None, sort=True):
     return valid_files
 
 
+def _create_temp_file(basedir):
+    # Same as `tempfile.mkstemp`, but with the permissions of `open()` (0o666 minus the umask, applied by the OS)
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+    while True:
+        tmp_path = os.path.join(basedir, f".{secrets.token_hex(8)}.tmp")
+        try:
+            return os.open(tmp_path, flags, 0o666), tmp_path
+        except FileExistsError:
+            continue
+
+
+@contextlib.contextmanager
+def open_atomic(filename, mode='w', encoding="utf8"):
+    # The file is written to a temporary file first, and renamed when it is complete (a crash never leaves a
+    # half-written file behind)
+    basedir = os.path.dirname(os.path.abspath(filename))
+    fd, tmp_path = _create_temp_file(basedir)
+    try:
+        with os.fdopen(fd, mode, encoding=None if 'b' in mode else encoding) as f:
+            yield f
+
+        # Same permissions as the file that is replaced
+        try:
+            os.chmod(tmp_path, os.stat(filename).st_mode & 0o777)
+        except FileNotFoundError:
+            pass
+        os.replace(tmp_path, filename)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
 def create_folder(path, empty_folder=False):
     basedir = os.path.basename(path)
 
@@ -67,23 +105,50 @@ def tokenize(filename):
                   for fragment in digits.split(filename)))
 
 
+class CharTable(dict):
+    """Translation table for `str.translate` that keeps the characters matching `rgx_allowed` and deletes the rest.
+
+    The decision is made the first time a character is seen and then cached, so the text is processed in a
+    single pass. Explicit 1:1 mappings (or deletions) can be given with `mapping` (like `str.maketrans`).
+    """
+
+    def __init__(self, rgx_allowed, mapping=None):
+        super().__init__(str.maketrans(mapping) if mapping else {})
+        self.rgx_allowed = rgx_allowed
+
+    def __missing__(self, key):
+        value = key if self.rgx_allowed.match(chr(key)) else None
+        self[key] = value
+        return value
+
+
+# Only latin characters + numbers + punctuation + whitespaces
+RGX_ALLOWED_CHAR = regex.compile(r"[\p{Latin}\p{posix_alnum}\p{posix_punct}\s]")
+ALLOWED_CHARS = CharTable(RGX_ALLOWED_CHAR)
+
+
 def normalize_text(text):
     # Only latin characters + numbers + punctuation + whitespaces. (this also includes emojis)
-    return regex.sub(r"[^\p{Latin}\p{posix_alnum}\p{posix_punct}\s]", '', text)
+    return text.translate(ALLOWED_CHARS)
+
+
+@functools.lru_cache(maxsize=32)
+def compile_words(words):
+    words_regex = "|".join(words)
+    return re.compile(rf"{words_regex}", re.IGNORECASE | re.MULTILINE)
 
 
 def replace_words(text, blacklist, replace=""):
     if blacklist:
-        blacklist_regex = "|".join(blacklist)
-        blacklist_regex = re.compile(rf"{blacklist_regex}", re.IGNORECASE | re.MULTILINE)
+        blacklist_regex = compile_words(tuple(blacklist))
         return re.sub(blacklist_regex, replace, text)
     else:
         return text
 
 
 def remove_whitespace(text):
-    text = re.sub(r"\s", " ", text)
-    text = re.sub(r'[ ]{2,}', ' ', text)  # two whitespaces
+    text = RGX_WHITESPACE.sub(" ", text)
+    text = RGX_MULTIPLE_SPACES.sub(' ', text)  # two whitespaces
     return text.strip()
 
 
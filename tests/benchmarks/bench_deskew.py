@@ -0,0 +1,69 @@
+"""Benchmark: accuracy and speed of the deskew angle estimators on synthetic rotated pages.
+
+    python -m tests.benchmarks.bench_deskew --pages 10 --width 2480 --height 3508 --output bench_deskew.json
+"""
+import io
+import json
+import time
+import random
+import argparse
+import contextlib
+
+import numpy as np
+
+from file2quiz import preprocess
+from tests.benchmarks import synthetic
+from tests.benchmarks.bench_quizify import get_metadata
+
+# The legacy projection method rotates the whole page once per candidate angle (very slow at 300 DPI)
+METHODS = ["coarse-to-fine", "hough", "projection"]
+
+
+def estimate(img, method, limit):
+    if method == "projection":  # Finer grid than the default one, so that its accuracy can be compared
+        return preprocess.get_angle_text(img, method=method, limit=limit, step=0.25)
+    return preprocess.get_angle_text(img, method=method, limit=limit)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', help="Number of pages", default=10, type=int)
+    parser.add_argument('--width', help="Width of the pages (pixels)", default=1240, type=int)
+    parser.add_argument('--height', help="Height of the pages (pixels)", default=1754, type=int)
+    parser.add_argument('--limit', help="Maximum rotation (degrees)", default=5.0, type=float)
+    parser.add_argument('--methods', help="Estimators to compare", default=METHODS, choices=METHODS, nargs="+")
+    parser.add_argument('--seed', help="Seed of the generator", default=1234, type=int)
+    parser.add_argument('--output', help="Output file (JSON)", default="bench_deskew.json")
+    args = parser.parse_args()
+
+    # Pages rotated at random (and a straight one)
+    rnd = random.Random(args.seed)
+    angles = [0.0] + [round(rnd.uniform(-args.limit * 0.9, args.limit * 0.9), 2) for _ in range(args.pages - 1)]
+    pages = [synthetic.generate_page(args.width, args.height, angle=a, seed=args.seed + i) for i, a in enumerate(angles)]
+
+    records = []
+    for method in args.methods:
+        errors, times = [], []
+        for angle, img in zip(angles, pages):
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                estimated = estimate(img, method, args.limit)
+                times.append(time.perf_counter() - start)
+            errors.append(abs(float(estimated) + angle))  # The estimated angle straightens the page
+
+        record = {"method": method, "pages": len(pages), "mean_abs_error": float(np.mean(errors)),
+                  "max_abs_error": float(np.max(errors)), "ms_per_page": 1000 * float(np.mean(times)),
+                  "errors": errors, "times": times}
+        records.append(record)
+        print(f"- [INFO] {method:>14} | {len(pages)} pages | error: {record['mean_abs_error']:6.3f}º (max: "
+              f"{record['max_abs_error']:6.3f}º) | {record['ms_per_page']:10.1f} ms/page")
+
+    # Save results
+    with open(args.output, 'w', encoding="utf8") as f:
+        json.dump({"metadata": get_metadata(), "params": vars(args), "angles": angles, "results": records}, f,
+                  indent=2)
+    print(f"- [INFO] Results saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
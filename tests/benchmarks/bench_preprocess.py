@@ -0,0 +1,129 @@
+"""Benchmark: image pre-processing for OCR, unpaper (files) vs. the in-memory NumPy engine.
+
+Synthetic scanned pages are pre-processed and handed over to the OCR the way each engine does it:
+
+- unpaper: the rasterized page is written to disk (TIFF), unpaper writes a PGM, and Tesseract reads it back.
+- numpy: the page is cleaned in-process (`preprocess.image_cleaner`) and encoded as a PGM in memory (Tesseract
+  reads it from stdin).
+
+Pages/sec and the bytes written to (and read from) disk are reported. Engines whose tools are not installed are
+skipped. Use `--ocr` to include Tesseract:
+
+    python -m tests.benchmarks.bench_preprocess --pages 16 --workers 4 --output bench_preprocess.json
+"""
+import io
+import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+import concurrent.futures
+
+from PIL import Image
+
+from file2quiz import converter, preprocess, commands
+from tests.benchmarks import synthetic
+from tests.benchmarks.bench_quizify import get_metadata
+
+
+def unpaper_page(img, page_i, tmpdir, ocr=False, **kwargs):
+    io_bytes = {"written": 0, "read": 0}
+
+    # Rasterized page (ImageMagick writes a TIFF per page)
+    scanned_file = os.path.join(tmpdir, f"page-{page_i}.tiff")
+    Image.fromarray(img).save(scanned_file)
+    io_bytes["written"] += os.path.getsize(scanned_file)
+
+    # Pre-process (unpaper reads the TIFF and writes a PGM)
+    io_bytes["read"] += os.path.getsize(scanned_file)
+    images = preprocess.preprocess_img_file(scanned_file, tmpdir, page_i, **kwargs)
+    for image in images:
+        io_bytes["written"] += os.path.getsize(image)
+        io_bytes["read"] += os.path.getsize(image)  # By Tesseract
+
+        # OCR (Tesseract writes a text file)
+        if ocr:
+            savepath = os.path.join(tmpdir, f"{os.path.basename(image)}.txt")
+            converter.image2text(image, savepath, **kwargs)
+            io_bytes["written"] += os.path.getsize(savepath)
+            io_bytes["read"] += os.path.getsize(savepath)
+    return io_bytes
+
+
+def numpy_page(img, page_i, tmpdir, ocr=False, **kwargs):
+    data = preprocess.encode_pgm(preprocess.image_cleaner(img, **kwargs))
+    if ocr:
+        converter.pgm2text(data, **kwargs)
+    return {"written": 0, "read": 0}
+
+
+ENGINES = {"unpaper": unpaper_page, "numpy": numpy_page}
+REQUIRED_TOOLS = {"unpaper": ["unpaper"], "numpy": []}
+
+
+def bench_engine(engine, pages, workers, ocr, tmpdir, **kwargs):
+    func = ENGINES[engine]
+    io_bytes = {"written": 0, "read": 0}
+    engine_dir = os.path.join(tmpdir, engine)
+    os.makedirs(engine_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), \
+            concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(func, img, i, engine_dir, ocr, **kwargs) for i, img in enumerate(pages)]
+        for future in futures:
+            for key, value in future.result().items():
+                io_bytes[key] += value
+    seconds = time.perf_counter() - start
+    shutil.rmtree(engine_dir)
+
+    return {"seconds": seconds, "pages_per_sec": len(pages) / seconds, "bytes_written": io_bytes["written"],
+            "bytes_read": io_bytes["read"]}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', help="Number of pages", default=8, type=int)
+    parser.add_argument('--width', help="Width of the pages (pixels)", default=1240, type=int)
+    parser.add_argument('--height', help="Height of the pages (pixels)", default=1754, type=int)
+    parser.add_argument('--workers', help="Pages processed in parallel", default=os.cpu_count() or 1, type=int)
+    parser.add_argument('--engines', help="Engines to compare", default=list(ENGINES), choices=list(ENGINES), nargs="+")
+    parser.add_argument('--ocr', help="Include Tesseract", default=False, action="store_true")
+    parser.add_argument('--lang', help="[Tesseract] Language", default="eng")
+    parser.add_argument('--seed', help="Seed of the generator", default=1234, type=int)
+    parser.add_argument('--output', help="Output file (JSON)", default="bench_preprocess.json")
+    args = parser.parse_args()
+
+    pages = [synthetic.generate_page(args.width, args.height, angle=1.5, seed=args.seed + i) for i in range(args.pages)]
+
+    records = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for engine in args.engines:
+            tools = REQUIRED_TOOLS[engine] + (["tesseract"] if args.ocr else [])
+            missing = [tool for tool in tools if shutil.which(tool) is None]
+            if missing:
+                print(f"- [WARNING] {engine:>8} | skipped (not installed: {', '.join(missing)})")
+                records.append({"engine": engine, "skipped": f"Not installed: {', '.join(missing)}"})
+                continue
+
+            try:
+                result = bench_engine(engine, pages, args.workers, args.ocr, tmpdir, lang=args.lang)
+            except commands.CommandError as e:
+                print(f"- [ERROR] {engine:>8} | {e}")
+                records.append({"engine": engine, "error": str(e)})
+                continue
+
+            records.append({"engine": engine, "pages": args.pages, **result})
+            print(f"- [INFO] {engine:>8} | {args.pages} pages | {result['pages_per_sec']:8.2f} pages/sec | "
+                  f"written: {result['bytes_written']/1024**2:8.2f} MB | read: {result['bytes_read']/1024**2:8.2f} MB")
+
+    # Save results
+    with open(args.output, 'w', encoding="utf8") as f:
+        json.dump({"metadata": get_metadata(), "params": vars(args), "results": records}, f, indent=2)
+    print(f"- [INFO] Results saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Benchmark: hot paths of the quiz parser on synthetic exams.
+
+Results are saved as JSON (one record per variant, size and function), so that releases can be compared:
+
+    python -m tests.benchmarks.bench_quizify --sizes 10 100 1000 10000 100000 --output bench_quizify.json
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+import contextlib
+
+import file2quiz
+from file2quiz import quizify, converter
+from tests.benchmarks import synthetic
+
+DEFAULT_SIZES = [10, 100, 1000, 10000, 100000]
+
+
+def timeit(func, repeat):
+    # Best of N (the functions print warnings, which are not part of the benchmark)
+    times, result = [], None
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = func()
+            times.append(time.perf_counter() - start)
+    return min(times), times, result
+
+
+def bench_exam(exam, num_answers, single_line, repeat, tmpdir):
+    mode = "single-line" if single_line else "auto"
+    profile = file2quiz.get_parser_profile(mode, "===")
+    results = {}
+
+    def run(name, func):
+        best, times, value = timeit(func, repeat)
+        results[name] = {"seconds": best, "runs": times}
+        return value
+
+    # Inputs of each stage
+    text = quizify.get_config(exam["text"])[0]
+    text = run("preprocess_text", lambda: file2quiz.preprocess_text(text, mode=mode))
+    txt_questions, txt_answers = text.split("===", 1)
+    raw_questions = run("preprocess_questions_block",
+                        lambda: file2quiz.preprocess_questions_block(txt_questions, single_line, profile=profile))
+    run("preprocess_answers_block",
+        lambda: [file2quiz.preprocess_answers_block(q, single_line, num_answers, profile=profile) for q in raw_questions])
+
+    texts = [q[0][1] for q in exam["questions"]] + [a[1] for q in exam["questions"] for a in q[1]]
+    run("normalize_generic", lambda: [file2quiz.normalize_generic(t) for t in texts])
+    solutions = run("parse_solutions", lambda: file2quiz.parse_solutions(txt_answers, num_answers, profile=profile))
+
+    # Selector
+    answers_file = os.path.join(tmpdir, "exam.html_selected.txt")
+    file2quiz.reader.save_txt("\n".join(exam["selector_lines"]), answers_file)
+    run("find_answers_selector",
+        lambda: file2quiz.find_answers_selector(exam["questions"], answers_file, None, mode, profile=profile))
+
+    # Quiz
+    quiz = run("build_quiz", lambda: file2quiz.build_quiz(exam["questions"], solutions))
+    run("quiz2txt", lambda: converter.quiz2txt(quiz, show_answers=True))
+    run("quiz2anki", lambda: converter.quiz2anki(quiz))
+
+    # Whole parser
+    run("parse_quiz_txt", lambda: file2quiz.parse_quiz_txt(exam["text"], token_answer="===", num_answers=num_answers,
+                                                           mode=mode, profile=profile))
+    return results
+
+
+def get_metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit or None,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', help="Number of questions of the exams", default=DEFAULT_SIZES, type=int, nargs="+")
+    parser.add_argument('--variants', help="Variants of the exams", default=list(synthetic.VARIANTS),
+                        choices=list(synthetic.VARIANTS), nargs="+")
+    parser.add_argument('--repeat', help="Number of runs per function (the best one is reported)", default=3, type=int)
+    parser.add_argument('--seed', help="Seed of the generator", default=1234, type=int)
+    parser.add_argument('--output', help="Output file (JSON)", default="bench_quizify.json")
+    args = parser.parse_args()
+
+    records = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for variant in args.variants:
+            params = synthetic.VARIANTS[variant]
+            for size in args.sizes:
+                exam = synthetic.generate_exam(size, seed=args.seed, **params)
+                repeat = args.repeat if size < 10000 else 1
+                results = bench_exam(exam, params["num_answers"], params.get("single_line", False), repeat, tmpdir)
+
+                for name, values in results.items():
+                    records.append({"variant": variant, "size": size, "function": name, **values})
+                    print(f"- [INFO] {variant:>12} | {size:>7} questions | {name:<26} | {values['seconds']*1000:10.2f} ms")
+
+    # Save results
+    with open(args.output, 'w', encoding="utf8") as f:
+        json.dump({"metadata": get_metadata(), "params": vars(args), "results": records}, f, indent=2)
+    print(f"- [INFO] Results saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Benchmark: Tesseract once per page vs. batches of pages (one run per batch, the language model is loaded once).
+
+Synthetic pages are OCRed the way the pipeline does it:
+
+- files: a PGM per page. Per page: `tesseract page.pgm out` (+ reading the `.txt`). Batched: a list file.
+- memory: per page, a PGM through stdin. Batched: a multi-page TIFF through stdin.
+
+Skipped if Tesseract is not installed:
+
+    python -m tests.benchmarks.bench_tesseract_batch --pages 16 --batch-sizes 1 4 16 --lang spa+eng
+"""
+import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+from PIL import Image
+
+from file2quiz import converter, preprocess, commands
+from tests.benchmarks import synthetic
+from tests.benchmarks.bench_quizify import get_metadata
+
+
+def ocr_files(filenames, batch_size, tmpdir, **kwargs):
+    texts = []
+    for i in range(0, len(filenames), batch_size):
+        batch = filenames[i:i + batch_size]
+        if batch_size == 1:
+            savepath = os.path.join(tmpdir, "page.txt")
+            converter.image2text(batch[0], savepath, **kwargs)
+            with open(savepath, encoding="utf8") as f:
+                texts.append(f.read())
+        else:
+            texts.extend(converter.images2text(batch, **kwargs))
+    return texts
+
+
+def ocr_memory(images, batch_size, tmpdir, **kwargs):
+    texts = []
+    for i in range(0, len(images), batch_size):
+        batch = images[i:i + batch_size]
+        if batch_size == 1:
+            texts.append(converter.pgm2text(preprocess.encode_pgm(batch[0]), **kwargs))
+        else:
+            texts.extend(converter.tiff2text(preprocess.encode_tiff(batch), len(batch), **kwargs))
+    return texts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', help="Number of pages", default=16, type=int)
+    parser.add_argument('--width', help="Width of the pages (pixels)", default=1240, type=int)
+    parser.add_argument('--height', help="Height of the pages (pixels)", default=1754, type=int)
+    parser.add_argument('--batch-sizes', help="Pages per Tesseract run (1: per page)", default=[1, 4, 16], type=int, nargs="+")
+    parser.add_argument('--modes', help="Input of Tesseract", default=["files", "memory"], choices=["files", "memory"], nargs="+")
+    parser.add_argument('--lang', help="[Tesseract] Language", default="eng")
+    parser.add_argument('--dpi', help="[Tesseract] DPI", default=150, type=int)
+    parser.add_argument('--psm', help="[Tesseract] Page segmentation mode", default=3, type=int)
+    parser.add_argument('--oem', help="[Tesseract] OCR Engine mode", default=3, type=int)
+    parser.add_argument('--seed', help="Seed of the generator", default=1234, type=int)
+    parser.add_argument('--output', help="Output file (JSON)", default="bench_tesseract_batch.json")
+    args = parser.parse_args()
+
+    records = []
+    if shutil.which("tesseract") is None:
+        print("- [WARNING] Skipped (not installed: tesseract)")
+        records.append({"skipped": "Not installed: tesseract"})
+    else:
+        options = dict(lang=args.lang, dpi=args.dpi, psm=args.psm, oem=args.oem)
+        images = [synthetic.generate_page(args.width, args.height, seed=args.seed + i) for i in range(args.pages)]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filenames = []
+            for i, img in enumerate(images):
+                filenames.append(os.path.join(tmpdir, f"page-{i}.pgm"))
+                Image.fromarray(img).save(filenames[-1])
+
+            for mode in args.modes:
+                for batch_size in args.batch_sizes:
+                    try:
+                        start = time.perf_counter()
+                        if mode == "files":
+                            texts = ocr_files(filenames, batch_size, tmpdir, **options)
+                        else:
+                            texts = ocr_memory(images, batch_size, tmpdir, **options)
+                        seconds = time.perf_counter() - start
+                    except (commands.CommandError, ValueError) as e:
+                        print(f"- [ERROR] {mode:>6} | batch {batch_size:>3} | {e}")
+                        records.append({"mode": mode, "batch_size": batch_size, "error": str(e)})
+                        continue
+
+                    record = {"mode": mode, "batch_size": batch_size, "pages": args.pages, "seconds": seconds,
+                              "pages_per_sec": args.pages / seconds, "chars": sum(len(t.strip()) for t in texts)}
+                    records.append(record)
+                    print(f"- [INFO] {mode:>6} | batch {batch_size:>3} | {args.pages} pages | "
+                          f"{record['pages_per_sec']:6.2f} pages/sec | {record['chars']} chars")
+
+    # Save results
+    with open(args.output, 'w', encoding="utf8") as f:
+        json.dump({"metadata": get_metadata(), "params": vars(args), "results": records}, f, indent=2)
+    print(f"- [INFO] Results saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Benchmark: text extraction of a PDF with Tika (one request per document vs. one request per page).
+
+A local stub replaces the Tika server, so no Java is needed. The per-page requests are answered with the text of
+`tika_reference` (not with `reader.xhtml2text`), so the pages of both methods are compared for real:
+
+    python -m tests.benchmarks.bench_tika_pages --pages 400 --latency 0.005
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from bs4 import BeautifulSoup
+
+from tests.benchmarks import tika_reference
+
+# The Tika client reads its configuration when it is imported
+os.environ["TIKA_CLIENT_ONLY"] = "True"
+
+
+def make_xhtml(num_pages):
+    pages = []
+    for i in range(1, num_pages + 1):
+        # Lines end with text, block elements and line breaks (the text depends on all of them)
+        pages.append(f'<div class="page"><p/>\n<p>{i}. ¿Pregunta número {i}?\na) Respuesta A<br/>b) Respuesta B &amp; C'
+                     f'</p><p>c) Respuesta C</p><div class="annotation"><a href="#">Nota {i}</a></div>\n<p/>\n</div>\n')
+    return f'<html xmlns="http://www.w3.org/1999/xhtml"><head><title>Exam</title></head><body>{"".join(pages)}</body></html>'
+
+
+def make_handler(xhtml, latency, counter):
+    class TikaStub(BaseHTTPRequestHandler):
+        def do_PUT(self):
+            data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            with counter["lock"]:
+                counter["requests"] += 1
+            time.sleep(latency)  # Network + parsing
+
+            if self.path == "/rmeta/xml":  # Whole document
+                content = xhtml
+            else:  # /rmeta/text (HTML buffer), converted independently of `reader.xhtml2text`
+                content = tika_reference.tika_text(data.decode("utf8"))
+            body = json.dumps([{"X-TIKA:content": content}]).encode("utf8")
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return TikaStub
+
+
+def legacy_read_pdf_text(filename, tp):
+    # Reference implementation (one extra request per page)
+    pages_txt = []
+    data = tp.from_file(filename, xmlContent=True)
+    xhtml_data = BeautifulSoup(data['content'], features='lxml')
+    for content in xhtml_data.find_all('div', attrs={'class': 'page'}):
+        parsed_content = tp.from_buffer(str(content))
+        tmp = parsed_content.get("content", None)
+        pages_txt.append(tmp.strip() if tmp else "")
+    return pages_txt
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', help="Number of pages of the PDF", default=400, type=int)
+    parser.add_argument('--latency', help="Latency (in seconds) of each request to the stub", default=0.005, type=float)
+    args = parser.parse_args()
+
+    # Start stub server
+    counter = {"requests": 0, "lock": threading.Lock()}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(make_xhtml(args.pages), args.latency, counter))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["TIKA_SERVER_ENDPOINT"] = f"http://127.0.0.1:{server.server_port}"
+
+    from tika import parser as tp
+    from file2quiz import reader
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as f:
+        results = {}
+        for name, func in [("legacy", lambda: legacy_read_pdf_text(f.name, tp)),
+                           ("single", lambda: reader.read_pdf_text(f.name))]:
+            counter["requests"] = 0
+            start = time.perf_counter()
+            pages = func()
+            elapsed = time.perf_counter() - start
+            results[name] = pages
+            print(f"- [INFO] {name}: {len(pages)} pages; {counter['requests']} requests; {elapsed:.3f}s")
+
+    server.shutdown()
+    if results["legacy"] != results["single"]:
+        print("- [ERROR] The extracted pages are different")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Benchmark: `preprocess.image_cleaner` on whole pages vs. overlapping tiles processed on a thread pool.
+
+Each mode runs in its own process, so that its peak RSS can be measured:
+
+    python -m tests.benchmarks.bench_tiles --pages 4 --tile-sizes 0 512 1024 --workers 4 --output bench_tiles.json
+
+(A tile size of 0 is the whole-image path.)
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+
+from tests.benchmarks.bench_quizify import get_metadata
+
+
+def run_mode(pages, width, height, tile_size, workers, memory, seed):
+    # Runs in a child process: prints a JSON record
+    import numpy as np
+    from file2quiz import preprocess
+    from tests.benchmarks import synthetic
+
+    images = [synthetic.generate_page(width, height, angle=1.0, seed=seed + i) for i in range(pages)]
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.perf_counter()
+    checksums = []
+    for img in images:
+        result = preprocess.image_cleaner(img, tile_size=tile_size, tile_workers=workers, tile_memory=memory)
+        checksums.append(int(np.count_nonzero(result)))
+    seconds = time.perf_counter() - start
+
+    rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KB (Linux)
+    return {"seconds": seconds, "pages_per_sec": pages / seconds, "peak_rss_mb": rss_peak / 1024,
+            "rss_before_mb": rss_before / 1024, "checksums": checksums}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', help="Number of pages", default=4, type=int)
+    parser.add_argument('--width', help="Width of the pages (pixels)", default=2480, type=int)
+    parser.add_argument('--height', help="Height of the pages (pixels)", default=3508, type=int)
+    parser.add_argument('--tile-sizes', help="Tile sizes (0: whole page)", default=[0, 512, 1024], type=int, nargs="+")
+    parser.add_argument('--workers', help="Tiles processed in parallel", default=os.cpu_count() or 1, type=int)
+    parser.add_argument('--memory', help="Memory cap of the tiles in flight (MB)", default=None, type=int)
+    parser.add_argument('--seed', help="Seed of the generator", default=1234, type=int)
+    parser.add_argument('--output', help="Output file (JSON)", default="bench_tiles.json")
+    parser.add_argument('--child', help=argparse.SUPPRESS, default=None, type=int)
+    args = parser.parse_args()
+
+    # Child process (a single mode)
+    if args.child is not None:
+        record = run_mode(args.pages, args.width, args.height, args.child, args.workers, args.memory, args.seed)
+        print(json.dumps(record))
+        return
+
+    records = []
+    for tile_size in args.tile_sizes:
+        cmd = [sys.executable, "-m", "tests.benchmarks.bench_tiles", "--child", str(tile_size),
+               "--pages", str(args.pages), "--width", str(args.width), "--height", str(args.height),
+               "--workers", str(args.workers), "--seed", str(args.seed)]
+        cmd += ["--memory", str(args.memory)] if args.memory else []
+        output = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+        record = {"tile_size": tile_size, "workers": args.workers, **json.loads(output.strip().splitlines()[-1])}
+        records.append(record)
+
+        mode = f"tiles {tile_size}px" if tile_size else "whole page"
+        print(f"- [INFO] {mode:>12} | {args.pages} pages | {record['pages_per_sec']:6.3f} pages/sec | "
+              f"peak RSS: {record['peak_rss_mb']:8.1f} MB")
+
+    # The output must not depend on the mode
+    if len({tuple(r["checksums"]) for r in records}) > 1:
+        print("- [WARNING] The tiled results differ from the whole-page results")
+
+    # Save results
+    with open(args.output, 'w', encoding="utf8") as f:
+        json.dump({"metadata": get_metadata(), "params": vars(args), "results": records}, f, indent=2)
+    print(f"- [INFO] Results saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Seeded generator of synthetic exams (benchmarks and tests)."""
+import random
+import string
+
+WORDS = ["agua", "temperatura", "presión", "volumen", "energía", "calor", "masa", "densidad", "fuerza", "trabajo",
+         "potencia", "velocidad", "aceleración", "tiempo", "distancia", "carga", "corriente", "resistencia",
+         "campo", "onda", "frecuencia", "longitud", "gas", "sólido", "líquido", "mezcla", "reacción", "enlace",
+         "the", "system", "value", "process", "model", "number", "result", "method", "level", "point"]
+
+# Question/answer IDs: "12." + "a)", "3.1-" + "a.", "12." + "12a)"
+ID_STYLES = ["plain", "dotted", "prefixed"]
+
+# Presets used by the benchmarks
+VARIANTS = {
+    "plain": dict(num_answers=4, id_style="plain"),
+    "dotted": dict(num_answers=4, id_style="dotted"),
+    "prefixed": dict(num_answers=3, id_style="prefixed"),
+    "many-answers": dict(num_answers=6, id_style="plain"),
+    "ocr-noise": dict(num_answers=4, id_style="plain", noise=0.3),
+    "single-line": dict(num_answers=4, single_line=True),
+}
+
+
+def _sentence(rnd, min_words, max_words):
+    return " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(min_words, max_words)))
+
+
+def _add_noise(rnd, text, noise):
+    # OCR-like noise: extra spaces, split accents, curly quotes, broken lines
+    words = text.split(" ")
+    for i, w in enumerate(words):
+        r = rnd.random()
+        if r < noise * 0.3:
+            words[i] = w + " " * rnd.randint(1, 3)
+        elif r < noise * 0.5 and w and w[0] in "aeiou":
+            words[i] = "´" + w
+        elif r < noise * 0.6:
+            words[i] = f"“{w}”"
+        elif r < noise * 0.7 and 0 < i < len(words) - 1:
+            words[i] = w + "\n"
+    return " ".join(words)
+
+
+def _question_id(i, id_style):
+    if id_style == "dotted":
+        return f"{(i-1)//10 + 1}.{(i-1)%10 + 1}"
+    return str(i)
+
+
+def generate_exam(num_questions, num_answers=4, id_style="plain", answer_table=True, noise=0.0, single_line=False,
+                  selector_noise=0.1, seed=1234):
+    """Returns a dict with the text of the exam and the expected values:
+
+    - text: Exam (questions and, optionally, a table of solutions after "===")
+    - questions: [[q_id, question], [[ans_id, answer], ...]]
+    - solutions: [[q_id, answer_index], ...]
+    - selector_lines: Lines of a "selector" file (bold text) with the correct answers
+    """
+    rnd = random.Random(seed)
+    letters = string.ascii_lowercase
+    lines, questions, solutions, selector_lines = [], [], [], []
+
+    # File-specific params
+    if single_line:
+        lines += ["#mode=single-line", f"#num_answers={num_answers}", ""]
+
+    lines += ["Synthetic exam", "Read the questions carefully", ""]
+    for i in range(1, num_questions + 1):
+        q_id = _question_id(i, id_style)
+        question = _sentence(rnd, 6, 14).capitalize() + "?"
+        answers = [_sentence(rnd, 1, 8).capitalize() for _ in range(num_answers)]
+        correct = rnd.randrange(num_answers)
+
+        # Question
+        q_text = _add_noise(rnd, question, noise) if noise else question
+        if single_line:
+            lines.append(f"{q_id}. {q_text}")
+        elif id_style == "dotted":
+            lines.append(f"{q_id}- {q_text}")
+        else:
+            lines.append(f"{q_id}. {q_text}")
+
+        # Answers
+        for j, answer in enumerate(answers):
+            a_text = _add_noise(rnd, answer, noise).replace("\n", "") if noise else answer
+            if single_line:
+                lines.append(a_text)
+            elif id_style == "prefixed":
+                lines.append(f"{q_id}{letters[j]}) {a_text}")
+            elif id_style == "dotted":
+                lines.append(f"{letters[j]}. {a_text}")
+            else:
+                lines.append(f"{letters[j]}) {a_text}")
+        lines.append("")
+
+        questions.append([[q_id, question], [[letters[j], a] for j, a in enumerate(answers)]])
+        solutions.append([q_id, correct])
+
+        # Selector file (bold text)
+        selector_lines.append(f"{letters[correct]}) {answers[correct]}")
+        if rnd.random() < selector_noise:
+            selector_lines.append(_sentence(rnd, 2, 5))
+
+    # Table of solutions
+    if answer_table:
+        lines += ["===", "Solutions:"]
+        separators = ["-", ".", " ", ") ", "- "]
+        row = []
+        for q_id, correct in solutions:
+            row.append(f"{q_id}{rnd.choice(separators)}{letters[correct]}")
+            if len(row) == 5:
+                lines.append("   ".join(row))
+                row = []
+        lines.append("   ".join(row)) if row else None
+
+    return {"text": "\n".join(lines) + "\n", "questions": questions, "solutions": solutions,
+            "selector_lines": selector_lines}
+
+
+def generate_page(width=1240, height=1754, angle=0.0, noise=0.05, seed=1234):
+    """Returns a scanned-like page (8-bit grayscale array): lines of text, rotated `angle` degrees, with salt and
+    pepper noise and an uneven background."""
+    import numpy as np
+    from PIL import Image, ImageDraw
+
+    rnd = random.Random(seed)
+    img = Image.new("L", (width, height), color=255)
+    draw = ImageDraw.Draw(img)
+
+    # Lines of text (the default font is small, so the text is drawn at a low resolution and scaled up)
+    scale = max(1, width // 620)
+    text_img = Image.new("L", (width // scale, height // scale), color=255)
+    text_draw = ImageDraw.Draw(text_img)
+    margin, y = 30, 30
+    while y < text_img.height - 40:
+        text_draw.text((margin, y), _sentence(rnd, 5, 12).capitalize(), fill=0)
+        y += rnd.choice([14, 14, 14, 28])
+    img.paste(text_img.resize((width, height), Image.NEAREST))
+    draw.rectangle([width // 10, height - height // 12, width - width // 10, height - height // 12 + 2], fill=0)
+
+    # Rotation (as if the page had been scanned crooked)
+    if angle:
+        img = img.rotate(angle, resample=Image.BICUBIC, fillcolor=255)
+
+    # Uneven illumination and noise
+    arr = np.asarray(img, dtype=np.float32)
+    arr *= np.linspace(0.8, 1.0, width, dtype=np.float32)[None, :]
+    np_rnd = np.random.default_rng(seed)
+    mask = np_rnd.random(arr.shape) < noise
+    arr[mask] = np_rnd.integers(0, 256, size=int(mask.sum()))
+    return arr.clip(0, 255).astype(np.uint8)
@@ -0,0 +1,50 @@
+"""Reference of the plain text that Tika returns for (X)HTML (benchmarks and tests).
+
+Written from Tika's text handlers, independently of `reader.xhtml2text` (stdlib parser, events instead of a tree):
+only the text of the body (BodyContentHandler), scripts and styles are dropped (HtmlParser), and the block elements
+end with a new line (XHTMLContentHandler.ENDLINE).
+"""
+from html.parser import HTMLParser
+
+# XHTMLContentHandler.ENDLINE
+ENDLINE = {"p", "h1", "h2", "h3", "h4", "h5", "h6", "div", "ul", "ol", "dl", "pre", "hr", "blockquote", "address",
+           "fieldset", "table", "form", "noscript", "li", "dt", "dd", "noframes", "br", "tr", "select", "option",
+           "link", "script"}
+DISCARD = {"head", "script", "style"}
+VOID = {"br", "hr", "link", "meta", "img", "input", "area", "base", "col", "embed", "param", "source", "wbr"}
+
+
+class TikaTextParser(HTMLParser):
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.discard = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DISCARD:
+            self.discard += 1
+        elif tag in VOID:  # No end tag in HTML
+            self.handle_endtag(tag)
+
+    def handle_startendtag(self, tag, attrs):  # <p/>, <br/>,...
+        if tag not in VOID:
+            self.handle_starttag(tag, attrs)
+        self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in DISCARD:
+            self.discard = max(0, self.discard - 1)
+        elif tag in ENDLINE and not self.discard:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self.discard:
+            self.parts.append(data)
+
+
+def tika_text(html):
+    parser = TikaTextParser()
+    parser.feed(html)
+    parser.close()
+    return "".join(parser.parts)
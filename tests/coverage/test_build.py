@@ -0,0 +1,68 @@
+import unittest
+import os
+import io
+import shutil
+import tempfile
+import contextlib
+
+import file2quiz
+
+# global variables
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../"))
+
+
+class TestIncrementalBuild(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.input_dir = os.path.join(self.tmpdir, "raw")
+        self.output_dir = os.path.join(self.tmpdir, "out")
+        os.makedirs(self.input_dir)
+        for name in ["exam1", "exam2", "exam3"]:
+            shutil.copy(os.path.join(ROOT_DIR, "examples/raw/demo.txt"), os.path.join(self.input_dir, f"{name}.txt"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def run_build(self):
+        kwargs = dict(save_files=True, incremental=True, no_cache=True, show_answers=True)
+        with contextlib.redirect_stdout(io.StringIO()) as f:
+            file2quiz.extract_text(self.input_dir, self.output_dir, **kwargs)
+            quizzes = file2quiz.parse_quiz(os.path.join(self.output_dir, "txt"), self.output_dir, **kwargs)
+            file2quiz.convert_quiz(os.path.join(self.output_dir, "quizzes/json"), self.output_dir, "text", **kwargs)
+        return quizzes, f.getvalue()
+
+    def test_incremental_build(self):
+        quizzes1, log = self.run_build()
+        self.assertEqual(log.count("Incremental build: 3 built, 0 up to date (skipped), 0 removed"), 3)
+
+        # Nothing changed
+        quizzes2, log = self.run_build()
+        self.assertEqual(log.count("Incremental build: 0 built, 3 up to date (skipped), 0 removed"), 3)
+        self.assertEqual(quizzes2, quizzes1)
+
+        # Touched, but not modified
+        os.utime(os.path.join(self.input_dir, "exam1.txt"))
+        quizzes2, log = self.run_build()
+        self.assertEqual(log.count("Incremental build: 0 built, 3 up to date (skipped), 0 removed"), 3)
+
+        # Modify a file and remove another one
+        filename = os.path.join(self.input_dir, "exam1.txt")
+        file2quiz.reader.save_txt(file2quiz.reader.read_txt(filename).replace("impossible", "possible"), filename)
+        os.remove(os.path.join(self.input_dir, "exam3.txt"))
+        quizzes3, log = self.run_build()
+        self.assertEqual(log.count("Incremental build: 1 built, 1 up to date (skipped), 1 removed"), 3)
+        self.assertEqual(len(quizzes3), 2)
+        self.assertNotEqual(quizzes3[0][0], quizzes1[0][0])
+        self.assertEqual(quizzes3[1][0], quizzes1[1][0])
+        self.assertEqual(sorted(os.listdir(os.path.join(self.output_dir, "quizzes/text"))), ["exam1.txt.txt", "exam2.txt.txt"])
+
+        # Different parameters
+        with contextlib.redirect_stdout(io.StringIO()) as f:
+            file2quiz.convert_quiz(os.path.join(self.output_dir, "quizzes/json"), self.output_dir, "text",
+                                   save_files=True, incremental=True, show_answers=False)
+        self.assertIn("Incremental build: 2 built, 0 up to date (skipped), 0 removed", f.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
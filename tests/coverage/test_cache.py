@@ -0,0 +1,67 @@
+import unittest
+import os
+import io
+import tempfile
+import contextlib
+
+import file2quiz
+from file2quiz import cache
+
+
+class TestCache(unittest.TestCase):
+
+    def test_content_cache(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            text_cache = cache.ContentCache(tmpdir, max_size=3500)
+            keys = [cache.make_key("doc", i) for i in range(3)]
+            for i, key in enumerate(keys):
+                text_cache.set(key, {"text": str(i) * 1000})
+                os.utime(text_cache._path(key), (i, i))  # Deterministic access times
+
+            # Use the first one, so that the second one is the least recently used
+            self.assertEqual(text_cache.get(keys[0]), {"text": "0" * 1000})
+            self.assertIsNone(text_cache.get(cache.make_key("doc", 99)))
+            self.assertEqual((text_cache.hits, text_cache.misses), (1, 1))
+
+            # Add a new entry
+            text_cache.set(cache.make_key("doc", 4), {"text": "4" * 1000})
+            self.assertTrue(text_cache.size() <= 3500)
+            self.assertIsNone(text_cache.get(keys[1]))
+            self.assertIsNotNone(text_cache.get(keys[0]))
+
+    def test_extract_text(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_dir, output_dir = os.path.join(tmpdir, "raw"), os.path.join(tmpdir, "out")
+            os.makedirs(input_dir)
+            for i in range(3):
+                file2quiz.reader.save_txt(f"Question {i}?\na) Yes\nb) No", os.path.join(input_dir, f"exam{i}.txt"))
+
+            def extract(**kwargs):
+                with contextlib.redirect_stdout(io.StringIO()) as f:
+                    texts = file2quiz.extract_text(input_dir, output_dir, save_files=True, **kwargs)
+                return texts, f.getvalue()
+
+            texts1, log = extract()
+            self.assertIn("Cache: 0 hits, 3 misses", log)
+
+            # Modify a file and remove another one
+            file2quiz.reader.save_txt("Question 1?\na) Maybe", os.path.join(input_dir, "exam1.txt"))
+            os.remove(os.path.join(input_dir, "exam2.txt"))
+            texts2, log = extract()
+            self.assertIn("Cache: 1 hits, 1 misses", log)
+            self.assertEqual(texts2[0], texts1[0])
+            self.assertEqual(texts2[1][0], "Question 1?\na) Maybe")
+            self.assertEqual(sorted(os.listdir(os.path.join(output_dir, "txt"))), ["exam0.txt.txt", "exam1.txt.txt"])
+
+            # Different options
+            texts3, log = extract(lang="spa")
+            self.assertIn("Cache: 0 hits, 2 misses", log)
+
+            # Without cache
+            texts4, log = extract(no_cache=True)
+            self.assertNotIn("Cache:", log)
+            self.assertEqual(texts4, texts2)
+
+
+if __name__ == '__main__':
+    unittest.main()
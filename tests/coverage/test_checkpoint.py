@@ -0,0 +1,128 @@
+import unittest
+import os
+import io
+import shutil
+import tempfile
+import contextlib
+from unittest import mock
+
+import file2quiz
+from file2quiz import reader, utils
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.input_dir = os.path.join(self.tmpdir, "raw")
+        self.output_dir = os.path.join(self.tmpdir, "out")
+        os.makedirs(self.input_dir)
+        for name in ["exam1", "exam2", "exam3", "exam4"]:
+            reader.save_txt(f"Text of {name}", os.path.join(self.input_dir, f"{name}.txt"))
+        self.calls = []
+        self.fail = set()  # {name: exception}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def read_file(self, filename, output_dir, *args, **kwargs):
+        name = utils.get_fname(filename)[0]
+        self.calls.append(name)
+        if name in self.fail:
+            raise self.fail[name]
+        text = reader.read_txt(filename)
+        return text, (f"Selected {text}" if kwargs.get("extract_style") else None)
+
+    def run_extraction(self, **kwargs):
+        self.calls = []
+        with mock.patch.object(reader, "read_file", side_effect=self.read_file), \
+                contextlib.redirect_stdout(io.StringIO()) as f:
+            texts = file2quiz.extract_text(self.input_dir, self.output_dir, save_files=True, no_cache=True, **kwargs)
+        return texts, f.getvalue()
+
+    def test_resume(self):
+        # A bad file does not stop the batch, but the process is killed on the third one
+        self.fail = {"exam2": ValueError("Bad PDF"), "exam3": KeyboardInterrupt()}
+        self.assertRaises(KeyboardInterrupt, self.run_extraction, checkpoint=True)
+        self.assertEqual(self.calls, ["exam1", "exam2", "exam3"])
+
+        # Continue where it stopped (the failed file is not tried again)
+        self.fail = {"exam2": ValueError("Bad PDF")}
+        texts, log = self.run_extraction(resume=True)
+        self.assertEqual(self.calls, ["exam3", "exam4"])
+        self.assertEqual([text for text, _, _ in texts], ["Text of exam1", "Text of exam3", "Text of exam4"])
+        self.assertIn("Checkpoint: 2 done, 1 resumed (skipped), 0 failed, 1 failed before (skipped)", log)
+        self.assertIn("ValueError: Bad PDF", log)
+        self.assertEqual(sorted(os.listdir(os.path.join(self.output_dir, "txt"))),
+                         ["exam1.txt.txt", "exam3.txt.txt", "exam4.txt.txt"])
+
+        # Only the failures are processed again
+        self.fail = {}
+        texts, log = self.run_extraction(retry_failed=True)
+        self.assertEqual(self.calls, ["exam2"])
+        self.assertEqual(len(texts), 4)
+        self.assertIn("Checkpoint: 1 done, 3 resumed (skipped), 0 failed, 0 failed before (skipped)", log)
+
+        # Modified files and new parameters are processed again
+        reader.save_txt("New text", os.path.join(self.input_dir, "exam4.txt"))
+        texts, log = self.run_extraction(resume=True)
+        self.assertEqual(self.calls, ["exam4"])
+        texts, log = self.run_extraction(resume=True, lang="spa")
+        self.assertEqual(len(self.calls), 4)
+
+        # Without --resume, everything is processed again
+        texts, log = self.run_extraction(checkpoint=True)
+        self.assertEqual(len(self.calls), 4)
+
+    def test_no_checkpoint(self):
+        # By default, errors stop the extraction and nothing is recorded
+        self.fail = {"exam2": ValueError("Bad PDF")}
+        self.assertRaises(ValueError, self.run_extraction)
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, ".checkpoint.jsonl")))
+
+    def test_resume_selected_text(self):
+        # Texts skipped by an incremental build keep their selected text when they are resumed
+        self.run_extraction(extract_style="bold", incremental=True)
+        self.run_extraction(extract_style="bold", incremental=True, checkpoint=True)
+        self.assertEqual(self.calls, [])
+        texts, log = self.run_extraction(extract_style="bold", resume=True)
+        self.assertEqual(self.calls, [])
+        self.assertEqual(texts[0][:2], ("Text of exam1", "Selected Text of exam1"))
+
+    def test_interrupted_journal(self):
+        self.run_extraction(checkpoint=True)
+
+        # A half-written line (and a missing output) are ignored
+        with open(os.path.join(self.output_dir, ".checkpoint.jsonl"), 'a', encoding="utf8") as f:
+            f.write('{"version": 1, "file": "')
+        os.remove(os.path.join(self.output_dir, "txt", "exam1.txt.txt"))
+        texts, log = self.run_extraction(resume=True)
+        self.assertEqual(self.calls, ["exam1"])
+        self.assertEqual(len(texts), 4)
+
+    def test_open_atomic(self):
+        filename = os.path.join(self.tmpdir, "file.txt")
+        reader.save_txt("complete", filename)
+
+        # An interrupted write keeps the previous file (and no temporary files)
+        with self.assertRaises(RuntimeError):
+            with utils.open_atomic(filename) as f:
+                f.write("partial")
+                raise RuntimeError()
+        self.assertEqual(reader.read_txt(filename), "complete")
+        self.assertEqual(sorted(os.listdir(self.tmpdir)), ["file.txt", "raw"])
+
+        # Same permissions as `open()` (without changing the umask of the process), or as the replaced file
+        with open(os.path.join(self.tmpdir, "plain.txt"), 'w') as f:
+            f.write("plain")
+        os.remove(filename)
+        with mock.patch.object(os, "umask", side_effect=AssertionError):
+            reader.save_txt("new", filename)
+        self.assertEqual(os.stat(filename).st_mode, os.stat(os.path.join(self.tmpdir, "plain.txt")).st_mode)
+        os.chmod(filename, 0o640)
+        reader.save_txt("newer", filename)
+        self.assertEqual(os.stat(filename).st_mode & 0o777, 0o640)
+
+
+if __name__ == '__main__':
+    unittest.main()
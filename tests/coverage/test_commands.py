@@ -0,0 +1,188 @@
+import unittest
+import os
+import io
+import sys
+import time
+import asyncio
+import contextlib
+import concurrent.futures
+from unittest import mock
+
+from file2quiz import commands
+
+
+def python_cmd(code):
+    return [sys.executable, "-c", code]
+
+
+class TestCommands(unittest.TestCase):
+
+    def setUp(self):
+        commands.reset_stats()
+
+    def tearDown(self):
+        commands.set_max_concurrency(os.cpu_count() or 1)
+
+    def test_run_command(self):
+        result = commands.run_command(python_cmd("import sys; print('hello'); sys.stderr.write('bye')"))
+        self.assertTrue(result.ok)
+        self.assertEqual(result.stdout.strip(), b"hello")
+        self.assertEqual(result.stderr, b"bye")
+        self.assertTrue(result.wall_time > 0)
+
+        # Input
+        result = commands.run_command(python_cmd("import sys; print(sys.stdin.read().upper())"), input=b"abc")
+        self.assertEqual(result.stdout.strip(), b"ABC")
+
+    def test_errors(self):
+        with self.assertRaises(commands.CommandError) as ctx:
+            commands.run_command(python_cmd("import sys; sys.exit(3)"))
+        self.assertEqual(ctx.exception.result.returncode, 3)
+
+        # Do not raise
+        result = commands.run_command(python_cmd("import sys; sys.exit(3)"), check=False)
+        self.assertFalse(result.ok)
+
+        # Missing tool
+        with self.assertRaises(commands.CommandError):
+            commands.run_command(["file2quiz-this-tool-does-not-exist"])
+
+    def test_timeout_and_retries(self):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()) as f:
+            with self.assertRaises(commands.CommandError) as ctx:
+                commands.run_command(python_cmd("import time; time.sleep(10)"), timeout=0.2, retries=1, tool="sleep")
+        self.assertTrue(time.perf_counter() - start < 5)
+        self.assertTrue(ctx.exception.result.timed_out)
+        self.assertIn("Retrying 'sleep' (1/1)", f.getvalue())
+
+        # Stats
+        stats = commands.get_stats()["sleep"]
+        self.assertEqual((stats["calls"], stats["errors"], stats["timeouts"]), (2, 2, 2))
+
+    def test_stats(self):
+        commands.run_command(python_cmd("sum(range(10**6))"), tool="python")
+        stats = commands.get_stats()["python"]
+        self.assertEqual((stats["calls"], stats["errors"]), (1, 0))
+        self.assertTrue(stats["cpu_time"] > 0)
+        self.assertTrue(commands.format_stats()[0].startswith("- [INFO] python: 1 calls"))
+
+    def test_async(self):
+        cmds = [python_cmd(f"print({i})") for i in range(4)]
+        loop = asyncio.new_event_loop()
+        try:
+            results = loop.run_until_complete(commands.run_commands_async(cmds))
+        finally:
+            loop.close()
+        self.assertEqual([int(r.stdout) for r in results], list(range(4)))
+
+    def test_async_cancel_and_timeout(self):
+        code = "import time; time.sleep(10)"
+
+        async def cancel_after_start():
+            task = asyncio.ensure_future(commands.run_command_async(python_cmd(code)))
+            await asyncio.sleep(0.5)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        async def timeout():
+            with self.assertRaises(commands.CommandError) as ctx:
+                await commands.run_command_async(python_cmd(code), timeout=0.2)
+            return ctx.exception.result
+
+        loop = asyncio.new_event_loop()
+        try:
+            start = time.perf_counter()
+            with mock.patch.object(commands, "_kill", wraps=commands._kill) as kill:
+                loop.run_until_complete(cancel_after_start())
+                self.assertEqual(kill.call_count, 1)
+                proc = kill.call_args[0][0]
+                self.assertIsNotNone(proc.returncode)  # Killed and reaped
+                result = loop.run_until_complete(timeout())
+        finally:
+            loop.close()
+        self.assertTrue(time.perf_counter() - start < 5)
+        self.assertTrue(result.timed_out)
+
+    def test_async_stats(self):
+        loop = asyncio.new_event_loop()
+        try:
+            result = loop.run_until_complete(commands.run_command_async(python_cmd("sum(range(10**6))"), tool="python"))
+        finally:
+            loop.close()
+        self.assertTrue(result.cpu_time > 0)
+        self.assertTrue(commands.get_stats()["python"]["cpu_time"] > 0)
+
+    @unittest.skipUnless(hasattr(os, "killpg") and os.path.exists("/proc"), "Requires process groups and /proc")
+    def test_kill_process_group(self):
+        # The tool starts another process (e.g. ImageMagick and gs): both are killed
+        code = "import sys, time, subprocess; " \
+               "p = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)']); " \
+               "print(p.pid, flush=True); time.sleep(30)"
+
+        def is_running(pid):
+            deadline = time.perf_counter() + 5
+            while time.perf_counter() < deadline:
+                try:
+                    with open(f"/proc/{pid}/stat") as f:
+                        if f.read().rsplit(")", 1)[1].split()[0] == "Z":  # Killed (not reaped yet)
+                            return False
+                except FileNotFoundError:
+                    return False
+                time.sleep(0.05)
+            return True
+
+        result = commands.run_command(python_cmd(code), timeout=1, check=False)
+        self.assertTrue(result.timed_out)
+        self.assertFalse(is_running(int(result.stdout)))
+
+        loop = asyncio.new_event_loop()
+        try:
+            result = loop.run_until_complete(commands.run_command_async(python_cmd(code), timeout=1, check=False))
+        finally:
+            loop.close()
+        self.assertTrue(result.timed_out)
+        self.assertFalse(is_running(int(result.stdout)))
+
+    def test_async_max_concurrency(self):
+        commands.set_max_concurrency(1)
+        sleep = python_cmd("import time; time.sleep(0.3)")
+
+        async def cancel_while_waiting():
+            first = asyncio.ensure_future(commands.run_command_async(sleep))
+            waiting = asyncio.ensure_future(commands.run_command_async(sleep))
+            await asyncio.sleep(0.1)
+            waiting.cancel()
+            await first
+
+            # The cancelled call does not keep the process slot
+            await asyncio.wait_for(commands.run_command_async(sleep), 5)
+            await asyncio.gather(waiting, return_exceptions=True)
+
+        loop = asyncio.new_event_loop()
+        try:
+            with mock.patch.object(asyncio, "sleep", wraps=asyncio.sleep) as sleep_mock:
+                start = time.perf_counter()
+                loop.run_until_complete(commands.run_commands_async([sleep] * 3))
+                self.assertTrue(time.perf_counter() - start >= 0.9)  # One process at a time
+                self.assertEqual(sleep_mock.call_count, 0)  # No polling
+                loop.run_until_complete(cancel_while_waiting())
+        finally:
+            loop.close()
+        self.assertEqual(commands.get_stats()[os.path.basename(sys.executable)]["calls"], 5)
+
+    def test_max_concurrency(self):
+        commands.set_max_concurrency(2)
+
+        def run(i):
+            commands.run_command(python_cmd("import time; time.sleep(0.2)"))
+
+        start = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(run, range(4)))
+        self.assertTrue(time.perf_counter() - start >= 0.4)  # Two rounds of two processes
+
+
+if __name__ == '__main__':
+    unittest.main()
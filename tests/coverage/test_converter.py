@@ -0,0 +1,115 @@
+import unittest
+import os
+import io
+import random
+import string
+import tempfile
+import contextlib
+
+import file2quiz
+from file2quiz import converter, utils
+
+
+# Reference implementations (before the streaming writers were introduced)
+def legacy_quiz2anki(quiz):
+    text = ""
+    for id_question in sorted(quiz.keys(), key=utils.tokenize):
+        question = quiz[id_question]
+        if question.get('correct_answer') is None:
+            raise ValueError("No correct answer was given.")
+        fields = ["{}. {}".format(id_question, question['question']), str(int(question['correct_answer'])+1)] + question['answers']
+        text += "{}\n".format("\t".join(fields))
+    return text.strip()
+
+
+def legacy_quiz2txt(quiz, show_answers, answer_table=False):
+    txt = ""
+    txt_answers = ""
+    for id_question in sorted(quiz.keys(), key=utils.tokenize):
+        question = quiz[id_question]
+        txt += "{}. {}\n".format(id_question, question['question'])
+        for j, ans in enumerate(question['answers']):
+            marker = ""
+            ans_id = string.ascii_lowercase[j].lower()
+            if show_answers:
+                if j == question.get("correct_answer"):
+                    if answer_table:
+                        txt_answers += f"{id_question} - {ans_id}\n"
+                    else:
+                        marker = "*"
+            txt += "{}{}) {}\n".format(marker, ans_id, ans)
+        txt += "\n"
+    if show_answers and answer_table:
+        txt += "\n\n\n=========\n\n\n" + txt_answers
+    return txt.strip()
+
+
+def random_quiz(rnd, num_questions):
+    # Texts with whitespace everywhere (including empty texts)
+    chunks = ["", " ", "\n", "\t", " \n ", "word", "two words", "　", "¿qué?"]
+    quiz = {}
+    for i in range(num_questions):
+        q_id = rnd.choice([str(i + 1), f"{i}.{rnd.randint(1, 9)}", f" {i} ", ""])
+        answers = ["".join(rnd.choice(chunks) for _ in range(rnd.randint(0, 3))) for _ in range(rnd.randint(0, 5))]
+        correct = rnd.choice([None] + list(range(len(answers))))
+        quiz[q_id] = {"id": q_id, "question": "".join(rnd.choice(chunks) for _ in range(rnd.randint(0, 3))),
+                      "answers": answers, "correct_answer": correct}
+    return quiz
+
+
+class TestConverter(unittest.TestCase):
+
+    def test_strip_writer(self):
+        rnd = random.Random(1234)
+        pieces = ["", " ", "\n", "\t\n", "a", "b c", " d ", " "]
+        for _ in range(2000):
+            parts = [rnd.choice(pieces) for _ in range(rnd.randint(0, 6))]
+            f = io.StringIO()
+            writer = converter.StripWriter(f)
+            for part in parts:
+                writer.write(part)
+            self.assertEqual(f.getvalue(), "".join(parts).strip(), repr(parts))
+            self.assertEqual(writer.is_empty, not "".join(parts).strip())
+
+    def test_byte_identical(self):
+        rnd = random.Random(1234)
+        for num_questions in [0, 1, 2, 5, 20] * 40:
+            quiz = random_quiz(rnd, num_questions)
+            for show_answers in [False, True]:
+                for answer_table in [False, True]:
+                    self.assertEqual(converter.quiz2txt(quiz, show_answers, answer_table),
+                                     legacy_quiz2txt(quiz, show_answers, answer_table))
+            try:
+                expected = legacy_quiz2anki(quiz)
+            except ValueError:
+                self.assertRaises(ValueError, converter.quiz2anki, quiz)
+            else:
+                self.assertEqual(converter.quiz2anki(quiz), expected)
+
+    def test_convert_quiz_streaming(self):
+        rnd = random.Random(1)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_dir = os.path.join(tmpdir, "json")
+            os.makedirs(input_dir)
+            for i in range(3):
+                file2quiz.reader.save_json(random_quiz(rnd, 50), os.path.join(input_dir, f"quiz{i}.json"))
+
+            outputs = {}
+            for collect in [True, False]:
+                output_dir = os.path.join(tmpdir, f"collect_{collect}")
+                with contextlib.redirect_stdout(io.StringIO()):
+                    fquizzes = file2quiz.convert_quiz(input_dir, output_dir, "text", save_files=True, collect=collect,
+                                                      show_answers=True)
+                self.assertEqual(len(fquizzes), 3 if collect else 0)
+
+                convert_dir = os.path.join(output_dir, "quizzes/text")
+                self.assertEqual(sorted(os.listdir(convert_dir)), ["quiz0.txt", "quiz1.txt", "quiz2.txt"])
+                outputs[collect] = []
+                for filename in sorted(os.listdir(convert_dir)):
+                    with open(os.path.join(convert_dir, filename), 'rb') as f:
+                        outputs[collect].append(f.read())
+            self.assertEqual(outputs[True], outputs[False])
+
+
+if __name__ == '__main__':
+    unittest.main()
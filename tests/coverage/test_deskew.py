@@ -0,0 +1,43 @@
+import unittest
+import io
+import contextlib
+
+import numpy as np
+
+from file2quiz import preprocess
+from tests.benchmarks import synthetic
+
+
+class TestDeskew(unittest.TestCase):
+
+    def test_estimate_skew(self):
+        for angle in [-4.2, -1.3, 0.6, 2.5]:
+            img = synthetic.generate_page(620, 877, angle=angle, seed=1)
+            estimated, confidence = preprocess.estimate_skew(img)
+            self.assertAlmostEqual(estimated, -angle, delta=0.15, msg=f"angle: {angle}")
+            self.assertGreater(confidence, 0.5)
+
+        # Color pages
+        img = synthetic.generate_page(620, 877, angle=1.0, seed=2)
+        self.assertAlmostEqual(preprocess.estimate_skew(np.dstack([img] * 3))[0], -1.0, delta=0.15)
+
+    def test_blank_page(self):
+        self.assertEqual(preprocess.estimate_skew(np.full((877, 620), 255, dtype=np.uint8)), (0.0, 0.0))
+
+    def test_skew_rotation(self):
+        # Straight pages are not rotated
+        img = synthetic.generate_page(620, 877, angle=0.0, seed=3)
+        with contextlib.redirect_stdout(io.StringIO()) as log:
+            self.assertIs(preprocess.skew_rotation(img), img)
+        self.assertIn("No rotation needed", log.getvalue())
+
+        # Crooked pages are straightened
+        img = synthetic.generate_page(620, 877, angle=2.0, seed=3)
+        with contextlib.redirect_stdout(io.StringIO()):
+            rotated = preprocess.skew_rotation(img)
+        self.assertEqual(rotated.shape, img.shape)
+        self.assertAlmostEqual(preprocess.estimate_skew(rotated)[0], 0.0, delta=0.15)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+import threading
+
+import numpy as np
+
+from file2quiz import preprocess
+from tests.benchmarks import synthetic
+
+
+class TestImageCleaner(unittest.TestCase):
+
+    def test_tiled(self):
+        img = synthetic.generate_page(620, 877, angle=1.0, seed=1)
+        whole = preprocess.image_cleaner(img)
+
+        # Same page, without seams (tiles that do not divide the page too)
+        for tile_size in [200, 300]:
+            tiled = preprocess.image_cleaner(img, tile_size=tile_size, tile_workers=3)
+            self.assertEqual(tiled.dtype, whole.dtype)
+            np.testing.assert_array_equal(tiled, whole)
+
+    def test_apply_tiled(self):
+        img = np.arange(100 * 70, dtype=np.float32).reshape(100, 70)
+        running = {"now": 0, "max": 0}
+        lock = threading.Lock()
+
+        def box_filter(tile):
+            with lock:
+                running["now"] += 1
+                running["max"] = max(running["max"], running["now"])
+            result = sum(np.roll(np.roll(tile, dy, 0), dx, 1) for dy in (-1, 0, 1) for dx in (-1, 0, 1))
+            with lock:
+                running["now"] -= 1
+            return result
+
+        # The center of the tiles is the same as filtering the whole image
+        tiled = preprocess.apply_tiled(box_filter, img, margin=2, tile_size=16, workers=4)
+        np.testing.assert_array_equal(tiled[1:-1, 1:-1], box_filter(img)[1:-1, 1:-1])
+
+        # Memory cap (a single tile at a time)
+        running["max"] = 0
+        tile_mb = (16 + 2 * 2) ** 2 * preprocess.TILE_BYTES_PER_PIXEL / 1024**2
+        preprocess.apply_tiled(box_filter, img, margin=2, tile_size=16, workers=4, max_memory=tile_mb)
+        self.assertEqual(running["max"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
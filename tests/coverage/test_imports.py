@@ -0,0 +1,64 @@
+import unittest
+import os
+import sys
+import subprocess
+
+# global variables
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../"))
+
+# Only needed to read PDFs, HTML files and images
+HEAVY_MODULES = ["numpy", "scipy", "skimage", "cv2", "PIL", "deskew", "tika", "bs4", "lxml", "selenium",
+                 "file2quiz.ocr", "file2quiz.preprocess"]
+
+
+def get_imported_modules(code):
+    # Modules imported by a fresh interpreter (as reported by `python -X importtime`)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT_DIR, capture_output=True,
+                            text=True, check=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            if cumulative_us.strip().isdigit():
+                modules[name.strip()] = int(cumulative_us)
+    return modules
+
+
+class TestImports(unittest.TestCase):
+
+    def assertNoHeavyModules(self, modules):
+        heavy = sorted(m for m in modules if m.split(".")[0] in HEAVY_MODULES or m in HEAVY_MODULES)
+        self.assertEqual(heavy, [])
+
+    def test_import_package(self):
+        modules = get_imported_modules("import file2quiz")
+        self.assertIn("file2quiz", modules)
+        self.assertNoHeavyModules(modules)
+
+    def test_text_actions(self):
+        # Parsing and converting quizzes never touch an image
+        code = "\n".join([
+            "import io, contextlib, tempfile, shutil, file2quiz",
+            "d = tempfile.mkdtemp()",
+            "shutil.copy('examples/raw/demo.txt', d)",
+            "with contextlib.redirect_stdout(io.StringIO()):",
+            "    file2quiz.parse_quiz(d, d, token_answer='===', save_files=True)",
+            "    file2quiz.convert_quiz(d + '/quizzes/json', d, 'anki', save_files=True)",
+            "shutil.rmtree(d)",
+        ])
+        self.assertNoHeavyModules(get_imported_modules(code))
+
+    def test_lazy_imports(self):
+        # The heavy modules are still loaded when they are needed
+        code = "\n".join([
+            "import os, tempfile, file2quiz",
+            "f = tempfile.NamedTemporaryFile('w', suffix='.html', delete=False)",
+            "f.write('<p>1. Question?</p>'); f.close()",
+            "assert file2quiz.reader.read_html_bs4(f.name)[0] == '1. Question?'",
+            "os.remove(f.name)",
+        ])
+        self.assertIn("bs4", get_imported_modules(code))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+import os
+import io
+import types
+import shutil
+import tempfile
+import contextlib
+
+import file2quiz
+from file2quiz import reader, converter, models
+
+
+# global variables
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../"))
+
+
+class TestJsonl(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.input_dir = os.path.join(self.tmpdir, "txt")
+        os.makedirs(self.input_dir)
+        shutil.copy(os.path.join(ROOT_DIR, "examples/raw/demo.txt"), self.input_dir)
+        shutil.copy(os.path.join(ROOT_DIR, "examples/blacklist.txt"), self.tmpdir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def run_quiet(self, func, *args, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return func(*args, **kwargs)
+
+    def test_round_trip(self):
+        quiz = file2quiz.parse_quiz_txt(reader.read_txt(os.path.join(ROOT_DIR, "examples/raw/demo.txt")),
+                                        token_answer="^(===|solUtIoNs:)")
+        filename = os.path.join(self.tmpdir, "demo.jsonl")
+        reader.save_quiz(quiz, filename)
+
+        # One question per line, sorted by key
+        lines = reader.read_txt(filename).splitlines()
+        self.assertEqual(len(lines), len(quiz))
+        self.assertEqual(reader.read_quiz(filename), quiz)
+
+        # Lazy reader
+        questions = reader.iter_quiz(filename)
+        self.assertIsInstance(questions, types.GeneratorType)
+        self.assertEqual(next(questions)[0], "1")
+        self.assertEqual(reader.get_quiz_format("a/b.JSONL"), "jsonl")
+        self.assertEqual(reader.get_quiz_format("a/b.json"), "json")
+
+    def test_convert(self):
+        for quiz_format in ["json", "jsonl"]:
+            self.run_quiet(file2quiz.parse_quiz, self.input_dir, self.tmpdir, token_answer="^(===|solUtIoNs:)",
+                           save_files=True, quiz_format=quiz_format)
+        self.assertTrue(os.path.exists(os.path.join(self.tmpdir, "quizzes/jsonl/demo.jsonl")))
+
+        # Same output from both formats
+        outputs = {}
+        for quiz_format in ["json", "jsonl"]:
+            fquizzes = self.run_quiet(file2quiz.convert_quiz, os.path.join(self.tmpdir, f"quizzes/{quiz_format}"),
+                                      self.tmpdir, "text", show_answers=True)
+            outputs[quiz_format] = fquizzes[0][0]
+        self.assertEqual(outputs["json"], outputs["jsonl"])
+
+        # Filter questions
+        fquizzes = self.run_quiet(file2quiz.convert_quiz, os.path.join(self.tmpdir, "quizzes/jsonl"), self.tmpdir,
+                                  "text", show_answers=True, filter="pattern")
+        self.assertTrue(fquizzes[0][0].startswith("3.1. Can we exclude certain words or patterns?"))
+        self.assertEqual(fquizzes[0][0].count("\n\n"), 0)
+
+    def test_convert_json_order(self):
+        # JSON quizzes are converted sorted by key, whatever the order of the file
+        quiz = file2quiz.build_quiz([[["10", "Tenth"], [["a", "Yes"]]], [["2", "Second"], [["a", "No"]]]], [])
+        json_dir = os.path.join(self.tmpdir, "json")
+        os.makedirs(json_dir)
+        reader.save_json(quiz, os.path.join(json_dir, "quiz.json"))
+
+        fquizzes = self.run_quiet(file2quiz.convert_quiz, json_dir, self.tmpdir, "text", show_answers=False)
+        self.assertEqual(fquizzes[0][0], converter.quiz2txt(reader.read_quiz(os.path.join(json_dir, "quiz.json")),
+                                                            show_answers=False))
+        self.assertLess(fquizzes[0][0].index("2. Second"), fquizzes[0][0].index("10. Tenth"))
+
+    def test_merged_stream(self):
+        # Questions of many quizzes with the same keys (e.g. a merged bank) are kept in order
+        quiz = file2quiz.build_quiz([[["1", "First question"], [["a", "Yes"], ["b", "No"]]]], [["1", 0]])
+        filename = os.path.join(self.tmpdir, "merged.jsonl")
+        quiz = models.Quiz.from_dict(quiz)
+        reader.save_jsonl((item for _ in range(3) for item in quiz.items()), filename)
+
+        text = converter.quiz2anki(reader.iter_jsonl(filename))
+        self.assertEqual(text.splitlines(), ["1. First question\t1\tYes\tNo"] * 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
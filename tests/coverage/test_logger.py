@@ -0,0 +1,70 @@
+import unittest
+import os
+import io
+import json
+import shutil
+import tempfile
+import contextlib
+
+import file2quiz
+from file2quiz import logger
+
+# global variables
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../"))
+
+
+class TestLogger(unittest.TestCase):
+
+    def tearDown(self):
+        logger.configure()
+
+    def test_levels(self):
+        calls = []
+
+        def summary(text):
+            calls.append(text)
+            return text
+
+        logger.configure(level="warning")
+        with contextlib.redirect_stdout(io.StringIO()) as f:
+            logger.info("info_category", "Not shown [%s]", logger.Lazy(summary, "a"))
+            logger.warning("warning_category", "Shown [%s]", logger.Lazy(summary, "b"))
+        self.assertEqual(f.getvalue(), "\t- [WARNING] Shown [b]\n")
+        self.assertEqual(calls, ["b"])  # Lazy formatting
+        self.assertEqual(logger.get_counts(), {"info_category": 1, "warning_category": 1})
+        self.assertEqual(logger.format_counts(), ["- [WARNING] warning_category: 1", "- [INFO] info_category: 1"])
+
+    def test_quiet(self):
+        logger.configure(quiet=True)
+        with contextlib.redirect_stdout(io.StringIO()) as f:
+            quiz = file2quiz.parse_quiz_txt(file2quiz.reader.read_txt(os.path.join(ROOT_DIR, "examples/raw/demo.txt")),
+                                            token_answer="===", num_answers=3)
+        self.assertEqual(len(quiz), 3)
+        self.assertNotIn("More answers", f.getvalue())
+        self.assertEqual(logger.get_counts()["more_answers"], 3)
+
+    def test_diagnostics_workers(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for i in range(3):
+                shutil.copy(os.path.join(ROOT_DIR, "examples/raw/demo.txt"), os.path.join(tmpdir, f"exam{i}.txt"))
+
+            diagnostics = os.path.join(tmpdir, "diagnostics.jsonl")
+            logger.configure(quiet=True, diagnostics=diagnostics)
+            with contextlib.redirect_stdout(io.StringIO()) as f:
+                file2quiz.parse_quiz(tmpdir, tmpdir, token_answer="===", num_answers=3, jobs=2)
+            logger.get_logger().close()
+
+            # Counts of the workers are shown in the summary
+            self.assertNotIn("More answers", f.getvalue())
+            self.assertIn("- [WARNING] more_answers: 9", f.getvalue())
+
+            # All the messages are saved
+            with open(diagnostics, encoding="utf8") as f:
+                records = [json.loads(line) for line in f]
+            records = [r for r in records if r["category"] == "more_answers"]
+            self.assertEqual(sorted(r["file"] for r in records), sorted([f"exam{i}.txt" for i in range(3)] * 3))
+            self.assertTrue(records[0]["message"].startswith("More answers (4) than expected (3)"))
+
+
+if __name__ == '__main__':
+    unittest.main()
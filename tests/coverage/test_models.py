@@ -0,0 +1,90 @@
+import unittest
+import os
+import json
+import pickle
+import tempfile
+
+import file2quiz
+from file2quiz.models import Question, Quiz
+
+
+class TestModels(unittest.TestCase):
+
+    def test_question(self):
+        q = Question("1", "What?", ["Yes", "No"], 1)
+        self.assertFalse(hasattr(q, "__dict__"))  # Compact
+        self.assertEqual(q.answers, ("Yes", "No"))
+        self.assertEqual(q._correct_answer, 1)
+
+        # Dictionary interface
+        self.assertEqual(q["answers"], ("Yes", "No"))
+        self.assertEqual(q.get("correct_answer"), 1)
+        self.assertIsNone(q.get("unknown"))
+        self.assertRaises(KeyError, q.__getitem__, "unknown")
+
+        # Unknown correct answer
+        q.correct_answer = None
+        self.assertIsNone(q.correct_answer)
+        self.assertEqual(q._correct_answer, -1)
+
+        # Letters (parse_solutions(letter2num=False)) and numbers as text
+        q.correct_answer = "b"
+        self.assertEqual(q["correct_answer"], "b")
+        q["correct_answer"] = "2"
+        self.assertEqual(q.correct_answer, 2)
+
+    def test_mutation(self):
+        # Changes made through the dictionary interface are kept
+        quiz = Quiz([Question("1", "What?", ["Yes", "No"], 1)])
+        quiz["1"]["answers"] += ("Maybe",)
+        quiz["1"]["question"] = "What now?"
+        quiz["2"] = {"id": "2", "question": "Why?", "answers": ["A"], "correct_answer": None}
+        self.assertEqual(quiz["1"].answers, ("Yes", "No", "Maybe"))
+        quiz["1"]["answers"] = ["Yes", "No"]
+        self.assertEqual(quiz["1"].answers, ("Yes", "No"))
+        self.assertEqual(quiz["1"].question, "What now?")
+        self.assertIsInstance(quiz["2"], Question)
+        del quiz["1"]
+        self.assertEqual(json.loads(json.dumps(quiz.to_dict())), {"2": quiz["2"].to_dict()})
+        self.assertRaises(KeyError, quiz["2"].__setitem__, "unknown", 1)
+
+    def test_json_schema(self):
+        data = {
+            "1": {"id": "1", "question": "What?", "answers": ["Yes", "No"], "correct_answer": 0},
+            "3.1": {"id": "3.1", "question": "Why?", "answers": ["A", "B", "C"], "correct_answer": None},
+        }
+        quiz = Quiz.from_dict(data)
+        self.assertEqual(quiz.to_dict(), data)
+        self.assertEqual(quiz, data)
+        self.assertEqual(list(quiz.keys()), ["1", "3.1"])
+        self.assertEqual(pickle.loads(pickle.dumps(quiz)), quiz)
+
+        # Save/load
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, "quiz.json")
+            file2quiz.reader.save_quiz(quiz, filename)
+            with open(filename) as f:
+                self.assertEqual(json.load(f), data)
+            self.assertEqual(file2quiz.reader.read_quiz(filename), quiz)
+
+    def test_build_quiz(self):
+        questions = [[["1", "What?"], [["a", "Yes"], ["b", "No"]]], [["2", "Why?"], [["a", "A"], ["b", "B"]]]]
+        # Same JSON schema as before (it can be saved with `json.dump`)
+        data = file2quiz.build_quiz(questions, [["2", 1]])
+        self.assertEqual(json.loads(json.dumps(data)), {
+            "1": {"id": "1", "question": "What?", "answers": ["Yes", "No"], "correct_answer": None},
+            "2": {"id": "2", "question": "Why?", "answers": ["A", "B"], "correct_answer": 1},
+        })
+
+        # Compact model
+        quiz = file2quiz.quizify._build_quiz(questions, [["2", 1]])
+        self.assertIsInstance(quiz, Quiz)
+        self.assertEqual(quiz, data)
+        self.assertIsNone(quiz["1"].correct_answer)
+        self.assertEqual(quiz["2"].correct_answer, 1)
+        self.assertEqual(file2quiz.converter.quiz2txt(quiz, show_answers=True),
+                         file2quiz.converter.quiz2txt(quiz.to_dict(), show_answers=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
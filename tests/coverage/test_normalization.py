@@ -0,0 +1,109 @@
+import unittest
+import os
+
+import regex
+
+import file2quiz
+from file2quiz import utils
+
+
+# global variables
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../"))
+
+EXTRA_SAMPLES = [
+    "3. Testing normalization   ???  ",
+    "the T    ª is   -    10 º        C  .",
+    "has <  10      mm2 and >=    -  10.0    Kg.",
+    "the \"discount\" is + 12   %",
+    "¿Testing broken question from\n1923?\t",
+    "La temperatura mínima que un objeto puede alcanzar es de: ",
+    "- 273,15 ºC ", "+273,15  º K ", "- 215,58 ºF ",
+    "km recorridos en 3 horas", "mol de agua", "cd por metro", "Hz de la señal...",
+    "la pala- bra está rota", "( espacios ) [ dentro ] { de } ¡ signos ! ¿ vale ?",
+    "5 kg, 10 m2, 3 min, 20 Pa y 2 bar", "un 50 %", "", " ", "ab", ".", "?:",
+]
+
+
+# Reference implementation (before the normalization engine was introduced)
+def legacy_normalize_question(text, sentence_case=True):
+    text = regex.sub(r"([\s,;:\-\.\?]*)([\?:])(\s*)$", r"\2", text)
+    return legacy_normalize_generic(text, sentence_case)
+
+
+def legacy_normalize_answer(text, sentence_case=True):
+    text = regex.sub(r"([\s\.]*)$", "", text)
+    return legacy_normalize_generic(text, sentence_case)
+
+
+def legacy_normalize_generic(text, sentence_case=True):
+    si_prefixes = ['', 'Y', 'Z', 'E', 'P', 'T', 'G', 'M', 'k', 'h', 'd', 'c', 'm', 'μ', 'n', 'p', 'f', 'a', 'z', 'y']
+    si_units = ['s', 'm', 'k', 'a', 'k', 'mol', 'cd']
+    si_units_der = ['rad', 'sr', 'Hz', 'N', 'Pa', 'J', 'W', 'C', 'V', 'F', 'Ω', 'S', 'Wb', 'T', 'H', '°C', 'lm', 'lx',
+                    'Bq', 'Gy', 'Sv', 'kat'
+                                      'l', 'eV', 'º', 'm2', 'm3', 'm²', 'm³']
+    RESERVED_WORDS = set([f"{p}{u}" for p in si_prefixes for u in si_units + si_units_der])
+
+    text = utils.remove_whitespace(text)
+    if sentence_case and len(text) > 2:
+        first_word = text.split()[0] if text else ""
+        text = text[0].upper() + text[1:] if first_word not in RESERVED_WORDS else text
+    broken_lines = regex.compile(r"(?<=\p{Latin}+)( *[\-\u2012\u2013\u2014\u2015\u2053]+\s+)(?=\p{Latin}+)", regex.MULTILINE)
+    text = regex.sub(broken_lines, r"", text)
+    text = regex.sub(r"(?<=[\(\[\{\¿\¡]+)(\s+)", '', text)
+    text = regex.sub(r"(\s+)(?=[\)\]\}\?\!\,\.]+)", '', text)
+    rgx_metrics = regex.compile(r"(?<=\d+)(\s*)(?=(K|H|D|Da|d|c|m)?(m|s|g|hz|w|v|k|t|min|h|n|Pa|bar)(2|3|²|³)?(?!\p{Latin}))", regex.IGNORECASE|regex.MULTILINE)
+    text = regex.sub(rgx_metrics, '', text)
+    text = regex.sub(regex.compile(r"(?<=\+|\-)(\s*)(?=\d+)", regex.IGNORECASE | regex.MULTILINE), '', text)
+    text = regex.sub(regex.compile(r"(?<=<|<=|>|>=)(\s*)(?=[\+|\-]?\d+)", regex.IGNORECASE | regex.MULTILINE), r'', text)
+    text = regex.sub(regex.compile(r"(\d+) *%", regex.IGNORECASE | regex.MULTILINE), r'\1%', text)
+    text = regex.sub(regex.compile(r"(\d+) *º *([CKF])", regex.IGNORECASE|regex.MULTILINE), r'\1º\2', text)
+    text = regex.sub(regex.compile(r" +T *ª", regex.MULTILINE), r' Tª', text)
+    return text.strip()
+
+
+def get_corpus_samples():
+    samples = list(EXTRA_SAMPLES)
+    for filename in utils.get_files(os.path.join(ROOT_DIR, "examples/raw/"), extensions={'txt'}):
+        text = file2quiz.reader.read_txt(filename)
+        lines = text.split('\n')
+
+        # Raw lines, and windows of lines
+        samples += lines
+        samples += ["\n".join(lines[i:i+3]) for i in range(len(lines))]
+
+        # Parsed blocks
+        for mode in ["auto", "single-line"]:
+            ptext = file2quiz.preprocess_text(text, mode=mode)
+            for raw_question in file2quiz.preprocess_questions_block(ptext, single_line=(mode == "single-line")):
+                samples.append(raw_question)
+                samples += [content for b_id, content in file2quiz.preprocess_answers_block(raw_question, num_expected_answers=4)]
+    return samples
+
+
+class TestNormalization(unittest.TestCase):
+
+    def test_engine_is_shared(self):
+        self.assertIs(file2quiz.get_normalizer(), file2quiz.get_normalizer())
+
+    def test_equivalence(self):
+        normalizer = file2quiz.get_normalizer()
+        samples = get_corpus_samples()
+        self.assertTrue(len(samples) > 50)
+
+        for text in samples:
+            for sentence_case in [True, False]:
+                self.assertEqual(normalizer.normalize_question(text, sentence_case), legacy_normalize_question(text, sentence_case))
+                self.assertEqual(normalizer.normalize_answer(text, sentence_case), legacy_normalize_answer(text, sentence_case))
+                self.assertEqual(normalizer.normalize_generic(text, sentence_case), legacy_normalize_generic(text, sentence_case))
+
+    def test_normalize_many(self):
+        normalizer = file2quiz.get_normalizer()
+        samples = get_corpus_samples()
+
+        self.assertEqual(normalizer.normalize_many(samples, kind="question"), [legacy_normalize_question(t) for t in samples])
+        self.assertEqual(normalizer.normalize_many(samples, kind="answer"), [legacy_normalize_answer(t) for t in samples])
+        self.assertRaises(ValueError, normalizer.normalize_many, samples, kind="unknown")
+
+
+if __name__ == '__main__':
+    unittest.main()
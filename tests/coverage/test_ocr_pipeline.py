@@ -0,0 +1,285 @@
+import unittest
+import os
+import io
+import time
+import random
+import shutil
+import tempfile
+import threading
+import contextlib
+from unittest import mock
+
+import numpy as np
+from PIL import Image
+
+from file2quiz import ocr, converter, preprocess, commands, cache
+
+
+class FakeTools:
+    """Replaces ImageMagick, unpaper and Tesseract with functions that write fake files (with random delays)"""
+
+    def __init__(self, seed=1234):
+        self.rnd = random.Random(seed)
+        self.lock = threading.Lock()
+        self.running = {"raster": 0, "preprocess": 0, "ocr": 0}
+        self.max_running = {"raster": 0, "preprocess": 0, "ocr": 0}
+        self.env = []
+        self.in_memory = 0  # Rasterized pages not OCRed yet
+        self.max_in_memory = 0
+
+    @contextlib.contextmanager
+    def track(self, stage):
+        with self.lock:
+            self.running[stage] += 1
+            self.max_running[stage] = max(self.max_running[stage], self.running[stage])
+            delay = self.rnd.random() * 0.02
+        time.sleep(delay)
+        yield
+        with self.lock:
+            self.running[stage] -= 1
+
+    def pdf2image(self, filename, savepath, page=None, **kwargs):
+        with self.track("raster"):
+            with open(f"{savepath}/page-{page}.tiff", 'w') as f:
+                f.write(str(page))
+
+    def preprocess_img_file(self, filename, savepath, page_i, **kwargs):
+        with self.track("preprocess"):
+            savepath = f"{savepath}/doc_page{page_i}_1.pgm"
+            shutil.copy(filename, savepath)
+            return [savepath]
+
+    def image2text(self, filename, savepath, env=None, **kwargs):
+        with self.track("ocr"):
+            with open(filename) as f:
+                page = f.read()
+            with open(savepath, 'w') as f:
+                f.write(f"Text of page {page}")
+            self.env.append(env)
+
+    def pdf2pgm(self, filename, first_page, last_page, **kwargs):
+        # Each page is filled with its number (the document has 20 pages)
+        with self.track("raster"):
+            if first_page >= 20:
+                raise commands.CommandError("Invalid page range")
+            pages = range(first_page, min(last_page, 19) + 1)
+            with self.lock:
+                self.in_memory += len(pages)
+                self.max_in_memory = max(self.max_in_memory, self.in_memory)
+            return b"".join(preprocess.encode_pgm(np.full((4, 6), page, dtype=np.uint8)) for page in pages)
+
+    def image_cleaner(self, img, **kwargs):
+        with self.track("preprocess"):
+            return img
+
+    def pgm2text(self, data, env=None, **kwargs):
+        with self.track("ocr"):
+            img = preprocess.decode_pgm(data)[0]
+            self.env.append(env)
+            with self.lock:
+                self.in_memory -= 1
+            return f"Text of page {img[0, 0]}\n\f"
+
+    def tiff2text(self, data, num_pages, env=None, **kwargs):
+        with self.track("ocr"):
+            tiff = Image.open(io.BytesIO(data))
+            pages = []
+            for i in range(tiff.n_frames):
+                tiff.seek(i)
+                pages.append(f"Text of page {np.asarray(tiff)[0, 0]}\n\f")
+            self.env.append(env)
+            with self.lock:
+                self.in_memory -= len(pages)
+            return converter.split_pages("".join(pages), num_pages)
+
+    def images2text(self, filenames, env=None, **kwargs):
+        with self.track("ocr"):
+            texts = []
+            for filename in filenames:
+                with open(filename) as f:
+                    texts.append(f"Text of page {f.read()}\n\f")
+            self.env.append(env)
+            return converter.split_pages("".join(texts), len(filenames))
+
+
+class TestOCRPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.tools = FakeTools()
+        self.patches = [
+            mock.patch.object(converter, "pdf_num_pages", return_value=20),
+            mock.patch.object(converter, "pdf2image", side_effect=self.tools.pdf2image),
+            mock.patch.object(preprocess, "preprocess_img_file", side_effect=self.tools.preprocess_img_file),
+            mock.patch.object(converter, "image2text", side_effect=self.tools.image2text),
+            mock.patch.object(converter, "pdf2pgm", side_effect=self.tools.pdf2pgm),
+            mock.patch.object(preprocess, "image_cleaner", side_effect=self.tools.image_cleaner),
+            mock.patch.object(converter, "pgm2text", side_effect=self.tools.pgm2text),
+            mock.patch.object(converter, "tiff2text", side_effect=self.tools.tiff2text),
+            mock.patch.object(converter, "images2text", side_effect=self.tools.images2text),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def test_pipeline(self):
+        pipeline = ocr.OCRPipeline(raster_workers=2, preprocess_workers=3, ocr_workers=4)
+        with contextlib.redirect_stdout(io.StringIO()):
+            pages = pipeline.run(os.path.join(self.tmpdir, "doc.pdf"), self.tmpdir, lang="eng")
+
+        # Pages are returned in order
+        self.assertEqual(pages, [f"Text of page {i}" for i in range(20)])
+
+        # Workers per stage
+        self.assertTrue(1 < self.tools.max_running["raster"] <= 2)
+        self.assertTrue(1 < self.tools.max_running["preprocess"] <= 3)
+        self.assertTrue(1 < self.tools.max_running["ocr"] <= 4)
+
+    def test_pipeline_in_memory(self):
+        pipeline = ocr.OCRPipeline(raster_workers=2, preprocess_workers=3, ocr_workers=4)
+        with contextlib.redirect_stdout(io.StringIO()):
+            pages = pipeline.run(os.path.join(self.tmpdir, "doc.pdf"), self.tmpdir, lang="eng",
+                                 preprocess_engine="numpy", ocr_batch_size=3)
+
+        # Pages are returned in order, without intermediate files
+        self.assertEqual(pages, [f"Text of page {i}" for i in range(20)])
+        self.assertEqual(os.listdir(self.tmpdir), [])
+
+        # Workers per stage
+        self.assertEqual(converter.pdf2pgm.call_count, 7)  # Batches
+        self.assertTrue(1 < self.tools.max_running["raster"] <= 2)
+        self.assertTrue(self.tools.max_running["preprocess"] <= 3)
+        self.assertTrue(1 < self.tools.max_running["ocr"] <= 4)
+
+    def test_pipeline_streaming(self):
+        # Unknown number of pages: the document is rasterized until it ends
+        pipeline = ocr.OCRPipeline(raster_workers=2, preprocess_workers=1, ocr_workers=1)
+        with mock.patch.object(converter, "pdf_num_pages", return_value=None), \
+                contextlib.redirect_stdout(io.StringIO()) as log:
+            pages = pipeline.run(os.path.join(self.tmpdir, "doc.pdf"), self.tmpdir, lang="eng",
+                                 preprocess_engine="numpy", ocr_batch_size=3)
+        self.assertEqual(pages, [f"Text of page {i}" for i in range(20)])
+        self.assertNotIn("ERROR", log.getvalue())
+
+        # Rasterization waits for the OCR (windows ahead + pages pending)
+        self.assertLessEqual(self.tools.max_in_memory, 3 + 3 + 2 * 2)
+
+    def test_pipeline_tesseract_batch(self):
+        # Pages OCRed in groups of 6 (one Tesseract run per group)
+        pipeline = ocr.OCRPipeline(raster_workers=2, preprocess_workers=3, ocr_workers=2)
+        with contextlib.redirect_stdout(io.StringIO()):
+            pages = pipeline.run(os.path.join(self.tmpdir, "doc.pdf"), self.tmpdir, lang="eng", tesseract_batch=6)
+        self.assertEqual(pages, [f"Text of page {i}\n" for i in range(20)])
+        self.assertEqual(converter.images2text.call_count, 4)
+        self.assertEqual(converter.image2text.call_count, 0)
+
+        # In memory (multi-page TIFFs)
+        with contextlib.redirect_stdout(io.StringIO()):
+            pages = pipeline.run(os.path.join(self.tmpdir, "doc.pdf"), self.tmpdir, lang="eng",
+                                 preprocess_engine="numpy", ocr_batch_size=3, tesseract_batch=6)
+        self.assertEqual(pages, [f"Text of page {i}" for i in range(20)])
+        self.assertEqual(converter.tiff2text.call_count, 4)
+        self.assertEqual(converter.pgm2text.call_count, 0)
+        self.assertEqual(self.tools.in_memory, 0)
+
+    def test_pipeline_tesseract_batch_fallback(self):
+        # The pages of a failed batch are OCRed one by one
+        pipeline = ocr.OCRPipeline(raster_workers=2, preprocess_workers=1, ocr_workers=1)
+        with mock.patch.object(converter, "tiff2text", side_effect=ValueError("Expected 5 pages")), \
+                contextlib.redirect_stdout(io.StringIO()) as log:
+            pages = pipeline.run(os.path.join(self.tmpdir, "doc.pdf"), self.tmpdir, lang="eng",
+                                 preprocess_engine="numpy", tesseract_batch=5)
+        self.assertEqual(pages, [f"Text of page {i}" for i in range(20)])
+        self.assertEqual(converter.pgm2text.call_count, 20)
+        self.assertIn("[WARNING] Batch OCR failed", log.getvalue())
+
+    def test_ocr_cache(self):
+        ocr_cache = cache.ContentCache(os.path.join(self.tmpdir, "cache"))
+        pipeline = ocr.OCRPipeline(raster_workers=2, preprocess_workers=2, ocr_workers=2, ocr_cache=ocr_cache)
+        filename = os.path.join(self.tmpdir, "doc.pdf")
+        expected = [f"Text of page {i}" for i in range(20)]
+
+        # In memory: the second run does not OCR any page
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(pipeline.run(filename, self.tmpdir, lang="eng", preprocess_engine="numpy"), expected)
+            self.assertEqual(pipeline.run(filename, self.tmpdir, lang="eng", preprocess_engine="numpy",
+                                          tesseract_batch=4), expected)
+        self.assertEqual(converter.pgm2text.call_count, 20)
+        self.assertEqual(converter.tiff2text.call_count, 0)
+        self.assertEqual((ocr_cache.hits, ocr_cache.misses), (20, 20))
+
+        # Other settings, other texts
+        with contextlib.redirect_stdout(io.StringIO()):
+            pipeline.run(filename, self.tmpdir, lang="eng", psm=6, preprocess_engine="numpy")
+        self.assertEqual(converter.pgm2text.call_count, 40)
+
+        # Files (page by page, and in batches)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(pipeline.run(filename, self.tmpdir, lang="eng"), expected)
+            self.assertEqual(pipeline.run(filename, self.tmpdir, lang="eng"), expected)
+            pages = pipeline.run(filename, self.tmpdir, lang="eng", tesseract_batch=5)
+        self.assertEqual([page.strip() for page in pages], expected)
+        self.assertEqual(converter.image2text.call_count, 20)
+        self.assertEqual(converter.images2text.call_count, 0)
+
+    def test_split_pages(self):
+        self.assertEqual(converter.split_pages("a\n\fb\n\f", 2), ["a\n", "b\n"])
+        self.assertEqual(converter.split_pages("a\n\f\fc\f\n", 3), ["a\n", "", "c"])  # Blank page
+        self.assertRaises(ValueError, converter.split_pages, "a\fb\f", 4)
+        self.assertRaises(ValueError, converter.split_pages, "a\fb\f\f", 2)
+
+        # Only between pages (the last page is not dropped, even if it is blank)
+        self.assertEqual(converter.split_pages("a\n\fb\n", 2), ["a\n", "b\n"])
+        self.assertEqual(converter.split_pages("a\n\fb\n\f\n", 3), ["a\n", "b\n", "\n"])
+        self.assertEqual(converter.split_pages("a\n", 1), ["a\n"])
+        self.assertRaises(ValueError, converter.split_pages, "a\fb", 3)
+
+        # Multi-page TIFF
+        images = [np.full((3, 4), i, dtype=np.uint8) for i in range(3)]
+        tiff = Image.open(io.BytesIO(preprocess.encode_tiff(images)))
+        self.assertEqual(tiff.n_frames, 3)
+        for i, img in enumerate(images):
+            tiff.seek(i)
+            np.testing.assert_array_equal(np.asarray(tiff), img)
+
+    def test_pgm(self):
+        images = [np.arange(12, dtype=np.uint8).reshape(3, 4), np.full((2, 5), 32, dtype=np.uint8)]
+        data = b"".join(preprocess.encode_pgm(img) for img in images)
+        decoded = preprocess.decode_pgm(data)
+        self.assertEqual(len(decoded), 2)
+        for img1, img2 in zip(images, decoded):
+            np.testing.assert_array_equal(img1, img2)
+
+        # Comments and other whitespace in the header
+        np.testing.assert_array_equal(preprocess.decode_pgm(b"P5 # comment\n2\t1\n255\r\x00\xff")[0], [[0, 255]])
+        self.assertRaises(ValueError, preprocess.decode_pgm, b"P6\n1 1\n255\n\x00\x00\x00")
+
+    def test_tile_budget(self):
+        # The tiles of the pages pre-processed in parallel share the workers and the memory cap
+        pipeline = ocr.OCRPipeline(raster_workers=1, preprocess_workers=4, ocr_workers=1)
+        with contextlib.redirect_stdout(io.StringIO()):
+            pipeline.run(os.path.join(self.tmpdir, "doc.pdf"), self.tmpdir, preprocess_engine="numpy",
+                         tile_size=512, tile_workers=8, tile_memory=256)
+        kwargs = preprocess.image_cleaner.call_args.kwargs
+        self.assertEqual((kwargs["tile_workers"], kwargs["tile_memory"], kwargs["tile_size"]), (2, 64, 512))
+
+        # Defaults (at least one worker per page)
+        with mock.patch.object(os, "cpu_count", return_value=2):
+            budget = pipeline.tile_budget()
+        self.assertEqual(budget, {"tile_workers": 1, "tile_memory": preprocess.DEFAULT_TILE_MEMORY / 4})
+
+    def test_omp_thread_limit(self):
+        with mock.patch.dict(os.environ, {"OMP_THREAD_LIMIT": "2"}):
+            self.assertIsNone(ocr.OCRPipeline(ocr_workers=4).ocr_env)
+            self.assertEqual(ocr.get_default_workers()["ocr_workers"], max(1, (os.cpu_count() or 1) // 2))
+
+        with mock.patch.dict(os.environ, {}, clear=True):
+            self.assertEqual(ocr.OCRPipeline(ocr_workers=4).ocr_env["OMP_THREAD_LIMIT"], "1")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+import os
+import io
+import shutil
+import tempfile
+import contextlib
+
+import file2quiz
+
+
+# global variables
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../"))
+
+
+class TestParseQuiz(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.input_dir = os.path.join(self.tmpdir, "txt")
+        os.makedirs(self.input_dir)
+
+        # Copy the demo several times
+        demo = file2quiz.reader.read_txt(os.path.join(ROOT_DIR, "examples/raw/demo.txt"))
+        for i in range(1, 6):
+            file2quiz.reader.save_txt(demo, os.path.join(self.input_dir, f"demo{i}.txt"))
+        shutil.copy(os.path.join(ROOT_DIR, "examples/blacklist.txt"), self.tmpdir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def parse(self, jobs):
+        log = io.StringIO()
+        with contextlib.redirect_stdout(log):
+            quizzes = file2quiz.parse_quiz(self.input_dir, self.tmpdir, token_answer="^(===|solUtIoNs:)",
+                                           save_files=True, jobs=jobs)
+        return quizzes, log.getvalue()
+
+    def test_parallel(self):
+        quizzes1, log1 = self.parse(jobs=1)
+        quizzes2, log2 = self.parse(jobs=3)
+
+        # Same results (and same order), with the JSON schema
+        self.assertEqual(quizzes1, quizzes2)
+        self.assertIsInstance(quizzes1[0][0], dict)
+        self.assertEqual([os.path.basename(f) for q, f in quizzes2], [f"demo{i}.txt" for i in range(1, 6)])
+
+        # Logs are not interleaved
+        headers = [l for l in log2.split("\n") if "Parsing quiz" in l]
+        self.assertEqual(headers, [f'[INFO] ({i}/5) Parsing quiz: "demo{i}.txt"' for i in range(1, 6)])
+        self.assertEqual(log1[log1.index("SUMMARY"):], log2[log2.index("SUMMARY"):])
+
+        # Saved files
+        self.assertEqual(len(os.listdir(os.path.join(self.tmpdir, "quizzes/json"))), 5)
+        self.assertEqual(file2quiz.reader.read_json(os.path.join(self.tmpdir, "quizzes/json/demo3.json"))["3.1"]["correct_answer"], 3)
+
+    def test_positional_args(self):
+        # Extra positional arguments (as in the previous signature) do not end up in `jobs` or `quiz_format`
+        with contextlib.redirect_stdout(io.StringIO()):
+            quizzes = file2quiz.parse_quiz(self.input_dir, self.tmpdir, "^(===|solUtIoNs:)", None, "auto", True,
+                                           "extra", "args")
+        self.assertEqual(len(quizzes), 5)
+        self.assertEqual(len(os.listdir(os.path.join(self.tmpdir, "quizzes/json"))), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
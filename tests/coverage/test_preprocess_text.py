@@ -0,0 +1,74 @@
+import unittest
+import os
+import random
+
+import regex
+
+import file2quiz
+from file2quiz import utils
+
+
+# global variables
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../"))
+
+# Characters that interact with the cleanup rules
+SPECIAL_CHARS = "`´¨·º“”‘’…\ufeffaeiouAEIOU \n\t\r.-)(" + "😀ЖΩ中ñç"
+
+
+# Reference implementation (before the single-pass cleanup was introduced)
+def legacy_cleanup(text, mode="auto"):
+    text = text \
+        .replace('`a', 'à').replace('´a', 'á').replace('¨a', 'ä')\
+        .replace('`e', 'è').replace('´e', 'é').replace('¨e', 'ë')\
+        .replace('`i', 'ì').replace('´i', 'í').replace('¨i', 'ï')\
+        .replace('`o', 'ò').replace('´o', 'ó').replace('¨o', 'ö')\
+        .replace('`u', 'ù').replace('´u', 'ú').replace('¨u', 'ü')\
+        .replace('¨', '\"') \
+        .replace('“', '\"').replace('”', '\"') \
+        .replace('‘', '\'').replace('’', '\'') \
+        .replace('``', '\"') \
+        .replace('´´', '\"') \
+        .replace('’', '\'') \
+        .replace('´', '') \
+        .replace('`', '') \
+        .replace('…', '...') \
+        .replace('·º', 'º') \
+        .replace('\ufeff', '')
+    text = regex.sub(r"[^\p{Latin}\p{posix_alnum}\p{posix_punct}\s]", '', text)
+    lines = [l.strip() for l in text.split('\n')]
+    text = "\n".join(lines)
+    if mode == "auto":
+        lines = [l for l in text.split('\n') if l.strip()]
+        text = "\n".join(lines)
+    else:
+        text = regex.sub(r"\n{2,}", "\n\n", text)
+    return text
+
+
+def get_corpus_samples(seed=1234, num_random=2000):
+    samples = []
+    for filename in utils.get_files(os.path.join(ROOT_DIR, "examples/raw/"), extensions={'txt'}):
+        samples.append(file2quiz.reader.read_txt(filename))
+
+    # Random sequences of problematic characters
+    rnd = random.Random(seed)
+    for i in range(num_random):
+        samples.append("".join(rnd.choice(SPECIAL_CHARS) for _ in range(rnd.randint(0, 20))))
+    return samples
+
+
+class TestPreprocessText(unittest.TestCase):
+
+    def test_normalize_text(self):
+        for text in get_corpus_samples():
+            expected = regex.sub(r"[^\p{Latin}\p{posix_alnum}\p{posix_punct}\s]", '', text)
+            self.assertEqual(utils.normalize_text(text), expected)
+
+    def test_equivalence(self):
+        for text in get_corpus_samples():
+            for mode in ["auto", "single-line"]:
+                self.assertEqual(file2quiz.preprocess_text(text, mode=mode), legacy_cleanup(text, mode=mode), repr(text))
+
+
+if __name__ == '__main__':
+    unittest.main()
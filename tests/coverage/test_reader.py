@@ -0,0 +1,95 @@
+import unittest
+import os
+import glob
+from unittest import mock
+
+from file2quiz import reader
+from tests.benchmarks import tika_reference, bench_tika_pages
+
+# global variables
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../"))
+TIKA_FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "tika")
+
+XHTML = """<?xml version="1.0" encoding="UTF-8"?><html xmlns="http://www.w3.org/1999/xhtml">
+<head>
+<meta name="pdf:PDFVersion" content="1.4"/>
+<title>Exam</title>
+</head>
+<body><div class="page"><p/>
+<p>1. ¿Cuál es la capital de Francia?
+a) París
+b) Roma &amp; Milán
+</p>
+<p/>
+</div>
+<div class="page"><p/>
+<p>2. ¿2 &lt; 3?<br/>a) Sí
+b) No</p>
+<!-- comment -->
+<div class="annotation"><a href="http://example.com">Link</a></div>
+</div>
+<div class="page"><p/>
+</div>
+</body></html>"""
+
+
+class TestReader(unittest.TestCase):
+
+    def test_read_pdf_text(self):
+        with mock.patch("tika.parser.from_file", return_value={"content": XHTML}) as from_file, \
+                mock.patch("tika.parser.from_buffer") as from_buffer:
+            pages = reader.read_pdf_text("exam.pdf")
+
+        # A single call to Tika
+        self.assertEqual(from_file.call_count, 1)
+        self.assertEqual(from_buffer.call_count, 0)
+
+        # Pages
+        self.assertEqual(pages, [
+            "1. ¿Cuál es la capital de Francia?\na) París\nb) Roma & Milán",
+            "2. ¿2 < 3?\na) Sí\nb) No\n\n\nLink",
+            "",
+        ])
+
+    def assert_same_text(self, xhtml, text, name):
+        from bs4 import BeautifulSoup
+        body = BeautifulSoup(xhtml, features='lxml').find("body")
+        self.assertEqual(reader.xhtml2text(body).strip(), text.strip(), name)
+
+    def test_tika_reference(self):
+        # Same text as Tika's text handlers (reference written independently of `xhtml2text`)
+        for name, xhtml in [("reader", XHTML), ("benchmark", bench_tika_pages.make_xhtml(3))]:
+            self.assert_same_text(xhtml, tika_reference.tika_text(xhtml), name)
+
+        # Page by page (as the per-page requests did)
+        from bs4 import BeautifulSoup
+        for page in BeautifulSoup(XHTML, features='lxml').find_all('div', attrs={'class': 'page'}):
+            self.assertEqual(reader.xhtml2text(page).strip(), tika_reference.tika_text(str(page)).strip())
+
+    def test_tika_fixtures(self):
+        # XHTML and plain text recorded from Tika for the same documents (tests/debugging/record_tika_fixtures.py)
+        fixtures = sorted(glob.glob(os.path.join(TIKA_FIXTURES_DIR, "*.xhtml")))
+        if not fixtures:
+            self.skipTest("No Tika fixtures recorded")
+        for filename in fixtures:
+            name = os.path.splitext(os.path.basename(filename))[0]
+            text = reader.read_txt(os.path.join(TIKA_FIXTURES_DIR, f"{name}.txt"))
+            self.assert_same_text(reader.read_txt(filename), text, name)
+
+    @unittest.skipUnless(os.environ.get("TIKA_SERVER_ENDPOINT"), "Requires a Tika server (TIKA_SERVER_ENDPOINT)")
+    def test_tika_live(self):
+        # Same text as Tika for the examples
+        from tika import parser as tp
+        for filename in glob.glob(os.path.join(ROOT_DIR, "examples/raw/demo.*")):
+            if os.path.splitext(filename)[1] in {".pdf", ".docx", ".html", ".rtf"}:
+                xhtml = tp.from_file(filename, xmlContent=True)["content"] or ""
+                text = tp.from_file(filename)["content"] or ""
+                self.assert_same_text(xhtml, text, os.path.basename(filename))
+
+    def test_empty_content(self):
+        with mock.patch("tika.parser.from_file", return_value={"content": None}):
+            self.assertEqual(reader.read_pdf_text("exam.pdf"), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
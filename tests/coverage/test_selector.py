@@ -0,0 +1,142 @@
+import unittest
+import os
+import io
+import random
+import contextlib
+import tempfile
+from operator import itemgetter
+
+import file2quiz
+from file2quiz import utils
+from tests.benchmarks import synthetic
+
+WORDS = ["agua", "temperatura", "presión", "volumen", "energía", "calor", "masa", "densidad", "fuerza", "trabajo",
+         "potencia", "velocidad", "aceleración", "tiempo", "distancia", "carga", "corriente", "resistencia",
+         "campo", "onda", "frecuencia", "longitud", "gas", "sólido", "líquido", "mezcla", "reacción", "enlace"]
+
+
+# Reference implementation (before the n-gram index was introduced)
+def legacy_find_answers_selector(questions, lines, thres1=0.90, thres2=0.75, max_jump=10):
+    correct_answers = []
+    previous_line = 0
+    for q, answers in questions:
+        line_ans_score = []
+        skip_question = False
+        for li, bold_text in enumerate(lines[previous_line:]):
+            scores = []
+            for i, (ans_idx, ans_text) in enumerate(answers):
+                ans_text = file2quiz.normalize_chunk(ans_text, remove_id=False)
+                scores.append(utils.fuzzy_text_similarity(ans_text, bold_text))
+            ans_idx, ans_score = max(enumerate(scores), key=itemgetter(1))
+            line_ans_score.append((ans_idx, ans_score, bold_text))
+            if ans_score > thres1:
+                previous_line += li
+                break
+            if li >= max_jump and previous_line != 0:
+                skip_question = True
+                break
+        if skip_question:
+            continue
+        ans_idx, score, bold_text = max(line_ans_score, key=itemgetter(1))
+        if score > thres2:
+            correct_answers.append([q[0], ans_idx])
+    return correct_answers
+
+
+def generate_exam(num_questions, seed=1234, missing_ratio=0.05, noise_ratio=0.1):
+    rnd = random.Random(seed)
+    questions, bold_lines = [], []
+    for i in range(1, num_questions+1):
+        question = [str(i), " ".join(rnd.choice(WORDS) for _ in range(8)) + "?"]
+        answers = [[letter, " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(2, 6)))] for letter in "abcd"]
+        questions.append([question, answers])
+
+        # Bold text (correct answer and some noise)
+        if rnd.random() > missing_ratio:
+            correct = rnd.randint(0, 3)
+            bold_lines.append(f"{answers[correct][0]}) {answers[correct][1]}")
+        if rnd.random() < noise_ratio:
+            bold_lines.append(" ".join(rnd.choice(WORDS) for _ in range(4)))
+    return questions, bold_lines
+
+
+class TestSelector(unittest.TestCase):
+
+    def test_selector_index(self):
+        index = file2quiz.SelectorIndex(["energía del gas", "masa y volumen", "calor", "energía del sólido"])
+        self.assertEqual(index.search(["energía del gas"], top_k=1), [0])
+        self.assertEqual(index.search(["energía del gas"], start=1, top_k=1), [3])
+        self.assertEqual(index.search(["calor"], end=2), [])
+
+    def test_equivalence(self):
+        for seed in range(5):
+            questions, bold_lines = generate_exam(num_questions=60, seed=seed)
+
+            with tempfile.TemporaryDirectory() as tmpdir:
+                answers_file = os.path.join(tmpdir, "exam.html_selected.txt")
+                file2quiz.reader.save_txt("\n".join(bold_lines), answers_file)
+
+                # Legacy version
+                text = file2quiz.preprocess_text("\n".join(bold_lines))
+                lines = [file2quiz.normalize_chunk(l, remove_id=True) for l in text.split('\n') if l.strip()]
+                expected = legacy_find_answers_selector(questions, lines)
+
+                # Indexed version
+                solutions = file2quiz.find_answers_selector(questions, answers_file, None, "auto")
+                self.assertEqual(solutions, expected)
+                self.assertTrue(len(solutions) > 30)
+
+    def test_equivalence_synthetic(self):
+        # Same answers as the exact scan on the synthetic exams of the benchmarks, even with few candidates. Some
+        # characters of the selector are lost (as in OCR), so often no candidate is good enough and every line of
+        # the window has to be compared.
+        for variant, params in synthetic.VARIANTS.items():
+            for seed in range(3):
+                exam = synthetic.generate_exam(40, seed=seed, selector_noise=0.3, **params)
+                rnd = random.Random(seed)
+                bold_lines = ["".join(c for c in l if rnd.random() > 0.15) for l in exam["selector_lines"]]
+
+                with tempfile.TemporaryDirectory() as tmpdir, contextlib.redirect_stdout(io.StringIO()):
+                    answers_file = os.path.join(tmpdir, "exam.html_selected.txt")
+                    file2quiz.reader.save_txt("\n".join(bold_lines), answers_file)
+
+                    text = file2quiz.preprocess_text("\n".join(bold_lines))
+                    lines = [file2quiz.normalize_chunk(l, remove_id=True) for l in text.split('\n') if l.strip()]
+                    expected = legacy_find_answers_selector(exam["questions"], lines)
+                    for top_k in [1, 3, 10]:
+                        solutions = file2quiz.find_answers_selector(exam["questions"], answers_file, None, "auto",
+                                                                    top_k=top_k)
+                        self.assertEqual(solutions, expected, f"{variant} (seed={seed}, top_k={top_k})")
+
+    def test_duplicate_lines(self):
+        # More duplicate lines than candidates: the first one moves the window on (as in the exact scan)
+        questions = [
+            [["1", "Primera?"], [["a", "primera respuesta"], ["b", "otra cosa distinta"]]],
+            [["2", "Segunda?"], [["a", "ninguna de ellas"], ["b", "todas las anteriores"]]],
+            [["3", "Tercera?"], [["a", "calor y masa"], ["b", "fuerza y trabajo"]]],
+        ]
+        bold_lines = ["introducción", "a) primera respuesta"] + ["b) todas las anteriores"] * 11 + ["a) calor y masa"]
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            answers_file = os.path.join(tmpdir, "exam.html_selected.txt")
+            file2quiz.reader.save_txt("\n".join(bold_lines), answers_file)
+
+            text = file2quiz.preprocess_text("\n".join(bold_lines))
+            lines = [file2quiz.normalize_chunk(l, remove_id=True) for l in text.split('\n') if l.strip()]
+            expected = legacy_find_answers_selector(questions, lines)
+            for top_k in [1, 3, 10]:
+                solutions = file2quiz.find_answers_selector(questions, answers_file, None, "auto", top_k=top_k)
+                self.assertEqual(solutions, expected)
+        self.assertEqual(expected, [["1", 0], ["2", 1]])  # The third answer is too far (max jump)
+
+        # Same message as always (scripts look for it)
+        with tempfile.TemporaryDirectory() as tmpdir, contextlib.redirect_stdout(io.StringIO()) as f:
+            answers_file = os.path.join(tmpdir, "exam.html_selected.txt")
+            file2quiz.reader.save_txt("\n".join(bold_lines), answers_file)
+            file2quiz.find_answers_selector(questions, answers_file, None, "auto")
+        self.assertTrue(f.getvalue().startswith("\t [WARNING] Skipping answer (might be missing). Max jump exceeded "
+                                                "(10 lines). [Q: '3) Tercera?"), f.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import unittest
+import os
+import io
+import tempfile
+import contextlib
+from unittest import mock
+
+import file2quiz
+from file2quiz import store
+from file2quiz.models import Question, Quiz
+
+
+def make_quiz(*questions):
+    return Quiz([Question(str(i), text, answers, correct) for i, (text, answers, correct) in enumerate(questions, 1)])
+
+
+class TestQuestionBank(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "bank.sqlite")
+        self.quizzes = [
+            (make_quiz(("¿Qué gas es el CO2?", ["Dióxido de carbono", "Monóxido"], 0),
+                       ("Densidad del agua", ["1 g/cm3", "2 g/cm3"], None)), "exams/exam1.txt.txt"),
+            (make_quiz(("Unidad de la energía", ["Julio", "Vatio", "Newton"], 0),
+                       ("El CO2 es un gas de efecto invernadero", ["Sí", "No"], 0),
+                       ("Fórmula del agua", ["H2O", "CO2"], 0)), "exams/exam2.txt.txt"),
+        ]
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_ingest_search(self):
+        with store.QuestionBank(self.path) as bank:
+            self.assertEqual(bank.ingest(self.quizzes, batch_size=2), 5)
+            self.assertEqual(bank.exams(), ["exam1.txt", "exam2.txt"])
+            self.assertEqual(bank.count(), 5)
+
+            # Questions and answers are indexed (ignoring accents)
+            self.assertEqual(bank.count("CO2"), 3)
+            self.assertEqual(bank.count("question: CO2"), 2)
+            self.assertEqual(bank.count("energia"), 1)
+            self.assertEqual(bank.exams("densidad"), ["exam1.txt"])
+
+            # Same questions as the quizzes
+            self.assertEqual(bank.get_quiz("exam2.txt"), self.quizzes[1][0])
+            quizzes = list(bank.iter_quizzes("agua"))
+            self.assertEqual([name for name, _ in quizzes], ["exam1.txt", "exam2.txt"])
+            self.assertEqual(quizzes[0][1]["2"], self.quizzes[0][0]["2"])
+            self.assertIsNone(quizzes[0][1]["2"].correct_answer)
+
+            self.assertRaises(ValueError, bank.count, "AND (")
+
+    def test_ingest_replaces_exams(self):
+        with store.QuestionBank(self.path) as bank:
+            bank.ingest(self.quizzes)
+            bank.ingest([(make_quiz(("Nueva pregunta", ["a", "b"], 1)), "exam1.txt.txt")])
+            self.assertEqual(bank.count(), 4)
+            self.assertEqual(bank.count("densidad"), 0)  # The index is updated too
+            self.assertEqual(bank.count("nueva"), 1)
+
+    def test_same_file_names(self):
+        # Files with the same name in different directories are different exams
+        for year in ["2019", "2020"]:
+            os.makedirs(os.path.join(self.tmpdir.name, "json", year))
+            file2quiz.reader.save_quiz(make_quiz((f"Pregunta de {year}", ["a", "b"], 0)),
+                                       os.path.join(self.tmpdir.name, "json", year, "exam1.json"))
+
+        with store.QuestionBank(self.path) as bank:
+            files = [os.path.join(self.tmpdir.name, "json", year, "exam1.json") for year in ["2019", "2020"]]
+            self.assertEqual(bank.ingest_files(files), 2)
+            self.assertEqual(bank.exams(), ["2019/exam1", "2020/exam1"])
+            self.assertEqual(bank.get_quiz("2020/exam1")["1"].question, "Pregunta de 2020")
+
+            # Replacing an exam with a different file is not silent
+            with contextlib.redirect_stdout(io.StringIO()) as f:
+                bank.ingest([(make_quiz(("Otra", ["a"], 0)), files[0])])
+                bank.ingest([(make_quiz(("Otra", ["a"], 0)), files[0])])
+                self.assertEqual(f.getvalue(), "")
+                bank.ingest([(make_quiz(("Otra", ["a"], 0)), files[1])])
+            self.assertIn('Exam "exam1" replaced by a different file', f.getvalue())
+
+        # Exported to the same subdirectories
+        with contextlib.redirect_stdout(io.StringIO()):
+            file2quiz.convert_quiz(None, self.tmpdir.name, "text", save_files=True, bank=self.path, show_answers=True)
+        self.assertTrue(os.path.exists(os.path.join(self.tmpdir.name, "quizzes/text/2019/exam1.txt")))
+
+    def test_interrupted_ingest(self):
+        with store.QuestionBank(self.path) as bank:
+            bank.ingest(self.quizzes)
+
+            # The new version of an exam fails halfway: the old one is kept
+            def quizzes():
+                yield make_quiz(("Nueva pregunta", ["a", "b"], 1)), "exam1.txt.txt"
+                raise KeyboardInterrupt()
+            self.assertRaises(KeyboardInterrupt, bank.ingest, quizzes(), batch_size=100)
+            self.assertEqual(bank.get_quiz("exam1.txt"), self.quizzes[0][0])
+            self.assertEqual(bank.count(), 5)
+
+    def test_no_fts5(self):
+        # A clear error if SQLite was built without FTS5
+        conn = mock.MagicMock()
+        conn.executescript.side_effect = store.sqlite3.OperationalError("no such module: fts5")
+        with mock.patch.object(store.sqlite3, "connect", return_value=conn):
+            self.assertRaisesRegex(RuntimeError, "FTS5", store.QuestionBank, self.path)
+
+    def test_convert_from_query(self):
+        with store.QuestionBank(self.path) as bank:
+            bank.ingest(self.quizzes)
+
+        # The quizzes are streamed by a single query (not one query per exam)
+        with contextlib.redirect_stdout(io.StringIO()), \
+                mock.patch.object(store.QuestionBank, "get_quiz", side_effect=AssertionError):
+            fquizzes = file2quiz.convert_quiz(None, self.tmpdir.name, "text", save_files=True, bank=self.path,
+                                              query="CO2", show_answers=True)
+        self.assertEqual([name for _, name in fquizzes], ["exam1.txt", "exam2.txt"])
+        expected = Quiz([self.quizzes[1][0]["2"], self.quizzes[1][0]["3"]])
+        self.assertEqual(fquizzes[1][0], file2quiz.quiz2txt(expected, show_answers=True))
+        self.assertTrue(os.path.exists(os.path.join(self.tmpdir.name, "quizzes/text/exam2.txt.txt")))
+
+
+if __name__ == '__main__':
+    unittest.main()
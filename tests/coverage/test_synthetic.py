@@ -0,0 +1,38 @@
+import unittest
+import io
+import tempfile
+import contextlib
+
+import file2quiz
+from tests.benchmarks import synthetic, bench_quizify
+
+
+class TestSynthetic(unittest.TestCase):
+
+    def test_generator(self):
+        # Same seed, same exam
+        self.assertEqual(synthetic.generate_exam(20, seed=1), synthetic.generate_exam(20, seed=1))
+        self.assertNotEqual(synthetic.generate_exam(20, seed=1), synthetic.generate_exam(20, seed=2))
+
+    def test_parse_variants(self):
+        for name, params in synthetic.VARIANTS.items():
+            exam = synthetic.generate_exam(30, seed=1, **params)
+            with contextlib.redirect_stdout(io.StringIO()):
+                quiz = file2quiz.parse_quiz_txt(exam["text"], token_answer="===", num_answers=params["num_answers"])
+
+            # All the questions and solutions must be found
+            self.assertEqual(list(quiz.keys()), [q[0][0] for q in exam["questions"]], name)
+            self.assertEqual([[q_id, q["correct_answer"]] for q_id, q in quiz.items()], exam["solutions"], name)
+            if not params.get("noise"):
+                self.assertEqual([q["answers"] for q in quiz.values()], [[a for _, a in q[1]] for q in exam["questions"]])
+
+    def test_benchmark(self):
+        exam = synthetic.generate_exam(10, seed=1)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            results = bench_quizify.bench_exam(exam, 4, False, 1, tmpdir)
+        self.assertIn("find_answers_selector", results)
+        self.assertTrue(all(r["seconds"] >= 0 for r in results.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,7 @@
 import unittest
 import os
+import shutil
+import tempfile
 
 import file2quiz
 
@@ -13,14 +15,17 @@ class TestQuizify(unittest.TestCase):
     def test_file2quiz(self):
         # Get paths
         input_dir = os.path.join(ROOT_DIR, "examples/raw/")
-        output_dir = os.path.join(ROOT_DIR, "examples/")
-        blacklist_path = os.path.join(ROOT_DIR, "examples/blacklist.txt")
+        output_dir = tempfile.mkdtemp()  # Do not leave outputs in the examples
+        self.addCleanup(shutil.rmtree, output_dir)
+        shutil.copy(os.path.join(ROOT_DIR, "examples/blacklist.txt"), output_dir)
+        blacklist_path = os.path.join(output_dir, "blacklist.txt")
         token_answer = "^(===|solUtIoNs:)"  # Check case insensitivity // There are problems with this token: "==="
         extensions = {".txt", ".pdf", ".rtf", ".docx", ".html", ".png"}
 
         # Parse raw files
         print("Extracting text...")
-        texts_extracted = file2quiz.extract_text(input_dir, output_dir, extensions=extensions, save_files=True)
+        texts_extracted = file2quiz.extract_text(input_dir, output_dir, extensions=extensions, save_files=True,
+                                                 no_cache=True)
 
         # Parse texts into quizzes
         print("Parsing quizzes...")
@@ -185,6 +190,35 @@ class TestQuizify(unittest.TestCase):
         self.assertEqual(quizzes.get("7").get('correct_answer'), 2)
         self.assertEqual(quizzes.get("8").get('correct_answer'), 0)
 
+    def test_parser_profile(self):
+        # Profiles are compiled once and cached
+        profile = file2quiz.get_parser_profile("auto", "===")
+        self.assertIs(profile, file2quiz.get_parser_profile("auto", "==="))
+        self.assertIs(profile.derive(mode="single-line"), profile.derive(mode="single-line"))
+        self.assertEqual(profile.derive(mode="single-line").token_answer, "===")
+        self.assertTrue(profile.derive(mode="single-line").single_line)
+
+        # File-specific params (derived profile)
+        txt = """#mode=single-line
+        #num_answers=3
+        1. This is the first question, with enough text?
+        answer one
+        answer two
+        answer three
+
+        2. This is the second question, with enough text?
+        answer one
+        answer two
+        answer three
+        ===
+        1a 2c
+        """
+        quiz = file2quiz.parse_quiz_txt(txt, token_answer="===", profile=profile)
+        self.assertEqual(quiz, file2quiz.parse_quiz_txt(txt, token_answer="==="))
+        self.assertEqual(len(quiz), 2)
+        self.assertEqual(quiz.get("1").get('answers'), ["Answer one", "Answer two", "Answer three"])
+        self.assertEqual(quiz.get("2").get('correct_answer'), 2)
+
 
 if __name__ == '__main__':
     # Test single test
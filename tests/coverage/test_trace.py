@@ -0,0 +1,65 @@
+import unittest
+import os
+import io
+import sys
+import json
+import shutil
+import tempfile
+import contextlib
+
+import file2quiz
+from file2quiz import trace, commands
+
+# global variables
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../"))
+
+
+class TestTrace(unittest.TestCase):
+
+    def tearDown(self):
+        trace.stop_tracing()
+
+    def test_disabled(self):
+        self.assertFalse(trace.is_enabled())
+        self.assertIs(trace.span("a"), trace.span("b", page=1))  # Nothing is allocated
+        with trace.span("a"):
+            pass
+        self.assertEqual(trace.drain(), [])
+
+    def test_spans(self):
+        trace.start_tracing()
+        with trace.span("outer", cat="stage"):
+            with trace.span("inner", file="exam.txt"):
+                commands.run_command([sys.executable, "-c", "pass"], tool="python")
+        events = trace.stop_tracing()
+
+        names = [e["name"] for e in events]
+        self.assertEqual(names, ["python", "inner", "outer"])  # In order of completion
+        self.assertEqual(events[1]["args"], {"file": "exam.txt"})
+        self.assertTrue(all(e["ph"] == "X" and e["dur"] >= 0 for e in events))
+        self.assertTrue(events[2]["ts"] <= events[1]["ts"] <= events[0]["ts"])
+        self.assertFalse(trace.is_enabled())
+
+    def test_parse_quiz_workers(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for i in range(4):
+                shutil.copy(os.path.join(ROOT_DIR, "examples/raw/demo.txt"), os.path.join(tmpdir, f"exam{i}.txt"))
+
+            trace.start_tracing()
+            with contextlib.redirect_stdout(io.StringIO()):
+                file2quiz.parse_quiz(tmpdir, tmpdir, token_answer="===", jobs=2)
+                savepath = os.path.join(tmpdir, "trace.json")
+                trace.save_trace(savepath, trace.stop_tracing())
+
+            # Spans of the workers are merged
+            with open(savepath) as f:
+                events = json.load(f)["traceEvents"]
+            spans = [e for e in events if e["name"] == "parse_quiz_txt"]
+            self.assertEqual(sorted(e["args"]["file"] for e in spans), [f"exam{i}.txt" for i in range(4)])
+            self.assertTrue(all(e["pid"] != os.getpid() for e in spans))
+            self.assertIn("preprocess_text", {e["name"] for e in events})
+            self.assertIn("process_name", {e["name"] for e in events if e["ph"] == "M"})
+
+
+if __name__ == '__main__':
+    unittest.main()
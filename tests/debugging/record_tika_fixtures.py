@@ -0,0 +1,27 @@
+"""Records the XHTML and the plain text that Tika returns for some documents, so that `reader.xhtml2text` can be
+checked against the real output of Tika (see `tests/coverage/test_reader.py`). This requires Tika (and Java):
+
+    python -m tests.debugging.record_tika_fixtures examples/raw/demo.pdf examples/raw/demo.docx
+"""
+import os
+import sys
+
+from tika import parser as tp
+
+from file2quiz import reader, utils
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "coverage", "data", "tika")
+
+
+if __name__ == "__main__":
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    for filename in sys.argv[1:]:
+        fname, ext = utils.get_fname(filename)
+        name = f"{fname}{ext.replace('.', '_')}"
+
+        # Same document, same Tika: XHTML and plain text
+        xhtml = tp.from_file(filename, xmlContent=True)["content"] or ""
+        text = tp.from_file(filename)["content"] or ""
+        reader.save_txt(xhtml, os.path.join(FIXTURES_DIR, f"{name}.xhtml"))
+        reader.save_txt(text, os.path.join(FIXTURES_DIR, f"{name}.txt"))
+        print(f"- [INFO] Recorded: {name} ({len(xhtml)} chars of XHTML, {len(text)} chars of text)")